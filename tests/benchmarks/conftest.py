@@ -0,0 +1,119 @@
+"""benchmark fixtures"""
+
+import json
+import tracemalloc
+from collections.abc import Callable
+from pathlib import Path
+from time import perf_counter
+from typing import Any
+
+import pytest
+
+BASELINES_FILE = Path(__file__).parent / "baselines.json"
+# absolute tolerances on top of the threshold, so very short or small runs do not flake
+TIME_SLACK = 0.01
+MEMORY_SLACK = 2**20
+
+# results of all benchmarks in the session, stored with --update-baselines
+RESULTS: dict[str, dict[str, float]] = {}
+
+
+def load_baselines() -> dict[str, dict[str, float]]:
+    """Load the stored baselines (seconds and peak memory in bytes per benchmark)"""
+    if not BASELINES_FILE.exists():
+        return {}
+    baselines: dict[str, dict[str, float]] = json.loads(BASELINES_FILE.read_text())
+    return baselines
+
+
+class Benchmark:
+    """Time a hot path, trace its peak memory and compare both against the baseline
+
+    The time is the fastest of some rounds, the peak memory is traced in an extra round
+    (tracemalloc covers Python objects and NumPy arrays). A benchmark fails if the time or
+    the peak memory exceed the baseline by more than their threshold.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        baseline: dict[str, float] | None,
+        threshold: float,
+        memory_threshold: float,
+    ):
+        self.name = name
+        self.baseline = baseline
+        self.threshold = threshold
+        self.memory_threshold = memory_threshold
+
+    def __call__(self, function: Callable[[], Any], rounds: int = 3) -> Any:  # noqa: ANN401
+        """Run the benchmark and return the result of the function"""
+        seconds = float("inf")
+        for _ in range(rounds):
+            started = perf_counter()
+            result = function()
+            seconds = min(seconds, perf_counter() - started)
+        del result
+        tracemalloc.start()
+        try:
+            result = function()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        RESULTS[self.name] = {"seconds": seconds, "peak_memory": peak}
+        self.check(seconds, peak)
+        return result
+
+    def check(self, seconds: float, peak: int) -> None:
+        """Compare the results against the baseline"""
+        if self.baseline is None:
+            return
+        assert seconds <= self.baseline["seconds"] * (1 + self.threshold) + TIME_SLACK, (
+            f"{self.name} took {seconds:.3f}s, "
+            f"the baseline is {self.baseline['seconds']:.3f}s (+{self.threshold:.0%})"
+        )
+        baseline_peak = self.baseline["peak_memory"]
+        assert peak <= baseline_peak * (1 + self.memory_threshold) + MEMORY_SLACK, (
+            f"{self.name} used {peak / 2**20:.1f} MiB, "
+            f"the baseline is {baseline_peak / 2**20:.1f} MiB (+{self.memory_threshold:.0%})"
+        )
+
+
+@pytest.fixture
+def benchmark(request: pytest.FixtureRequest) -> Benchmark:
+    """Provide a benchmark named after the test (with parameters)"""
+    name = request.node.name.removeprefix("test_")
+    baseline = None
+    if not request.config.getoption("--update-baselines"):
+        baseline = load_baselines().get(name)
+    return Benchmark(
+        name=name,
+        baseline=baseline,
+        threshold=request.config.getoption("--benchmark-threshold"),
+        memory_threshold=request.config.getoption("--benchmark-memory-threshold"),
+    )
+
+
+def pytest_sessionfinish(session: pytest.Session) -> None:
+    """Store the results as new baselines (if requested)"""
+    if not session.config.getoption("--update-baselines") or not RESULTS:
+        return
+    baselines = load_baselines()
+    baselines.update(RESULTS)
+    BASELINES_FILE.write_text(json.dumps(dict(sorted(baselines.items())), indent=2) + "\n")
+
+
+def pytest_terminal_summary(terminalreporter: pytest.TerminalReporter) -> None:
+    """Show the results of the benchmarks"""
+    if not RESULTS:
+        return
+    terminalreporter.section("benchmarks")
+    baselines = load_baselines()
+    for name, result in sorted(RESULTS.items()):
+        line = f"{name:<50} {result['seconds']:>9.3f}s {result['peak_memory'] / 2**20:>9.1f} MiB"
+        if name in baselines:
+            line += (
+                f"  ({result['seconds'] / baselines[name]['seconds']:.2f}x time, "
+                f"{result['peak_memory'] / (baselines[name]['peak_memory'] or 1):.2f}x memory)"
+            )
+        terminalreporter.write_line(line)
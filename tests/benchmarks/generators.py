@@ -0,0 +1,83 @@
+"""synthetic data for the benchmarks"""
+
+import random
+
+DATASET = "https://text2sparql.aksw.org/2025/dbpedia/"
+PREFIX = "dbpedia"
+LANGUAGES = ("en", "es")
+QUERY = "SELECT ?s WHERE {{ ?s <http://example.org/p{number}> ?o }}"
+
+
+def uri(number: int) -> str:
+    """Create an entity URI (from a pool shared by all results)"""
+    return f"http://dbpedia.org/resource/Entity_{number}"
+
+
+def questions_file(count: int, languages: tuple[str, ...] = LANGUAGES) -> dict:
+    """Create a questions file with gold queries (as loaded from YAML)"""
+    return {
+        "dataset": {"id": DATASET, "prefix": PREFIX},
+        "questions": [
+            {
+                "id": number,
+                "question": {
+                    language: f"Question {number} ({language})?" for language in languages
+                },
+                "query": {"sparql": QUERY.format(number=number)},
+            }
+            for number in range(count)
+        ],
+    }
+
+
+def answers(count: int, languages: tuple[str, ...] = LANGUAGES, seed: int = 42) -> list[dict]:
+    """Create the answers of a system, a tenth of them repeat the gold query"""
+    generator = random.Random(seed)  # noqa: S311
+    return [
+        {
+            "dataset": DATASET,
+            "question": f"Question {number} ({language})?",
+            "query": QUERY.format(
+                number=number if generator.random() < 0.1 else f"{number}-{language}"  # noqa: PLR2004
+            ),
+            "endpoint": "http://127.0.0.1:8000",
+            "qname": f"{PREFIX}:{number}-{language}",
+            "uri": f"{DATASET}{number}-{language}",
+        }
+        for number in range(count)
+        for language in languages
+    ]
+
+
+def sparql_result(rows: int, uris: int = 10_000, seed: int = 42) -> dict:
+    """Create a SPARQL JSON result with bindings of two variables"""
+    generator = random.Random(seed)  # noqa: S311
+    return {
+        "head": {"vars": ["s", "label"]},
+        "results": {
+            "bindings": [
+                {
+                    "s": {"type": "uri", "value": uri(generator.randrange(uris))},
+                    "label": {"type": "literal", "xml:lang": "en", "value": f"Label {row}"},
+                }
+                for row in range(rows)
+            ]
+        },
+    }
+
+
+def result_sets(
+    count: int, values: int = 30, uris: int = 10_000, seed: int = 42
+) -> tuple[dict, dict]:
+    """Create a true and a predicted result set with overlapping values from a URI pool"""
+    generator = random.Random(seed)  # noqa: S311
+    true_set: dict = {}
+    pred_set: dict = {}
+    for number in range(count):
+        qname = f"{PREFIX}:{number}-en"
+        relevant = [uri(generator.randrange(uris)) for _ in range(generator.randint(1, values))]
+        true_set[qname] = dict.fromkeys(relevant, 1)
+        predicted = generator.sample(relevant, len(relevant) // 2)
+        predicted.append(uri(generator.randrange(uris)))
+        pred_set[qname] = dict.fromkeys(predicted, 1)
+    return true_set, pred_set
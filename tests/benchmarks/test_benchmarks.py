@@ -0,0 +1,172 @@
+"""benchmarks of the hot paths of ask, query and evaluate
+
+Run with `pytest tests/benchmarks --benchmarks` (and `--memray` for the memory limits),
+store new baselines with `--update-baselines`.
+"""
+
+import zlib
+from datetime import timedelta
+from pathlib import Path
+
+import pytest
+import yaml
+from requests import Response
+
+from tests import CLI_RUNNER
+from tests.benchmarks.conftest import RESULTS, Benchmark, load_baselines
+from tests.benchmarks.generators import (
+    DATASET,
+    answers,
+    questions_file,
+    result_sets,
+    sparql_result,
+)
+from text2sparql_client.cli import cli
+from text2sparql_client.commands import query
+from text2sparql_client.database import Database, lookup_key
+from text2sparql_client.models.questions_file import QuestionsFile
+from text2sparql_client.utils.evaluation_metrics import DBpediaDict2PytrecDict, Evaluation
+from text2sparql_client.utils.result_set_file import load_result_set, write_result_set
+from text2sparql_client.utils.string_table import StringTable
+
+pytestmark = pytest.mark.benchmark
+
+ENDPOINT = "http://127.0.0.1:8000"
+BODY = '{"dataset": "x", "question": "y", "query": "SELECT * WHERE {?s ?p ?o}"}'
+
+
+@pytest.mark.parametrize("count", [1_000, 10_000, 100_000])
+def test_questions_file(benchmark: Benchmark, count: int) -> None:
+    """Validate a questions file."""
+    data = questions_file(count)
+    validated = benchmark(lambda: QuestionsFile.model_validate(data))
+    assert len(validated.questions) == count
+
+
+@pytest.mark.limit_memory("64 MB")
+def test_database_write(benchmark: Benchmark, tmp_path: Path) -> None:
+    """Register questions and add their responses one by one."""
+    files = iter(range(100))
+    response = Response()
+    response.status_code = 200
+    response.encoding = "utf-8"
+    response._content = BODY.encode()  # noqa: SLF001
+    response.elapsed = timedelta(seconds=1)
+
+    def write() -> Database:
+        database = Database(file=tmp_path / f"responses-{next(files)}.db")
+        for number in range(1_000):
+            row_id = database.register_question("2025-01-01", ENDPOINT, DATASET, f"{number}")
+            database.add_response(row_id=row_id, response=response)
+        return database
+
+    benchmark(write)
+
+
+@pytest.mark.limit_memory("128 MB")
+def test_database_lookup(benchmark: Benchmark, tmp_path: Path) -> None:
+    """Look up the cached responses of many questions at once."""
+    database = Database(file=tmp_path / "responses.db")
+    for number in range(10_000):
+        row_id = database.register_question("2025-01-01", ENDPOINT, DATASET, f"Question {number}?")
+        database.connection.execute(
+            "UPDATE responses SET status_code=200, body=? WHERE id=?", (BODY, row_id)
+        )
+    database.connection.commit()
+    questions = [f"Question {number}?" for number in range(0, 20_000, 2)]
+    responses = benchmark(lambda: database.get_responses(ENDPOINT, DATASET, questions))
+    assert len(responses) == 5_000  # noqa: PLR2004
+
+
+@pytest.mark.limit_memory("256 MB")
+def test_ask_cached_rerun(benchmark: Benchmark, tmp_path: Path) -> None:
+    """Rerun ask with cached responses for all 10k questions (nothing is sent)."""
+    data = questions_file(5_000)
+    questions = tmp_path / "questions.yml"
+    questions.write_text(yaml.safe_dump(data))
+    answers_db = tmp_path / "responses.db"
+    database = Database(file=answers_db)
+    texts = [text for question in data["questions"] for text in question["question"].values()]
+    with database.connection as connection:
+        connection.executemany(
+            """
+            INSERT INTO responses (time, endpoint, dataset, question, body, lookup_key)
+            VALUES ('2025-01-01', ?, ?, ?, ?, ?)
+            """,
+            (
+                (ENDPOINT, DATASET, text, BODY, lookup_key(ENDPOINT, DATASET, text))
+                for text in texts
+            ),
+        )
+    outputs = iter(range(100))
+
+    def rerun() -> None:
+        output = tmp_path / f"answers-{next(outputs)}.json"
+        command = ["ask", "--answers-db", str(answers_db), "-o", str(output)]
+        result = CLI_RUNNER.invoke(cli, [*command, str(questions), ENDPOINT])
+        assert result.exit_code == 0, result.output
+
+    benchmark(rerun)
+    rows = database.connection.execute("SELECT count(*) FROM responses").fetchone()[0]
+    assert rows == len(texts), "Cache hits should not add rows."
+
+
+@pytest.mark.limit_memory("256 MB")
+@pytest.mark.parametrize("count", [1_000, 10_000])
+def test_pred_result_set(benchmark: Benchmark, monkeypatch: pytest.MonkeyPatch, count: int) -> None:
+    """Generate a predicted result set (SPARQL results from a pool of 100 results)."""
+    results = [sparql_result(rows=50, seed=seed) for seed in range(100)]
+
+    def fake_get_json(query_string: str, endpoint: str, cache: object = None) -> dict:  # noqa: ARG001
+        return results[zlib.crc32(query_string.encode()) % len(results)]
+
+    monkeypatch.setattr(query, "get_json", fake_get_json)
+    test_dataset = questions_file(count)
+    json_answers = answers(count)
+    languages: list = ["en", "es"]
+    result_set = benchmark(
+        lambda: query.generate_pred_result_set(
+            json_answers, test_dataset, "http://sparql", languages
+        )
+    )
+    assert len(result_set) == 2 * count
+
+
+@pytest.mark.limit_memory("512 MB")
+def test_transform_large_result(benchmark: Benchmark) -> None:
+    """Transform a SPARQL result with 100k bindings."""
+    result = sparql_result(rows=100_000)
+    transformed = benchmark(lambda: DBpediaDict2PytrecDict("q", StringTable()).tranform(result))
+    assert len(transformed["q"]) > 100_000  # noqa: PLR2004
+
+
+@pytest.mark.limit_memory("512 MB")
+@pytest.mark.parametrize("engine", ["pytrec_eval", "numpy"])
+def test_evaluate(benchmark: Benchmark, engine: str) -> None:
+    """Evaluate 10k questions."""
+    true_set, pred_set = result_sets(10_000)
+    evaluation = Evaluation("api", engine=engine)
+    results = benchmark(lambda: evaluation.evaluate(pred_set, true_set))
+    assert len(results) == 10_001  # questions and the average  # noqa: PLR2004
+
+
+@pytest.mark.limit_memory("256 MB")
+@pytest.mark.parametrize("suffix", [".json", ".rsbin"])
+def test_load_result_set(benchmark: Benchmark, tmp_path: Path, suffix: str) -> None:
+    """Load a result set of 10k questions and access all results."""
+    true_set, _ = result_sets(10_000)
+    file = str(tmp_path / f"result_set{suffix}")
+    write_result_set(true_set, file)
+
+    def load() -> int:
+        result_set = load_result_set(file, strings=StringTable())
+        return sum(len(result_set[qname]) for qname in true_set)
+
+    assert benchmark(load) == sum(len(values) for values in true_set.values())
+
+
+def test_compact_load_is_faster() -> None:
+    """Check that loading the compact result set beats JSON (this run or the baselines)."""
+    compact, json_ = "load_result_set[.rsbin]", "load_result_set[.json]"
+    results = RESULTS if compact in RESULTS and json_ in RESULTS else load_baselines()
+    assert results[compact]["seconds"] < results[json_]["seconds"]
@@ -13,9 +13,50 @@ import pytest
 from requests import exceptions, get
 
 from tests import FIXTURE_DIR
+from text2sparql_client.commands import serve
 from text2sparql_client.commands.serve import run_service
 
 
+def run_configured_service(host: str, port: int, settings: dict) -> None:
+    """Start the service with changed settings"""
+    for name, value in settings.items():
+        setattr(serve.settings, name, value)
+    run_service(host, port)
+
+
+def pytest_addoption(parser: pytest.Parser) -> None:
+    """Add the benchmark options"""
+    group = parser.getgroup("benchmarks")
+    group.addoption("--benchmarks", action="store_true", help="Run the benchmark suite.")
+    group.addoption(
+        "--benchmark-threshold",
+        type=float,
+        default=1.0,
+        help="Fail benchmarks slower than the baseline by this fraction.",
+    )
+    group.addoption(
+        "--benchmark-memory-threshold",
+        type=float,
+        default=0.25,
+        help="Fail benchmarks with a higher peak memory than the baseline by this fraction.",
+    )
+    group.addoption(
+        "--update-baselines",
+        action="store_true",
+        help="Store the benchmark results as the new baselines.",
+    )
+
+
+def pytest_collection_modifyitems(config: pytest.Config, items: list[pytest.Item]) -> None:
+    """Skip the benchmarks unless requested"""
+    if config.getoption("--benchmarks") or config.getoption("--update-baselines"):
+        return
+    skip = pytest.mark.skip(reason="benchmarks need --benchmarks")
+    for item in items:
+        if item.get_closest_marker("benchmark") is not None:
+            item.add_marker(skip)
+
+
 class ServerFixture:
     """Server fixture"""
 
@@ -24,9 +65,10 @@ class ServerFixture:
     port: int
     process: Process
 
-    def __init__(self, host: str, port: int):
+    def __init__(self, host: str, port: int, settings: dict | None = None):
         self.host = host
         self.port = port
+        self.settings = settings
 
     def get_url(self) -> str:
         """Get URL of the Service"""
@@ -38,7 +80,14 @@ class ServerFixture:
 
     def start(self) -> None:
         """Start the Service"""
-        self.process = Process(target=run_service, args=(self.host, self.port), daemon=True)
+        if self.settings is None:
+            self.process = Process(target=run_service, args=(self.host, self.port), daemon=True)
+        else:
+            self.process = Process(
+                target=run_configured_service,
+                args=(self.host, self.port, self.settings),
+                daemon=True,
+            )
         self.process.start()
         is_up = False
         test_tries = 0
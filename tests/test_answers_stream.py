@@ -0,0 +1,47 @@
+"""test answers stream"""
+
+import json
+from pathlib import Path
+
+from tests.conftest import ResponsesFiles
+from text2sparql_client.utils.answers_stream import (
+    AnswersStream,
+    finalize_answers,
+    partial_output_file,
+)
+
+
+def test_json_output_layout(responses_files: ResponsesFiles) -> None:
+    """Test that streamed JSON output is identical to a dumped list."""
+    answers = json.loads(responses_files.responses.read_text())
+    with AnswersStream(output="output.json") as stream:
+        for answer in answers:
+            stream.write(answer)
+        assert partial_output_file("output.json").exists()
+    assert not partial_output_file("output.json").exists()
+    assert Path("output.json").read_text() == json.dumps(answers, indent=2)
+    with AnswersStream(output="empty.json"):
+        pass
+    assert Path("empty.json").read_text() == "[]"
+
+
+def test_finalize_truncated_stream(responses_files: ResponsesFiles) -> None:
+    """Test finalizing an NDJSON stream from an interrupted run."""
+    answers = json.loads(responses_files.responses.read_text())
+    stream = Path("output.ndjson")
+    lines = [json.dumps(answer) for answer in answers]
+    stream.write_text("\n".join(lines) + "\n" + lines[0][:20])
+    assert finalize_answers(stream=stream, output="output.json") == len(answers)
+    assert json.loads(Path("output.json").read_text()) == answers
+
+
+def test_finalize_ordered_stream() -> None:
+    """Test finalizing an NDJSON stream in the order of the answer keys."""
+    keys = ["ds:1-en", "ds:1-de", "ds:2-en"]
+    answers = [{"qname": key, "query": f"SELECT '{key}'"} for key in keys]
+    unknown = {"question": "unknown", "query": "ASK {}"}
+    stream = Path("output.ndjson")
+    lines = [json.dumps(answer) for answer in (answers[2], unknown, answers[0], answers[1])]
+    stream.write_text("\n".join(lines) + "\n\n" + lines[0][:20])
+    assert finalize_answers(stream=stream, output="output.json", order=keys) == len(lines)
+    assert json.loads(Path("output.json").read_text()) == [*answers, unknown]
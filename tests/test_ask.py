@@ -1,5 +1,9 @@
 """Test queries"""
 
+import json
+import sqlite3
+from pathlib import Path
+
 from tests import run, run_asserting_error, run_without_assertion
 from tests.conftest import QuestionsFiles, ServerFixture, is_json_file
 
@@ -51,6 +55,7 @@ def test_timeout_handling_and_loggin(
     assert "Read timed out" in result.output
     assert "Retrying" in result.output
     assert "Maximum number of retries reached" in result.output
+    assert "Answered 0 of 6 questions (0 skipped for invalid responses, 6 failed)" in result.output
 
 
 def test_output(server: ServerFixture, questions_files: QuestionsFiles) -> None:
@@ -68,5 +73,138 @@ def test_cached_response(server: ServerFixture, questions_files: QuestionsFiles)
     """Test cached response."""
     command = ("ask", str(questions_files.with_ids), server.get_url())
     assert "Cached response found." not in run(command=command).output
-    assert "Cached response found." in run(command=command).output
+    cached_output = run(command=command).output
+    assert "Cached response found." in cached_output
+    assert "Found cached responses for 6 of 6 questions" in cached_output
     assert "Cached response found." not in run(command=(*command, "--no-cache")).output
+
+
+def test_concurrency(server: ServerFixture, questions_files: QuestionsFiles) -> None:
+    """Test concurrent requests keep the output order."""
+    output = "output.json"
+    result = run(
+        command=(
+            "ask",
+            "--no-cache",
+            "--concurrency",
+            "6",
+            "-o",
+            output,
+            str(questions_files.with_ids),
+            server.get_url(),
+        )
+    )
+    assert "summed latency" in result.output
+    qnames = [answer["qname"] for answer in json.loads(Path(output).read_text())]
+    assert qnames == [f"cd25:{id_}-{lang}" for id_ in (1, 2, 3) for lang in ("en", "de")]
+    assert result.t_duration is not None
+    assert result.t_duration < 6 * 3, "Questions should be answered in parallel."
+
+
+def test_ndjson_output(server: ServerFixture, questions_files: QuestionsFiles) -> None:
+    """Test NDJSON output."""
+    output = "output.ndjson"
+    run(
+        command=(
+            "ask",
+            "--output-format",
+            "ndjson",
+            "-o",
+            output,
+            str(questions_files.with_ids),
+            server.get_url(),
+        )
+    )
+    lines = Path(output).read_text().splitlines()
+    assert [json.loads(line)["qname"] for line in lines][:2] == ["cd25:1-en", "cd25:1-de"]
+
+
+def test_resume(server: ServerFixture, questions_files: QuestionsFiles) -> None:
+    """Test resuming an interrupted run."""
+    output = "output.json"
+    resumed = [
+        {"dataset": "...", "question": "...", "query": "resumed", "qname": f"cd25:{qname}"}
+        for qname in ("2-de", "1-en")
+    ]
+    Path(f"{output}.partial").write_text("\n".join(json.dumps(answer) for answer in resumed))
+    command = ("ask", "--no-cache", "-o", output, str(questions_files.with_ids), server.get_url())
+    run_asserting_error(command=command, match="already exists.")
+    result = run(command=(*command, "--resume"))
+    assert "Resuming run with 4 of 6 questions left to ask." in result.output
+    answers = json.loads(Path(output).read_text())
+    assert [answer["qname"] for answer in answers] == [
+        f"cd25:{id_}-{lang}" for id_ in (1, 2, 3) for lang in ("en", "de")
+    ]
+    assert [answer["query"] for answer in answers].count("resumed") == len(resumed)
+    assert not Path(f"{output}.partial").exists()
+
+
+def test_finalize(questions_files: QuestionsFiles) -> None:
+    """Test finalizing the partial output of an interrupted run."""
+    output = "output.json"
+    partial = [
+        {"dataset": "...", "question": "...", "query": "partial", "qname": f"cd25:{qname}"}
+        for qname in ("2-de", "1-en", "1-de")
+    ]
+    command = ("ask", "--finalize", "-o", output, str(questions_files.with_ids), "-")
+    run_asserting_error(command=command, match="not found.")
+    Path(f"{output}.partial").write_text("\n".join(json.dumps(answer) for answer in partial))
+    result = run(command=command)
+    assert f"Wrote 3 answers from {output}.partial to {output}." in result.output
+    answers = json.loads(Path(output).read_text())
+    assert [answer["qname"] for answer in answers] == ["cd25:1-en", "cd25:1-de", "cd25:2-de"]
+    assert not Path(f"{output}.partial").exists()
+    run_asserting_error(command=(*command, "--output-format", "ndjson"), match="needs a JSON")
+
+
+def test_run_summary(server: ServerFixture, questions_files: QuestionsFiles) -> None:
+    """Test the run summary and the recorded attempts."""
+    output = "output.json"
+    run(command=("ask", "-o", output, str(questions_files.with_ids), server.get_url()))
+    summary = json.loads(Path(f"{output}.summary.json").read_text())
+    assert summary["questions"] == summary["answers"] == summary["requests"] == 6  # noqa: PLR2004
+    assert summary["outcomes"] == {"success": 6}
+    assert set(summary["latency"]) == {"mean", "p50", "p90", "p99", "max"}
+    assert summary["ttfb"]["max"] <= summary["latency"]["max"]
+    assert summary["bytes"] > 0
+    Path(output).unlink()
+    run(command=("ask", "-o", output, str(questions_files.with_ids), server.get_url()))
+    summary = json.loads(Path(f"{output}.summary.json").read_text())
+    assert summary["outcomes"] == {"cache_hit": 6}
+    assert summary["requests"] == 0
+    with sqlite3.connect("responses.db") as connection:
+        outcomes = connection.execute(
+            "SELECT outcome, count(*) FROM responses GROUP BY outcome ORDER BY outcome"
+        ).fetchall()
+    assert outcomes == [("success", 6)], "Cache hits should not add rows."
+
+
+def test_retry_dropped_connections(questions_files: QuestionsFiles) -> None:
+    """Test that connections dropped during the response are retried."""
+    dropping = ServerFixture(
+        host="127.0.0.1", port=8006, settings={"sleep": 0, "drop_rate": 0.5, "seed": 1}
+    )
+    dropping.start()
+    try:
+        output = "output.json"
+        result = run(
+            command=(
+                "ask",
+                "--retries",
+                "10",
+                "--retry-sleep",
+                "0",
+                "--retries-log",
+                "-",
+                "-o",
+                output,
+                str(questions_files.with_ids),
+                dropping.get_url(),
+            )
+        )
+    finally:
+        dropping.kill()
+    assert "Retrying" in result.output
+    assert len(json.loads(Path(output).read_text())) == 6  # noqa: PLR2004
+    summary = json.loads(Path(f"{output}.summary.json").read_text())
+    assert summary["retries"] == summary["outcomes"]["retry"] > 0
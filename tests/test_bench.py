@@ -0,0 +1,100 @@
+"""test bench"""
+
+import json
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from tests import run, run_asserting_error
+from tests.conftest import QuestionsFiles, ServerFixture
+from text2sparql_client.bench import (
+    FIXED_RATE,
+    OK,
+    POISSON,
+    arrival_times,
+    run_closed_loop,
+    run_open_loop,
+)
+from text2sparql_client.metrics import histogram, report
+
+
+def test_arrival_times() -> None:
+    """Test fixed-rate and Poisson arrivals."""
+    assert arrival_times(FIXED_RATE, 4, rate=2) == [0, 0.5, 1, 1.5]
+    times = arrival_times(POISSON, 10_000, rate=100, seed=1)
+    assert times[0] == 0
+    assert np.mean(np.diff(times)) == pytest.approx(0.01, rel=0.05)
+    assert arrival_times(POISSON, 10, rate=100, seed=1) == times[:10]
+
+
+def test_report() -> None:
+    """Test the latency percentiles, outcomes and histogram."""
+    samples = [(index / 1000, "ok") for index in range(1, 101)]
+    samples[-1] = (0.1, "http_503")
+    summary = report(samples, wall_clock=2, ok=(OK,))
+    assert summary["qps"] == 50  # noqa: PLR2004
+    assert summary["error_rate"] == 0.01  # noqa: PLR2004
+    assert summary["outcomes"] == {"ok": 99, "http_503": 1}
+    assert summary["latency"]["p50"] == pytest.approx(0.0505)
+    assert summary["latency"]["max"] == 0.1  # noqa: PLR2004
+    buckets = histogram(np.array([latency for latency, _ in samples]))
+    assert sum(bucket["count"] for bucket in buckets) == len(samples)
+    assert buckets[-1]["le"] >= 0.1  # noqa: PLR2004
+    assert report([], wall_clock=0, ok=(OK,))["latency"] == {}
+
+
+def test_loops() -> None:
+    """Test that both loops send each request once."""
+    sent: list[str] = []
+
+    def send(question: str) -> str:
+        sent.append(question)
+        return "ok"
+
+    samples, _ = run_closed_loop(send, ["a", "b"], count=5, concurrency=2)
+    assert len(samples) == len(sent) == 5  # noqa: PLR2004
+    assert sorted(sent) == ["a", "a", "a", "b", "b"]
+    sent.clear()
+    samples, wall_clock = run_open_loop(
+        send, ["a"], arrival_times(FIXED_RATE, 5, rate=50), concurrency=2
+    )
+    assert len(samples) == len(sent) == 5  # noqa: PLR2004
+    assert wall_clock >= 0.08  # noqa: PLR2004
+
+
+def test_bench_command(questions_files: QuestionsFiles, tmp_path: Path) -> None:
+    """Test a benchmark against the serve stub with injected errors."""
+    server = ServerFixture(
+        host="127.0.0.1", port=8005, settings={"sleep": 0, "error_rate": 0.5, "seed": 1}
+    )
+    server.start()
+    try:
+        output = tmp_path / "bench.json"
+        run(
+            command=(
+                "bench",
+                "--mode",
+                "poisson",
+                "--rate",
+                "200",
+                "-n",
+                "100",
+                "-c",
+                "4",
+                "-o",
+                str(output),
+                str(questions_files.questions),
+                server.get_url(),
+            )
+        )
+        summary = json.loads(output.read_text())
+        assert summary["requests"] == 100  # noqa: PLR2004
+        assert 0 < summary["error_rate"] < 1
+        assert set(summary["latency"]) == {"mean", "p50", "p90", "p99", "max"}
+    finally:
+        server.kill()
+    run_asserting_error(
+        command=("bench", "--mode", "poisson", str(questions_files.questions), server.get_url()),
+        match="needs a request rate",
+    )
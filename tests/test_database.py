@@ -0,0 +1,261 @@
+"""test database"""
+
+import pickle
+import sqlite3
+import statistics
+from datetime import timedelta
+from pathlib import Path
+from time import perf_counter
+
+import pytest
+from requests import ConnectTimeout, Response
+
+from text2sparql_client.database import (
+    SCHEMA_VERSION,
+    Database,
+    lookup_key,
+    read_recorded_responses,
+)
+from text2sparql_client.metrics import RETRY, SUCCESS, VALIDATION_ERROR, RequestMetrics
+
+ENDPOINT = "http://127.0.0.1:8000"
+DATASET = "https://text2sparql.aksw.org/2025/corporate/"
+BODY = '{"dataset": "x", "question": "y", "query": "SELECT * WHERE {?s ?p ?o}"}'
+
+
+def create_response(body: str) -> Response:
+    """Create a successful response object"""
+    response = Response()
+    response.status_code = 200
+    response.encoding = "utf-8"
+    response._content = body.encode()  # noqa: SLF001
+    response.elapsed = timedelta(seconds=1.5)
+    return response
+
+
+def create_pickled_database(file: Path) -> None:
+    """Create a database in the old format with pickled responses and exceptions"""
+    response = create_response(BODY)
+    connection = sqlite3.connect(file)
+    with connection:
+        connection.execute(
+            """
+            CREATE TABLE responses (
+                id INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT,
+                time VARCHAR, endpoint VARCHAR, dataset VARCHAR, question VARCHAR,
+                response VARCHAR, exception VARCHAR
+            )
+            """
+        )
+        connection.execute(
+            "INSERT INTO responses VALUES (1, '2025-01-01', ?, ?, 'answered', ?, NULL)",
+            (ENDPOINT, DATASET, pickle.dumps(response)),
+        )
+        connection.execute(
+            "INSERT INTO responses VALUES (2, '2025-01-02', ?, ?, 'failed', NULL, ?)",
+            (ENDPOINT, DATASET, pickle.dumps(ConnectTimeout("too slow"))),
+        )
+    connection.close()
+
+
+def test_migrate_pickled_responses(tmp_path: Path) -> None:
+    """Test migration of pickled responses to the typed schema."""
+    file = tmp_path / "responses.db"
+    create_pickled_database(file)
+    database = Database(file=file)
+    assert database.get_response(endpoint=ENDPOINT, dataset=DATASET, question="answered") == BODY
+    assert database.get_response(endpoint=ENDPOINT, dataset=DATASET, question="failed") is None
+    rows = database.connection.execute(
+        "SELECT status_code, latency, exception_type, exception_message FROM responses"
+    ).fetchall()
+    assert rows == [(200, 1.5, None, None), (None, None, "ConnectTimeout", "too slow")]
+    assert database.connection.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION
+    # opening the migrated database again is a no-op
+    assert Database(file=file).get_response(ENDPOINT, DATASET, "answered") == BODY
+
+
+def fill_database(database: Database, start: int, stop: int) -> None:
+    """Add answered questions with long question texts to the database"""
+    with database.connection as connection:
+        connection.executemany(
+            """
+            INSERT INTO responses (time, endpoint, dataset, question, body, lookup_key)
+            VALUES ('2025-01-01', ?, ?, ?, ?, ?)
+            """,
+            (
+                (ENDPOINT, DATASET, question, BODY, lookup_key(ENDPOINT, DATASET, question))
+                for question in (
+                    f"{number} {'long question text ' * 20}" for number in range(start, stop)
+                )
+            ),
+        )
+
+
+def median_lookup_time(database: Database, count: int) -> float:
+    """Median time of looking up existing questions"""
+    timings = []
+    for number in range(count):
+        question = f"{number} {'long question text ' * 20}"
+        started = perf_counter()
+        assert database.get_response(ENDPOINT, DATASET, question) == BODY
+        timings.append(perf_counter() - started)
+    return statistics.median(timings)
+
+
+def test_lookup_uses_index(tmp_path: Path) -> None:
+    """Test that cache lookups and updates are index lookups instead of table scans."""
+    database = Database(file=tmp_path / "responses.db")
+    plan = database.connection.execute(
+        """
+        EXPLAIN QUERY PLAN SELECT body from responses
+        WHERE lookup_key=? AND endpoint=? AND dataset=? AND question=?
+        ORDER BY time DESC LIMIT 1
+        """,
+        (1, ENDPOINT, DATASET, "question"),
+    ).fetchall()
+    assert "USING INDEX responses_lookup" in str(plan)
+    row_id = database.register_question("2025-01-01", ENDPOINT, DATASET, "question")
+    database.add_exception(row_id=row_id, exception=ConnectTimeout("too slow"))
+    assert database.get_response(ENDPOINT, DATASET, "question") is None
+
+
+@pytest.mark.benchmark
+def test_lookup_time_stays_flat(tmp_path: Path) -> None:
+    """Benchmark cache lookups with a growing table (test_lookup_uses_index checks the plan)."""
+    database = Database(file=tmp_path / "responses.db")
+    fill_database(database, 0, 1_000)
+    small = median_lookup_time(database, count=200)
+    fill_database(database, 1_000, 100_000)
+    large = median_lookup_time(database, count=200)
+    assert large < small * 5, f"Lookup time grows with table size: {small:.6f}s -> {large:.6f}s"
+
+
+def test_get_responses(tmp_path: Path) -> None:
+    """Test bulk lookup of cached responses."""
+    database = Database(file=tmp_path / "responses.db")
+    fill_database(database, 0, 100)
+    latest = database.register_question("2025-01-02", ENDPOINT, DATASET, "latest")
+    database.add_response(row_id=latest, response=create_response('{"latest": true}'))
+    older = database.register_question("2025-01-01", ENDPOINT, DATASET, "latest")
+    database.add_response(row_id=older, response=create_response(BODY))
+    failed = database.register_question("2025-01-03", ENDPOINT, DATASET, "failed")
+    database.add_exception(row_id=failed, exception=ConnectTimeout("too slow"))
+    questions = [f"{number} {'long question text ' * 20}" for number in range(50, 150)]
+    responses = database.get_responses(
+        endpoint=ENDPOINT, dataset=DATASET, questions=[*questions, "latest", "failed"]
+    )
+    assert len(responses) == 51  # noqa: PLR2004
+    assert responses["latest"] == '{"latest": true}'
+    assert "failed" not in responses
+    assert database.get_responses(endpoint="other", dataset=DATASET, questions=questions) == {}
+
+
+def test_get_recorded_responses(tmp_path: Path) -> None:
+    """Test reading all successful responses for a replay."""
+    database = Database(file=tmp_path / "responses.db")
+    for number in range(10):
+        row_id = database.register_question("2025-01-02", ENDPOINT, DATASET, f"{number}")
+        database.add_response(row_id=row_id, response=create_response(BODY))
+    error = database.register_question("2025-01-03", ENDPOINT, DATASET, "error")
+    error_response = create_response("Internal Server Error")
+    error_response.status_code = 500
+    database.add_response(row_id=error, response=error_response)
+    failed = database.register_question("2025-01-03", ENDPOINT, DATASET, "failed")
+    database.add_exception(row_id=failed, exception=ConnectTimeout("too slow"))
+    other = database.register_question("2025-01-03", "other", DATASET, "other")
+    database.add_response(row_id=other, response=create_response(BODY))
+    recorded = database.get_recorded_responses(endpoint=ENDPOINT)
+    assert len(recorded) == 10  # noqa: PLR2004
+    assert all(latency == 1.5 for _, _, _, latency in recorded)  # noqa: PLR2004
+    assert {question for _, question, _, _ in recorded}.isdisjoint({"error", "failed"})
+    assert len(database.get_recorded_responses()) == 11  # noqa: PLR2004
+    database.connection.close()
+    file = tmp_path / "responses.db"
+    content = file.read_bytes()
+    assert read_recorded_responses(file, endpoint=ENDPOINT) == recorded
+    assert file.read_bytes() == content, "Reading a recording must not change it."
+
+
+def test_migrate_schema_version_1(tmp_path: Path) -> None:
+    """Test that a typed database without lookup keys gets them (and the metrics columns)."""
+    file = tmp_path / "responses.db"
+    with sqlite3.connect(file) as connection:
+        connection.execute(
+            """
+            CREATE TABLE responses (
+                id INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT, time VARCHAR, endpoint VARCHAR,
+                dataset VARCHAR, question VARCHAR, status_code INTEGER, latency REAL, body TEXT,
+                exception_type VARCHAR, exception_message VARCHAR
+            )
+            """
+        )
+        connection.execute(
+            """
+            INSERT INTO responses (time, endpoint, dataset, question, body)
+            VALUES (?, ?, ?, ?, ?)
+            """,
+            ("2025-01-01", ENDPOINT, DATASET, "answered", BODY),
+        )
+        connection.execute("PRAGMA user_version = 1")
+    database = Database(file=file)
+    assert database.get_response(ENDPOINT, DATASET, "answered") == BODY
+    assert database.connection.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION
+
+
+def test_newer_schema_is_refused(tmp_path: Path) -> None:
+    """Test that a database of a newer client version is not opened."""
+    file = tmp_path / "responses.db"
+    Database(file=file).connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION + 1}")
+    with pytest.raises(sqlite3.DatabaseError, match="Please upgrade"):
+        Database(file=file)
+
+
+def test_read_recorded_responses_errors(tmp_path: Path) -> None:
+    """Test that recordings are never created or migrated when read."""
+    missing = tmp_path / "missing.db"
+    with pytest.raises(ValueError, match="Could not open"):
+        read_recorded_responses(missing)
+    assert not missing.exists()
+    pickled = tmp_path / "pickled.db"
+    create_pickled_database(pickled)
+    content = pickled.read_bytes()
+    with pytest.raises(ValueError, match="older version"):
+        read_recorded_responses(pickled)
+    assert pickled.read_bytes() == content
+
+
+def test_attempt_metrics(tmp_path: Path) -> None:
+    """Test recording the timings and outcome of each attempt."""
+    file = tmp_path / "responses.db"
+    with sqlite3.connect(file) as connection:
+        connection.execute(
+            """
+            CREATE TABLE responses (
+                id INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT, time VARCHAR, endpoint VARCHAR,
+                dataset VARCHAR, question VARCHAR, status_code INTEGER, latency REAL, body TEXT,
+                exception_type VARCHAR, exception_message VARCHAR, lookup_key INTEGER
+            )
+            """
+        )
+        connection.execute("PRAGMA user_version = 2")
+    database = Database(file=file)
+    metrics = RequestMetrics()
+    metrics.connect, metrics.total, metrics.size = 0.1, 2.0, len(BODY)
+    answered = database.register_question("2025-01-01", ENDPOINT, DATASET, "answered")
+    database.add_response(row_id=answered, response=create_response(BODY), metrics=metrics)
+    failed = database.register_question("2025-01-02", ENDPOINT, DATASET, "failed")
+    metrics.outcome = RETRY
+    database.add_exception(row_id=failed, exception=ConnectTimeout("too slow"), metrics=metrics)
+    invalid = database.register_question("2025-01-03", ENDPOINT, DATASET, "invalid")
+    database.add_response(row_id=invalid, response=create_response("{}"))
+    database.set_outcome(row_id=invalid, outcome=VALIDATION_ERROR)
+    rows = database.connection.execute(
+        "SELECT question, latency, connect_time, total_time, bytes, outcome FROM responses"
+    ).fetchall()
+    assert rows == [
+        ("answered", 1.5, 0.1, 2.0, len(BODY), SUCCESS),
+        ("failed", None, 0.1, 2.0, len(BODY), RETRY),
+        ("invalid", 1.5, None, None, None, VALIDATION_ERROR),
+    ]
+    assert database.get_response(ENDPOINT, DATASET, "answered") == BODY
+    assert database.connection.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION
@@ -1,7 +1,13 @@
 """Test evaluate"""
 
+import json
+from pathlib import Path
+
 from tests import run, run_asserting_error
 from tests.conftest import ResultSetsFiles, is_json_file
+from text2sparql_client.commands.evaluate import generate_language_averages
+from text2sparql_client.utils.evaluation_metrics import ResultTable, combine_averages
+from text2sparql_client.utils.result_set_file import write_result_set
 
 
 def test_successful_evaluation(result_sets_files: ResultSetsFiles) -> None:
@@ -33,15 +39,22 @@ def test_language_evaluation_error(result_sets_files: ResultSetsFiles) -> None:
 
 def test_missing_question_true_result_set(result_sets_files: ResultSetsFiles) -> None:
     """Test missing question in true result-set."""
-    run_asserting_error(
-        command=(
-            "evaluate",
-            "api_name",
-            str(result_sets_files.result_set_missing),
-            str(result_sets_files.result_set),
-        ),
-        match="KeyError",
-    )
+    for mode in ("--batched", "--per-question", "--engine=numpy"):
+        output = f"output{mode}.json"
+        run(
+            command=(
+                "evaluate",
+                mode,
+                "-o",
+                output,
+                "api_name",
+                str(result_sets_files.result_set_missing),
+                str(result_sets_files.result_set),
+            )
+        )
+        results = json.loads(Path(output).read_text())
+        assert "ck25:3-en" not in results
+        assert "average" in results
 
 
 def test_output_evaluation(result_sets_files: ResultSetsFiles) -> None:
@@ -69,3 +82,94 @@ def test_output_evaluation(result_sets_files: ResultSetsFiles) -> None:
         match="already exists.",
     )
     assert is_json_file(output), "Output file should be JSON."
+
+
+def test_truncated_evaluation(result_sets_files: ResultSetsFiles) -> None:
+    """Test that the list of truncated results is not evaluated as a question."""
+    result_set = json.loads(result_sets_files.result_set.read_text())
+    result_set["truncated"] = [next(iter(result_set))]
+    Path("truncated.json").write_text(json.dumps(result_set))
+    run(command=("evaluate", "-o", "output.json", "api_name", "truncated.json", "truncated.json"))
+    assert "truncated" not in json.loads(Path("output.json").read_text())
+
+
+def test_language_averages() -> None:
+    """Test that averages are grouped by the language suffix of the qnames."""
+    results = {
+        "gen:1-en": {"set_F": 1.0, "ndcg": 0.5},
+        "gen:2-en": {"set_F": 0.5},
+        "gen:1-de": {"set_F": 0.0},
+        "gen:2-de": {"set_F": 0.25, "ndcg": 1.0},
+        "average": {"set_F": 0.4375, "ndcg": 0.75},
+    }
+    table = ResultTable(results, metrics=["set_F", "ndcg"])
+    assert list(table.languages) == ["en", "en", "de", "de"]
+    generate_language_averages(results, ["en", "de"], ["set_F", "ndcg"], table=table)  # type: ignore[list-item]
+    assert results["average-en"] == {"set_F": 0.75, "ndcg": 0.5}
+    assert results["average-de"] == {"set_F": 0.125, "ndcg": 1.0}
+    for language in ("en", "de"):
+        combine_averages(
+            results, "ndcg", average_field=f"average-{language}", language=language, table=table
+        )
+    combine_averages(results, "ndcg")
+    assert results["average-en"]["set_F_ndcg"] == 0.5  # noqa: PLR2004
+    assert results["average-de"]["set_F_ndcg"] == 0.5  # noqa: PLR2004
+    assert results["average"]["set_F_ndcg"] == 0.5  # noqa: PLR2004
+
+
+def test_multi_system_evaluation(result_sets_files: ResultSetsFiles) -> None:
+    """Test evaluation of several systems in one pass."""
+    Path("systems").mkdir()
+    result_set = json.loads(result_sets_files.result_set.read_text())
+    Path("systems/perfect.json").write_text(json.dumps(result_set))
+    write_result_set({qname: {} for qname in result_set}, "systems/empty.rsbin")
+    for workers in ("1", "2"):
+        output = f"systems-{workers}.json"
+        run(
+            command=(
+                "evaluate",
+                "-w",
+                workers,
+                "-o",
+                output,
+                "api_name",
+                str(result_sets_files.result_set),
+                "systems",
+                str(result_sets_files.result_set_missing),
+            )
+        )
+        results = json.loads(Path(output).read_text())
+        assert list(results) == ["empty", "perfect", "result_set_missing"]
+        assert results["perfect"]["average"]["set_F"] == 1.0
+        assert results["empty"]["average"]["set_F"] == 0.0
+    run(
+        command=(
+            "evaluate",
+            "--output-format",
+            "leaderboard",
+            "-o",
+            "leaderboard.md",
+            "api_name",
+            str(result_sets_files.result_set),
+            "systems",
+        )
+    )
+    lines = Path("leaderboard.md").read_text().splitlines()
+    assert lines[0] == "| Rank | System | set_F | set_P | set_recall |"
+    assert lines[2].startswith("| 1 | perfect | 1.0000 |")
+    assert lines[3].startswith("| 2 | empty | 0.0000 |")
+    Path("no-systems").mkdir()
+    run_asserting_error(
+        command=("evaluate", "api_name", str(result_sets_files.result_set), "no-systems"),
+        match="No prediction files found in no-systems",
+    )
+
+
+def test_compact_evaluation(result_sets_files: ResultSetsFiles) -> None:
+    """Test that compact result sets give the same results as JSON result sets."""
+    result_set = json.loads(result_sets_files.result_set.read_text())
+    write_result_set(result_set, "result_set.rsbin")
+    true_set = str(result_sets_files.result_set)
+    run(command=("evaluate", "-o", "json.json", "api", true_set, true_set))
+    run(command=("evaluate", "-o", "compact.json", "api", "result_set.rsbin", "result_set.rsbin"))
+    assert Path("compact.json").read_text() == Path("json.json").read_text()
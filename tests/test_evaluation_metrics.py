@@ -0,0 +1,105 @@
+"""test evaluation metrics"""
+
+import random
+from collections import Counter
+from collections.abc import Iterator, Mapping
+from time import perf_counter
+from typing import Any
+
+import pytest
+
+from text2sparql_client.utils.evaluation_metrics import Evaluation
+
+
+def create_result_sets(count: int, seed: int = 42) -> tuple[dict, dict]:
+    """Create a random ground truth and prediction with overlapping result values"""
+    generator = random.Random(seed)  # noqa: S311
+    ground_truth = {}
+    predicted = {}
+    for number in range(count):
+        values = [f"http://example.org/{value}" for value in range(generator.randint(0, 30))]
+        ground_truth[f"ds:{number}-en"] = dict.fromkeys(values, 1)
+        predicted[f"ds:{number}-en"] = dict.fromkeys(generator.sample(values, len(values) // 2), 1)
+        predicted[f"ds:{number}-en"][f"http://example.org/wrong/{number}"] = 1
+    return ground_truth, predicted
+
+
+class CountingResultSet(Mapping[str, Any]):
+    """Result set that counts the lookups of each question (like decodes of a compact one)"""
+
+    def __init__(self, result_set: dict) -> None:
+        self.result_set = result_set
+        self.lookups: Counter[str] = Counter()
+
+    def __getitem__(self, key: str) -> Any:  # noqa: ANN401
+        """Count and return the entries of a question"""
+        self.lookups[key] += 1
+        return self.result_set[key]
+
+    def __iter__(self) -> Iterator[str]:
+        """Iterate over the question IDs"""
+        return iter(self.result_set)
+
+    def __len__(self) -> int:
+        """Count the questions"""
+        return len(self.result_set)
+
+    def __contains__(self, key: object) -> bool:
+        """Check for a question without counting a lookup"""
+        return key in self.result_set
+
+
+def test_batched_evaluation() -> None:
+    """Test that batched and per question evaluation give identical results."""
+    ground_truth, predicted = create_result_sets(200)
+    predicted["ds:missing-en"] = {"http://example.org/1": 1}
+    for metrics in ({"set_F", "set_P", "set_recall"}, {"ndcg"}):
+        evaluation = Evaluation("api", metrics=metrics)
+        batched = evaluation.evaluate(predicted, ground_truth, batched=True)
+        per_question = evaluation.evaluate(predicted, ground_truth, batched=False)
+        assert list(batched.items()) == list(per_question.items())
+        assert "ds:missing-en" not in batched
+
+
+def test_evaluation_benchmark() -> None:
+    """Benchmark batched, per question and numpy evaluation."""
+    ground_truth, predicted = create_result_sets(5_000)
+    timings = {}
+    for name, engine, batched in (
+        ("batched", "pytrec_eval", True),
+        ("per question", "pytrec_eval", False),
+        ("numpy", "numpy", True),
+    ):
+        evaluation = Evaluation("api", engine=engine)
+        started = perf_counter()
+        evaluation.evaluate(predicted, ground_truth, batched=batched)
+        timings[name] = perf_counter() - started
+    assert timings["batched"] < timings["per question"], f"Batched evaluation is slower: {timings}"
+    assert timings["numpy"] < timings["per question"], f"Numpy evaluation is slower: {timings}"
+
+
+def test_numpy_engine() -> None:
+    """Test that the numpy engine agrees exactly with pytrec_eval."""
+    ground_truth, predicted = create_result_sets(500)
+    ground_truth.update({"ask:1-en": {"true": 0}, "ask:2-en": {"true": 1}, "empty:1-en": {}})
+    predicted.update({"ask:1-en": {"true": 0}, "ask:2-en": {"true": 1}, "empty:1-en": {"x": 1}})
+    ground_truth["ds:1-en"]["http://example.org/not-relevant"] = 0
+    predicted["ds:2-en"] = {}
+    for metrics in ({"set_F", "set_P", "set_recall"}, {"set_F"}):
+        expected = Evaluation("api", metrics=metrics).evaluate(predicted, ground_truth)
+        numpy = Evaluation("api", metrics=metrics, engine="numpy").evaluate(predicted, ground_truth)
+        assert list(numpy.items()) == list(expected.items())
+    with pytest.raises(ValueError, match="only supports"):
+        Evaluation("api", metrics={"ndcg"}, engine="numpy")
+
+
+def test_numpy_engine_looks_up_questions_once() -> None:
+    """Test that the numpy engine looks up the entries of each question only once."""
+    ground_truth, predicted = create_result_sets(100)
+    counting_truth = CountingResultSet(ground_truth)
+    counting_predicted = CountingResultSet(predicted)
+    expected = Evaluation("api", engine="numpy").evaluate(predicted, ground_truth)
+    results = Evaluation("api", engine="numpy").evaluate(counting_predicted, counting_truth)
+    assert list(results.items()) == list(expected.items())
+    assert set(counting_truth.lookups.values()) == {1}
+    assert max(counting_predicted.lookups.values()) == 1
@@ -1,7 +1,16 @@
 """Test query"""
 
+import json
+import random
+from pathlib import Path
+from time import sleep
+
+import pytest
+
 from tests import run, run_asserting_error
 from tests.conftest import QuestionsFiles, ResponsesFiles, is_json_file
+from text2sparql_client.commands import query
+from text2sparql_client.utils.result_set_file import load_result_set
 
 
 def test_successful_true_query(questions_files: QuestionsFiles) -> None:
@@ -84,3 +93,111 @@ def test_output_query(questions_files: QuestionsFiles, responses_files: Response
         match="already exists.",
     )
     assert is_json_file(output), "Output file should be JSON."
+
+
+def fake_get_json(query: str, endpoint: str, cache: object = None) -> dict:  # noqa: ARG001
+    """Return a result with a single binding after a random delay"""
+    sleep(random.uniform(0, 0.05))  # noqa: S311
+    return {
+        "head": {"vars": ["x"]},
+        "results": {"bindings": [{"x": {"type": "uri", "value": f"{endpoint}/{query.strip()}"}}]},
+    }
+
+
+def test_parallel_queries(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test that parallel query execution gives the same result set."""
+    monkeypatch.setattr(query, "get_json", fake_get_json)
+    test_dataset = {
+        "dataset": {"prefix": "ds"},
+        "questions": [
+            {"id": number, "query": {"sparql": f"query {number}"}} for number in range(20)
+        ],
+    }
+    answers = [{"qname": f"ds:{number}-de", "query": f"answer {number}"} for number in range(10)]
+    languages: list = ["en", "de"]
+    sequential = query.generate_true_result_set(test_dataset, "ep", languages)
+    parallel = query.generate_true_result_set(test_dataset, "ep", languages, workers=8)
+    assert list(parallel.items()) == list(sequential.items())
+    assert parallel["ds:3-de"] == {"ep/query 3": 1}
+    sequential = query.generate_pred_result_set(answers, test_dataset, "ep", languages)
+    parallel = query.generate_pred_result_set(answers, test_dataset, "ep", languages, workers=8)
+    assert list(parallel.items()) == list(sequential.items())
+    assert parallel["ds:3-de"] == {"ep/answer 3": 1}
+    assert parallel["ds:3-en"] == {}
+
+
+def test_deduplicated_queries(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test that identical queries are executed only once."""
+    executed: list[str] = []
+
+    def counting_get_json(query: str, endpoint: str, cache: object = None) -> dict:
+        executed.append(query)
+        return fake_get_json(query, endpoint, cache)
+
+    monkeypatch.setattr(query, "get_json", counting_get_json)
+    test_dataset = {
+        "dataset": {"prefix": "ds"},
+        "questions": [
+            {"id": number, "query": {"sparql": f"query {number % 5}\n"}} for number in range(10)
+        ],
+    }
+    languages: list = ["en", "de", "es"]
+    ground_truth = query.generate_true_result_set(test_dataset, "ep", languages, workers=4)
+    assert sorted(executed) == [f"query {number}" for number in range(5)]
+    assert len(ground_truth) == 10 * 3
+    assert ground_truth["ds:7-es"] == {"ep/query 2": 1}
+    executed.clear()
+    answers = [{"qname": f"ds:{number}-en", "query": "same"} for number in range(10)]
+    predicted = query.generate_pred_result_set(answers, test_dataset, "ep", languages)
+    assert executed == ["same"]
+    assert predicted["ds:9-en"] == {"ep/same": 1}
+    assert predicted["ds:9-de"] == {}
+
+
+def test_index_answers() -> None:
+    """Test that duplicate qnames keep the first answer."""
+    answers = [
+        {"qname": "ds:1-en", "query": "first"},
+        {"qname": "ds:2-en", "query": "other"},
+        {"qname": "ds:1-en", "query": "second"},
+    ]
+    index = query.index_answers(answers)
+    assert list(index) == ["ds:1-en", "ds:2-en"]
+    assert index["ds:1-en"]["query"] == "first"
+    assert (
+        query.summarize([str(number) for number in range(12)], limit=3) == "0, 1, 2, ... (9 more)"
+    )
+
+
+def test_cached_query(questions_files: QuestionsFiles) -> None:
+    """Test query with the result cache only."""
+    run(
+        command=(
+            "query",
+            str(questions_files.with_ids),
+            "--cache-db",
+            "results.db",
+            "--cache-only",
+            "-o",
+            "output.json",
+        )
+    )
+    assert is_json_file("output.json")
+    run(
+        command=(
+            "query",
+            str(questions_files.with_ids),
+            "--cache-db",
+            "results.db",
+            "--cache-only",
+            "-o",
+            "output.rsbin",
+        )
+    )
+    assert (
+        load_result_set("output.rsbin").keys() == json.loads(Path("output.json").read_text()).keys()
+    )
+    run_asserting_error(
+        command=("query", str(questions_files.with_ids), "--refresh", "--cache-only"),
+        match="--cache-db",
+    )
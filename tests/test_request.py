@@ -0,0 +1,45 @@
+"""test request"""
+
+from requests.adapters import HTTPAdapter
+
+from tests.conftest import ServerFixture
+from text2sparql_client.commands.serve import KNOWN_DATASETS
+from text2sparql_client.metrics import RequestMetrics
+from text2sparql_client.request import Text2SparqlClient
+
+
+def test_client_keeps_connections_alive(server: ServerFixture) -> None:
+    """Test that the client re-uses pooled connections."""
+    with Text2SparqlClient(pool_maxsize=1) as client:
+        for _ in range(3):
+            response = client.get(
+                endpoint=server.get_url(), dataset=KNOWN_DATASETS[0], question="...", timeout=10
+            )
+            assert response.json()["dataset"] == KNOWN_DATASETS[0]
+        adapter = client.session.get_adapter(server.get_url())
+        assert isinstance(adapter, HTTPAdapter)
+        manager = adapter.poolmanager
+        pools = [manager.pools[key] for key in manager.pools.keys()]  # noqa: SIM118
+        assert [pool.num_connections for pool in pools] == [1]
+
+
+def test_client_records_timings(server: ServerFixture) -> None:
+    """Test that the client measures connect time, time to first byte, total time and size."""
+    with Text2SparqlClient(pool_maxsize=1) as client:
+        first, second = RequestMetrics(), RequestMetrics()
+        for metrics in (first, second):
+            response = client.get(
+                endpoint=server.get_url(),
+                dataset=KNOWN_DATASETS[0],
+                question="...",
+                timeout=10,
+                metrics=metrics,
+            )
+    assert first.connect is not None
+    assert first.connect > 0
+    assert second.connect == 0, "A re-used connection should not connect again."
+    for metrics in (first, second):
+        assert metrics.ttfb is not None
+        assert metrics.total is not None
+        assert 0 < metrics.ttfb <= metrics.total
+        assert metrics.size == len(response.content)
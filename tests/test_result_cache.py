@@ -0,0 +1,89 @@
+"""test SPARQL result cache"""
+
+import sqlite3
+from pathlib import Path
+
+from text2sparql_client.result_cache import ONLY, REFRESH, ResultCache, normalize_query
+from text2sparql_client.utils.query_rdf import EMPTY_RESULT, get_json
+
+# nothing listens on port 1, so queries fail fast
+ENDPOINT = "http://127.0.0.1:1/sparql"
+QUERY = 'SELECT ?s WHERE {\n  ?s <http://example.org/label> "a  b" .\n}\n'
+RESULT = {
+    "head": {"vars": ["s"]},
+    "results": {"bindings": [{"s": {"type": "uri", "value": "http://example.org/s"}}]},
+}
+
+
+def test_normalize_query() -> None:
+    """Test that only whitespace outside of string literals is collapsed."""
+    assert normalize_query(QUERY) == 'SELECT ?s WHERE { ?s <http://example.org/label> "a  b" . }'
+    assert normalize_query(QUERY) == normalize_query(" ".join(QUERY.splitlines()))
+    assert normalize_query(QUERY) != normalize_query(QUERY.replace("a  b", "a b"))
+
+
+def test_normalize_commented_query() -> None:
+    """Test that comments are removed and do not swallow the rest of a query."""
+    commented = 'SELECT ?s # note\nWHERE { ?s <http://example.org/label#x> "a # b" . } # end\n'
+    assert normalize_query(commented) == (
+        'SELECT ?s WHERE { ?s <http://example.org/label#x> "a # b" . }'
+    )
+    # collapsing the line break first would let the comment swallow the WHERE clause
+    assert normalize_query("SELECT ?s # x\nWHERE { ?s ?p 1 }") != (
+        normalize_query("SELECT ?s # x WHERE { ?s ?p 1 }")
+    )
+    assert normalize_query('ASK { ?s ?p """a\n  # b""" }') == 'ASK { ?s ?p """a\n  # b""" }'
+
+
+def test_cached_result() -> None:
+    """Test that cached results are returned without querying the endpoint."""
+    cache = ResultCache(file=Path("results.db"))
+    assert get_json(QUERY, ENDPOINT, cache=cache) == EMPTY_RESULT
+    assert cache.get(ENDPOINT, QUERY) is None, "failed queries must not be cached"
+    cache.put(ENDPOINT, QUERY, RESULT)
+    assert get_json("  " + QUERY.replace("\n", " "), ENDPOINT, cache=cache) == RESULT
+    assert cache.get("http://127.0.0.1:2/sparql", QUERY) is None
+    cache.close()
+
+    cache = ResultCache(file=Path("results.db"), mode=ONLY)
+    assert get_json(QUERY, ENDPOINT, cache=cache) == RESULT
+    assert get_json("SELECT * WHERE { ?s ?p ?o }", ENDPOINT, cache=cache) == EMPTY_RESULT
+    cache.close()
+
+    cache = ResultCache(file=Path("results.db"), mode=REFRESH)
+    assert get_json(QUERY, ENDPOINT, cache=cache) == EMPTY_RESULT
+    cache.close()
+
+
+def test_eviction() -> None:
+    """Test that expired and the oldest entries beyond the maximum are evicted."""
+    cache = ResultCache(file=Path("results.db"), max_entries=3)
+    for number in range(5):
+        cache.put(ENDPOINT, f"query {number}", RESULT)
+    with cache.connection as connection:
+        connection.execute("UPDATE results SET time = time - 100 WHERE query = 'query 4'")
+    cache.ttl = 50
+    assert cache.get(ENDPOINT, "query 4") is None
+    assert cache.get(ENDPOINT, "query 3") == RESULT
+    cache.close()
+    queries = [row[0] for row in sqlite3.connect("results.db").execute("SELECT query FROM results")]
+    assert sorted(queries) == ["query 1", "query 2", "query 3"]
+
+
+def test_old_cache_is_cleared() -> None:
+    """Test that entries of a cache without result shapes are dropped."""
+    with sqlite3.connect("results.db") as connection:
+        connection.execute(
+            """
+            CREATE TABLE results (
+                cache_key INTEGER NOT NULL, endpoint VARCHAR NOT NULL, query TEXT NOT NULL,
+                time REAL NOT NULL, result TEXT NOT NULL, PRIMARY KEY (cache_key, endpoint, query)
+            )
+            """
+        )
+        connection.execute("INSERT INTO results VALUES (1, ?, ?, 0, '{}')", (ENDPOINT, QUERY))
+    cache = ResultCache(file=Path("results.db"))
+    assert cache.connection.execute("SELECT count(*) FROM results").fetchone()[0] == 0
+    cache.put(ENDPOINT, QUERY, RESULT)
+    assert cache.get(ENDPOINT, QUERY) == RESULT
+    cache.close()
@@ -0,0 +1,66 @@
+"""test result set files"""
+
+import json
+import pickle
+from pathlib import Path
+
+import pytest
+
+from text2sparql_client.utils.result_set_file import (
+    CompactResultSet,
+    load_result_set,
+    result_set_format,
+    write_result_set,
+)
+
+RESULT_SET = {
+    "ds:1-en": {"http://example.org/ä": 1, "http://example.org/shared": 1},
+    "ds:1-de": {"http://example.org/shared": 1},
+    "ds:2-en": {},
+    "ds:3-en": {"true": 0},
+    "truncated": ["ds:1-en"],
+    "order_required": ["ds:1-en", "ds:1-de"],
+}
+
+
+def test_result_set_format() -> None:
+    """Test the format selection by file extension."""
+    assert result_set_format("result_set.rsbin") == "compact"
+    assert result_set_format("result_set.json") == "json"
+    assert result_set_format("-") == "json"
+    assert result_set_format("result_set.json", "compact") == "compact"
+
+
+def test_compact_result_set() -> None:
+    """Test that a compact result set reads the same as the original."""
+    write_result_set(RESULT_SET, "result_set.rsbin")
+    result_set = load_result_set("result_set.rsbin")
+    assert isinstance(result_set, CompactResultSet)
+    assert list(result_set) == list(RESULT_SET)
+    assert {key: result_set[key] for key in result_set} == RESULT_SET
+    assert "ds:2-en" in result_set
+    assert "ds:9-en" not in result_set
+    assert next(iter(result_set["ds:1-en"])) is next(iter(result_set["ds:1-en"]))
+    assert result_set.pop("truncated", []) == ["ds:1-en"]
+    assert "truncated" not in result_set
+    copy = pickle.loads(pickle.dumps(result_set))  # noqa: S301
+    assert dict(copy.items()) == dict(result_set.items())
+    Path("result_set.json").write_text(json.dumps(RESULT_SET))
+    with pytest.raises(ValueError, match="not a compact result set"):
+        CompactResultSet("result_set.json")
+
+
+def test_compact_result_set_size() -> None:
+    """Test that repeated values are stored only once."""
+    result_set = {
+        f"ds:{number}-{language}": {
+            f"http://dbpedia.org/resource/Entity_{value}": 1 for value in range(number % 50)
+        }
+        for number in range(500)
+        for language in ("en", "de", "es")
+    }
+    write_result_set(result_set, "result_set.rsbin")
+    write_result_set(result_set, "result_set.json")
+    compact_size = Path("result_set.rsbin").stat().st_size
+    assert compact_size * 5 < Path("result_set.json").stat().st_size
+    assert dict(load_result_set("result_set.rsbin").items()) == result_set
@@ -0,0 +1,88 @@
+"""test scheduler"""
+
+from collections import Counter
+from threading import Lock
+
+from text2sparql_client.scheduler import Backoff, RetryScheduler
+
+
+class FlakyFunction:
+    """Function failing a given number of times per job"""
+
+    def __init__(self, failures: dict[int, int]):
+        self.failures = failures
+        self.calls: Counter[int] = Counter()
+        self.lock = Lock()
+
+    def __call__(self, job: int) -> int:
+        """Fail or return the job squared"""
+        with self.lock:
+            self.calls[job] += 1
+            if self.calls[job] <= self.failures.get(job, 0):
+                raise ConnectionError(f"job {job} failed")
+        return job * job
+
+
+def test_backoff() -> None:
+    """Test exponential backoff with jitter."""
+    backoff = Backoff(initial=2, maximum=10)
+    for retry, maximum in ((1, 2), (2, 4), (3, 8), (4, 10), (10, 10)):
+        assert maximum / 2 <= backoff.delay(retry) <= maximum
+
+
+def test_retries_do_not_block_other_jobs() -> None:
+    """Test that a failing job is retried while the other jobs continue."""
+    function = FlakyFunction(failures={0: 2, 3: 10})
+    scheduler = RetryScheduler(
+        function=function,
+        name=str,
+        concurrency=1,
+        retries=3,
+        backoff=Backoff(initial=0.2, maximum=1),
+        retryable=(ConnectionError,),
+    )
+    finished = list(scheduler.run(range(5)))
+    assert finished[:3] == [(1, 1), (2, 4), (4, 16)]
+    assert sorted(finished[3:]) == [(0, 0), (3, None)]
+    assert function.calls == {0: 3, 1: 1, 2: 1, 3: 4, 4: 1}
+    assert scheduler.retries_used == 2 + 3
+    assert scheduler.failed == 1
+
+
+def test_retry_budget() -> None:
+    """Test the retry budget of a run."""
+    function = FlakyFunction(failures=dict.fromkeys(range(5), 1))
+    scheduler = RetryScheduler(
+        function=function,
+        name=str,
+        concurrency=5,
+        retries=3,
+        backoff=Backoff(initial=0, maximum=0),
+        retryable=(ConnectionError,),
+        budget=2,
+    )
+    results = dict(scheduler.run(range(5)))
+    assert sum(1 for result in results.values() if result is not None) == 2  # noqa: PLR2004
+    assert scheduler.retries_used == 2  # noqa: PLR2004
+    assert scheduler.failed == 3  # noqa: PLR2004
+
+
+def test_unexpected_errors_skip_the_job() -> None:
+    """Test that a job failing with a non-retryable error does not stop the other jobs."""
+
+    def function(job: int) -> int:
+        if job == 1:
+            raise ValueError("unexpected")
+        return job
+
+    scheduler = RetryScheduler(
+        function=function,
+        name=str,
+        concurrency=2,
+        retries=3,
+        backoff=Backoff(initial=0, maximum=0),
+        retryable=(ConnectionError,),
+    )
+    assert dict(scheduler.run(range(4))) == {0: 0, 1: None, 2: 2, 3: 3}
+    assert scheduler.failed == 1
+    assert scheduler.retries_used == 0
@@ -1,11 +1,26 @@
 """test serve"""
 
+import json
+from datetime import timedelta
 from http import HTTPStatus
+from pathlib import Path
+from random import Random
 
-from requests import get
+import pytest
+from requests import Response, exceptions, get
 
+from tests import run
 from tests.conftest import ServerFixture
-from text2sparql_client.commands.serve import KNOWN_DATASETS
+from text2sparql_client.commands import serve
+from text2sparql_client.commands.serve import (
+    KNOWN_DATASETS,
+    SPARQL_ANSWER,
+    Settings,
+    load_answers,
+    parse_latency,
+    worker_seed,
+)
+from text2sparql_client.database import Database
 
 
 def test_unprocessable(server: ServerFixture) -> None:
@@ -32,3 +47,134 @@ def test_success(server: ServerFixture) -> None:
         server.get_url(), params={"dataset": KNOWN_DATASETS[0], "question": "..."}, timeout=5
     )
     assert found.status_code == HTTPStatus.OK
+
+
+def test_latency() -> None:
+    """Test the latency distributions."""
+    generator = Random(1)  # noqa: S311
+    assert parse_latency("fixed", sleep=2)(generator) == 2  # noqa: PLR2004
+    assert parse_latency("fixed:0.5")(generator) == 0.5  # noqa: PLR2004
+    assert all(1 <= parse_latency("uniform:1,2")(generator) <= 2 for _ in range(100))  # noqa: PLR2004
+    lognormal = sorted(parse_latency("lognormal:2,0.5")(generator) for _ in range(10_000))
+    assert lognormal[5_000] == pytest.approx(2, rel=0.05)
+    percentiles = sorted(parse_latency("percentiles:50=1,90=3")(generator) for _ in range(10_000))
+    assert percentiles[5_000] == pytest.approx(1, rel=0.05)
+    assert percentiles[7_000] == pytest.approx(2, rel=0.05)
+    assert percentiles[-1] == 3  # noqa: PLR2004
+    for spec in ("normal:1,2", "uniform:1", "percentiles:150=1", "fixed:x"):
+        with pytest.raises(ValueError, match="latency"):
+            parse_latency(spec)
+
+
+def test_worker_seed() -> None:
+    """Test that several workers with the same seed get different random sequences."""
+    assert worker_seed(1, workers=1, pid=10) == 1
+    assert worker_seed(None, workers=4, pid=10) is None
+    sequences = {
+        tuple(Random(worker_seed(1, workers=4, pid=pid)).random() for _ in range(3))  # noqa: S311
+        for pid in (10, 11)
+    }
+    assert len(sequences) == 2  # noqa: PLR2004
+
+
+def test_answers(tmp_path: Path) -> None:
+    """Test loading and validating answer tables."""
+    answers = tmp_path / "answers.yml"
+    answers.write_text("https://example.org/ds/:\n  What?: SELECT * WHERE {?s ?p ?o}\n")
+    assert load_answers(str(answers)) == {
+        "https://example.org/ds/": {"What?": "SELECT * WHERE {?s ?p ?o}"}
+    }
+    invalid = tmp_path / "invalid.yml"
+    invalid.write_text("- not a table\n")
+    with pytest.raises(ValueError, match="datasets"):
+        load_answers(str(invalid))
+
+
+def test_load_test(tmp_path: Path) -> None:
+    """Test answer tables and injected errors."""
+    answers = tmp_path / "answers.json"
+    answers.write_text(json.dumps({"https://example.org/ds/": {"What?": "ASK {}"}}))
+    throttling = ServerFixture(
+        host="127.0.0.1",
+        port=8001,
+        settings={"sleep": 0, "throttle_rate": 1, "retry_after": 7},
+    )
+    dropping = ServerFixture(
+        host="127.0.0.1",
+        port=8002,
+        settings={"latency": "uniform:0,0.1", "drop_rate": 1},
+    )
+    answering = ServerFixture(
+        host="127.0.0.1", port=8003, settings={"sleep": 0, "answers": str(answers)}
+    )
+    for server in (throttling, dropping, answering):
+        server.start()
+    try:
+        params = {"dataset": "https://example.org/ds/", "question": "What?"}
+        response = get(answering.get_url(), params=params, timeout=5)
+        assert response.json()["query"] == "ASK {}"
+        params["question"] = "Who?"
+        assert get(answering.get_url(), params=params, timeout=5).json()["query"] == SPARQL_ANSWER
+
+        params = {"dataset": KNOWN_DATASETS[0], "question": "..."}
+        response = get(throttling.get_url(), params=params, timeout=5)
+        assert response.status_code == HTTPStatus.TOO_MANY_REQUESTS
+        assert response.headers["Retry-After"] == "7"
+        with pytest.raises(exceptions.ChunkedEncodingError, match="IncompleteRead"):
+            get(dropping.get_url(), params=params, timeout=5)
+    finally:
+        for server in (throttling, dropping, answering):
+            server.kill()
+
+
+def test_replay(tmp_path: Path) -> None:
+    """Test replaying recorded responses with a fallback status."""
+    database = Database(file=tmp_path / "responses.db")
+    body = json.dumps(
+        {"dataset": "https://example.org/ds/", "question": "What?", "query": "ASK {}"}
+    )
+    for time, recorded in (("2025-01-01", "{}"), ("2025-01-02", body)):
+        row_id = database.register_question(
+            time, "http://recorded", "https://example.org/ds/", "What?"
+        )
+        response = Response()
+        response.status_code = HTTPStatus.OK
+        response._content = recorded.encode()  # noqa: SLF001
+        response.elapsed = timedelta(seconds=0.1)
+        database.add_response(row_id=row_id, response=response)
+    database.connection.close()
+    replaying = ServerFixture(
+        host="127.0.0.1",
+        port=8004,
+        settings={
+            "sleep": 0,
+            "replay": str(tmp_path / "responses.db"),
+            "replay_latency": True,
+            "fallback_status": HTTPStatus.NOT_FOUND,
+        },
+    )
+    replaying.start()
+    try:
+        params = {"dataset": "https://example.org/ds/", "question": "What?"}
+        response = get(replaying.get_url(), params=params, timeout=5)
+        assert response.text == body
+        params["question"] = "Who?"
+        response = get(replaying.get_url(), params=params, timeout=5)
+        assert response.status_code == HTTPStatus.NOT_FOUND
+    finally:
+        replaying.kill()
+
+
+@pytest.mark.parametrize(
+    ("options", "sleep"),
+    [((), 0), (("--sleep", "2"), 2), (("--latency", "uniform:1,2"), 3)],
+)
+def test_replay_latency_default(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path, options: tuple[str, ...], sleep: float
+) -> None:
+    """Test that replayed responses are not delayed unless a latency is given."""
+    Database(file=tmp_path / "responses.db").connection.close()
+    monkeypatch.setattr(serve, "settings", Settings())
+    monkeypatch.setattr(serve, "run_service", lambda **_: None)
+    run(command=("serve", "--replay", str(tmp_path / "responses.db"), *options))
+    assert serve.settings.sleep == sleep
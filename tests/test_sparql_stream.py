@@ -0,0 +1,125 @@
+"""test streaming of SPARQL JSON results"""
+
+import json
+from collections.abc import Generator, Iterator
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from pathlib import Path
+from threading import Thread
+from typing import Any
+
+import pytest
+
+from text2sparql_client.result_cache import ONLY, ResultCache
+from text2sparql_client.utils.evaluation_metrics import DBpediaDict2PytrecDict
+from text2sparql_client.utils.query_rdf import ResultStream, get_json, stream_relevance
+from text2sparql_client.utils.sparql_stream import IncompleteResultError, iter_result_events
+
+RESULT = {
+    "head": {"link": [], "vars": ["s", "label"]},
+    "results": {
+        "distinct": False,
+        "ordered": True,
+        "bindings": [
+            {
+                "s": {"type": "uri", "value": f"http://example.org/{number % 7}"},
+                "label": {"type": "literal", "value": f'label "{number}" ä', "xml:lang": "de"},
+            }
+            for number in range(20)
+        ]
+        + [{"s": {"type": "literal", "datatype": "xsd:integer", "value": "42"}}],
+    },
+}
+ASK_RESULT = {"head": {}, "boolean": False}
+
+
+def chunked(document: dict, size: int) -> Iterator[bytes]:
+    """Split a JSON document into chunks of bytes"""
+    data = json.dumps(document, indent=1, ensure_ascii=False).encode()
+    return (data[start : start + size] for start in range(0, len(data), size))
+
+
+class SparqlHandler(BaseHTTPRequestHandler):
+    """Answer every request with the same SPARQL JSON result"""
+
+    requests = 0
+
+    def do_GET(self) -> None:
+        """Send the result"""
+        SparqlHandler.requests += 1
+        data = json.dumps(RESULT).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/sparql-results+json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format: str, *args: Any) -> None:  # noqa: A002, ANN401
+        """Do not log requests"""
+
+
+@pytest.fixture
+def endpoint() -> Generator[str, Any, None]:
+    """Provide a local SPARQL endpoint"""
+    server = HTTPServer(("127.0.0.1", 0), SparqlHandler)
+    thread = Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}/sparql"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.mark.parametrize("size", [1, 7, 1024])
+def test_iter_result_events(size: int) -> None:
+    """Test that the streamed transformation equals the complete transformation."""
+    events = list(iter_result_events(chunked(RESULT, size)))
+    assert events[0] == ("vars", ["s", "label"])
+    assert [value for event, value in events[1:]] == RESULT["results"]["bindings"]  # type: ignore[index]
+    transform = DBpediaDict2PytrecDict("ds:1-en")
+    streamed, truncated = transform.transform_stream(iter_result_events(chunked(RESULT, size)))
+    assert not truncated
+    assert list(streamed["ds:1-en"].items()) == list(transform.tranform(RESULT)["ds:1-en"].items())
+    streamed, _ = transform.transform_stream(iter_result_events(chunked(ASK_RESULT, size)))
+    assert streamed == transform.tranform(ASK_RESULT)
+
+
+def test_incomplete_result() -> None:
+    """Test that a truncated stream raises an error unless cut at the byte limit."""
+    data = b"".join(chunked(RESULT, 1024))
+    with pytest.raises(IncompleteResultError):
+        list(iter_result_events([data[:500]]))
+    stream = ResultStream(iter([data[:500], data[500:]]), max_bytes=600)
+    bindings = [value for event, value in stream.events() if event == "binding"]
+    assert stream.exceeded
+    assert 0 < len(bindings) < len(RESULT["results"]["bindings"])  # type: ignore[index]
+
+
+def test_stream_relevance(endpoint: str) -> None:
+    """Test streaming, truncation and caching of results from an endpoint."""
+    expected = DBpediaDict2PytrecDict("").tranform(RESULT)[""]
+    SparqlHandler.requests = 0
+    cache = ResultCache(file=Path("results.db"))
+    relevance, truncated = stream_relevance("SELECT", endpoint, max_rows=3, cache=cache)
+    assert truncated
+    assert list(relevance) == [
+        "http://example.org/0",
+        "http://example.org/1",
+        "http://example.org/2",
+    ] + [f'label "{number}" ä' for number in range(3)]
+    relevance, truncated = stream_relevance("SELECT", endpoint, max_bytes=300, cache=cache)
+    assert truncated
+    assert len(relevance) < len(expected)
+    relevance, truncated = stream_relevance("SELECT", endpoint, cache=cache)
+    assert not truncated
+    assert relevance == expected
+    assert SparqlHandler.requests == 3  # noqa: PLR2004
+    cache.close()
+    cache = ResultCache(file=Path("results.db"), mode=ONLY)
+    relevance, _ = stream_relevance("SELECT", endpoint, cache=cache)
+    assert list(relevance.items()) == list(expected.items())
+    assert SparqlHandler.requests == 3  # noqa: PLR2004
+    cache.close()
+    # the compact result of the stream is not returned for the complete result
+    cache = ResultCache(file=Path("results.db"))
+    assert get_json("SELECT", endpoint, cache=cache) == RESULT
+    assert SparqlHandler.requests == 4  # noqa: PLR2004
+    cache.close()
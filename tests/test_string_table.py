@@ -0,0 +1,74 @@
+"""test interned strings"""
+
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from text2sparql_client.utils.evaluation_metrics import DBpediaDict2PytrecDict
+from text2sparql_client.utils.result_set_file import load_result_set, write_result_set
+from text2sparql_client.utils.string_table import CompactRelevance, StringTable
+
+
+def test_string_table() -> None:
+    """Test that equal strings get the same ID and object."""
+    strings = StringTable()
+    name = "a"
+    first = f"http://example.org/{name}"
+    second = f"http://example.org/{name}"
+    assert first is not second
+    assert strings.id(first) == strings.id(second) == 0
+    assert strings.intern(second) is first
+    assert strings.id("http://example.org/b") == 1
+    assert strings[1] == "http://example.org/b"
+    assert len(strings) == 2  # noqa: PLR2004
+
+
+def test_string_table_threads() -> None:
+    """Test that each string gets a single ID when interned from many threads."""
+    strings = StringTable()
+    values = [f"http://example.org/{index % 100}" for index in range(10_000)]
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        ids = list(executor.map(strings.id, values))
+    assert len(strings) == 100  # noqa: PLR2004
+    assert all(strings[string_id] == value for string_id, value in zip(ids, values, strict=True))
+
+
+def test_compact_relevance() -> None:
+    """Test that compact relevances give the same dict in the same order."""
+    strings = StringTable()
+    for relevance in (
+        {"http://example.org/b": 1, "http://example.org/a": 1},
+        {"true": 0},
+        {},
+    ):
+        compact = CompactRelevance(relevance, strings)
+        assert len(compact) == len(relevance)
+        assert list(compact.to_dict().items()) == list(relevance.items())
+    assert CompactRelevance({"http://example.org/a": 1}, strings).relevances is None
+
+
+def test_shared_values() -> None:
+    """Test that transformed results share a single string per distinct URI."""
+    strings = StringTable()
+    results = [
+        DBpediaDict2PytrecDict(question, strings).tranform(
+            {
+                "head": {"vars": ["s"]},
+                "results": {"bindings": [{"s": {"type": "uri", "value": "http://example.org/a"}}]},
+            }
+        )[question]
+        for question in ("q1", "q2")
+    ]
+    first, second = (next(iter(result)) for result in results)
+    assert first is second
+    assert len(strings) == 1
+
+
+def test_shared_result_sets(tmp_path: Path) -> None:
+    """Test that result sets loaded with a string table share their values."""
+    strings = StringTable()
+    value = "http://example.org/a"
+    write_result_set({"ds:1-en": {value: 1}}, str(tmp_path / "true.json"))
+    write_result_set({"ds:1-en": {value: 1}}, str(tmp_path / "pred.rsbin"))
+    true_set = load_result_set(str(tmp_path / "true.json"), strings=strings)
+    pred_set = load_result_set(str(tmp_path / "pred.rsbin"), strings=strings)
+    assert next(iter(true_set["ds:1-en"])) is next(iter(pred_set["ds:1-en"]))
@@ -0,0 +1,62 @@
+"""test throttle"""
+
+from threading import Thread
+from time import monotonic, sleep
+
+import pytest
+
+from text2sparql_client.throttle import CLOSED, HALF_OPEN, OPEN, EndpointLimiter, parse_retry_after
+
+
+def test_parse_retry_after() -> None:
+    """Test parsing of Retry-After headers."""
+    assert parse_retry_after("3") == 3  # noqa: PLR2004
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("no date") is None
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0
+
+
+def test_rate_limit() -> None:
+    """Test the token bucket and its adaptation to throttling."""
+    limiter = EndpointLimiter(name="test", rate=20)
+    started = monotonic()
+    for _ in range(6):
+        limiter.acquire()
+    assert monotonic() - started == pytest.approx(0.25, abs=0.1)
+    limiter.failure(throttled=True)
+    assert limiter.rate == 10  # noqa: PLR2004
+    limiter.success()
+    assert limiter.rate == 12  # noqa: PLR2004
+
+
+def test_retry_after_pauses_requests() -> None:
+    """Test that Retry-After pauses all requests."""
+    limiter = EndpointLimiter(name="test")
+    started = monotonic()
+    limiter.failure(throttled=True, retry_after=0.3)
+    limiter.acquire()
+    assert monotonic() - started >= 0.3  # noqa: PLR2004
+
+
+def test_circuit_breaker() -> None:
+    """Test that the circuit opens, probes with a single request and closes again."""
+    limiter = EndpointLimiter(name="test", failure_threshold=2, cooldown=0.2)
+    limiter.failure()
+    assert limiter.state == CLOSED
+    limiter.failure()
+    assert limiter.state == OPEN
+    limiter.acquire()  # the probe request
+    assert limiter.state == HALF_OPEN
+    waiting = Thread(target=limiter.acquire)
+    waiting.start()
+    sleep(0.1)
+    assert waiting.is_alive(), "Only a single probe request is allowed."
+    limiter.success()
+    assert limiter.state == CLOSED
+    waiting.join(timeout=1)
+    assert not waiting.is_alive()
+    limiter.failure()
+    limiter.failure()
+    limiter.acquire()
+    limiter.failure()
+    assert limiter.state == OPEN, "A failed probe request opens the circuit again."
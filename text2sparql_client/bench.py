@@ -0,0 +1,139 @@
+"""load generation for TEXT2SPARQL endpoints"""
+
+import random
+from collections.abc import Callable, Iterator, Sequence
+from concurrent.futures import ThreadPoolExecutor
+from itertools import cycle, islice
+from threading import Lock
+from time import perf_counter, sleep
+
+from requests import Session
+from requests.adapters import HTTPAdapter
+
+from text2sparql_client.metrics import Sample
+
+POISSON = "poisson"
+FIXED_RATE = "fixed-rate"
+CONCURRENCY = "concurrency"
+MODES = [POISSON, FIXED_RATE, CONCURRENCY]
+OK = "ok"
+
+
+def arrival_times(mode: str, count: int, rate: float, seed: int | None = None) -> list[float]:
+    """Get the send times (in seconds from the start) of open-loop requests
+
+    Fixed-rate arrivals are evenly spaced, Poisson arrivals have exponentially
+    distributed gaps with the same mean.
+    """
+    if mode == FIXED_RATE:
+        return [index / rate for index in range(count)]
+    generator = random.Random(seed)  # noqa: S311
+    times = []
+    time = 0.0
+    for _ in range(count):
+        times.append(time)
+        time += generator.expovariate(rate)
+    return times
+
+
+class Sender:
+    """Send questions to a TEXT2SPARQL endpoint and classify the outcome
+
+    Unlike the client of the ask command, there are no retries, rate limits or circuit
+    breakers, so the endpoint is measured as it is.
+    """
+
+    def __init__(self, url: str, dataset: str, timeout: float, pool_size: int):
+        self.url = url
+        self.dataset = dataset
+        self.timeout = timeout
+        self.session = Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, pool_block=True)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def send(self, question: str) -> str:
+        """Send a question and return the outcome (`ok`, `http_<status>` or an exception name)"""
+        try:
+            response = self.session.get(
+                self.url,
+                params={"dataset": self.dataset, "question": question},
+                timeout=self.timeout,
+            )
+        except Exception as error:  # noqa: BLE001
+            return type(error).__name__
+        return OK if response.ok else f"http_{response.status_code}"
+
+    def close(self) -> None:
+        """Close all pooled connections"""
+        self.session.close()
+
+
+def run_open_loop(
+    send: Callable[[str], str],
+    questions: Sequence[str],
+    times: Sequence[float],
+    concurrency: int,
+    duration: float | None = None,
+) -> tuple[list[Sample], float]:
+    """Send questions at the given times, independent of the responses (open loop)
+
+    The latency is measured from the scheduled send time, so requests waiting for a free
+    worker (with all `concurrency` requests in flight) include the waiting time.
+    Returns the latency and outcome of each request and the wall-clock time.
+    """
+    samples: list[Sample] = []
+    lock = Lock()
+
+    def timed(question: str, scheduled: float) -> None:
+        outcome = send(question)
+        latency = perf_counter() - scheduled
+        with lock:
+            samples.append((latency, outcome))
+
+    started = perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for question, time in zip(cycle(questions), times, strict=False):
+            if duration is not None and time >= duration:
+                break
+            scheduled = started + time
+            delay = scheduled - perf_counter()
+            if delay > 0:
+                sleep(delay)
+            executor.submit(timed, question, scheduled)
+    return samples, perf_counter() - started
+
+
+def run_closed_loop(
+    send: Callable[[str], str],
+    questions: Sequence[str],
+    count: int,
+    concurrency: int,
+    duration: float | None = None,
+) -> tuple[list[Sample], float]:
+    """Send questions with a fixed number of requests in flight (closed loop)
+
+    Each worker sends the next question as soon as its previous request completes.
+    Returns the latency and outcome of each request and the wall-clock time.
+    """
+    samples: list[Sample] = []
+    lock = Lock()
+    pending: Iterator[str] = islice(cycle(questions), count)
+    started = perf_counter()
+
+    def worker() -> None:
+        while duration is None or perf_counter() - started < duration:
+            with lock:
+                question = next(pending, None)
+            if question is None:
+                return
+            sent = perf_counter()
+            outcome = send(question)
+            latency = perf_counter() - sent
+            with lock:
+                samples.append((latency, outcome))
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for _ in range(concurrency):
+            executor.submit(worker)
+    return samples, perf_counter() - started
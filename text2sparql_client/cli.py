@@ -6,6 +6,7 @@ from sys import version_info
 import click
 
 from text2sparql_client.commands.ask import ask_command
+from text2sparql_client.commands.bench import bench_command
 from text2sparql_client.commands.evaluate import evaluate_command
 from text2sparql_client.commands.query import query_command
 from text2sparql_client.commands.serve import serve_command
@@ -34,3 +35,4 @@ cli.add_command(ask_command)
 cli.add_command(serve_command)
 cli.add_command(query_command)
 cli.add_command(evaluate_command)
+cli.add_command(bench_command)
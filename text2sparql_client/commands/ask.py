@@ -2,9 +2,10 @@
 
 import json
 import sys
+from functools import partial
 from io import TextIOWrapper
 from pathlib import Path
-from time import sleep
+from time import perf_counter
 
 import click
 import requests
@@ -13,76 +14,166 @@ from loguru import logger
 from pydantic import ValidationError
 
 from text2sparql_client.database import Database
+from text2sparql_client.metrics import (
+    CACHE_HIT,
+    ERROR,
+    VALIDATION_ERROR,
+    RequestMetrics,
+    RunMetrics,
+    summary_file,
+)
 from text2sparql_client.models.questions_file import Question, QuestionsFile
-from text2sparql_client.request import text2sparql
+from text2sparql_client.request import (
+    Text2SparqlClient,
+    response_to_response_message,
+    text2sparql,
+)
+from text2sparql_client.scheduler import Backoff, RetryScheduler
+from text2sparql_client.utils.answers_stream import (
+    OUTPUT_FORMATS,
+    AnswersStream,
+    answer_key,
+    finalize_answers,
+    interrupted_stream,
+    iter_answers,
+    partial_output_file,
+)
+
+RETRYABLE_ERRORS = (
+    requests.ConnectionError,
+    requests.HTTPError,
+    requests.ReadTimeout,
+    # connection dropped while the body was read
+    requests.exceptions.ChunkedEncodingError,
+)
 
 
 def check_output_file(file: str) -> None:
-    """Check if output file already exists."""
+    """Check if output file or a partial output file already exists."""
     if Path(file).exists():
         logger.error(f"Output file {file} already exists.")
         sys.exit(1)
+    if partial_output_file(file).exists():
+        logger.error(f"Partial output file {partial_output_file(file)} already exists.")
+        sys.exit(1)
 
 
-def _retry_response(  # noqa: PLR0913
-    counter: int,
-    retries: int,
-    retry_sleep: int,
-    responses: list,
+def _job_key(file_model: QuestionsFile, question_section: Question, language: str) -> str:
+    """Identify a question like the answer to it (see answer_key)"""
+    if question_section.id and file_model.dataset.prefix:
+        return f"{file_model.dataset.prefix}:{question_section.id}-{language}"
+    return question_section.question[language]
+
+
+def _answered_questions(output: str, output_format: str) -> tuple[set[str], bool]:
+    """Get the keys of the questions answered in an interrupted run"""
+    if output == "-":
+        logger.error("Resuming a run needs an output file.")
+        sys.exit(1)
+    if output_format == "json" and Path(output).exists():
+        logger.error(f"Output file {output} already exists.")
+        sys.exit(1)
+    stream = interrupted_stream(output=output, output_format=output_format)
+    if stream is None:
+        logger.info("No answers from an interrupted run found. Starting a new run.")
+        return set(), False
+    answered = {answer_key(answer) for answer in iter_answers(stream)}
+    logger.info(f"Found {len(answered)} answers from an interrupted run in {stream}.")
+    return answered, True
+
+
+def _finalize_output(output: str, output_format: str, order: list[str]) -> None:
+    """Write the partial output of an interrupted run to the JSON output in question order"""
+    if output == "-" or output_format != "json":
+        logger.error("Finalizing a run needs a JSON output file.")
+        sys.exit(1)
+    stream = partial_output_file(output)
+    if not stream.exists():
+        logger.error(f"Partial output file {stream} not found.")
+        sys.exit(1)
+    if Path(output).exists():
+        logger.error(f"Output file {output} already exists.")
+        sys.exit(1)
+    count = finalize_answers(stream=stream, output=output, order=order)
+    stream.unlink()
+    logger.info(f"Wrote {count} answers from {stream} to {output}.")
+
+
+def _qname(file_model: QuestionsFile, job: tuple[Question, str, str]) -> str:
+    """Name a question in log messages"""
+    return f"{file_model.dataset.prefix}:{job[0].id}-{job[1]}"
+
+
+def _answer_question(  # noqa: PLR0913
+    job: tuple[Question, str, str],
+    *,
     url: str,
     file_model: QuestionsFile,
-    question_section: Question,
-    language: str,
-    question: str,
     database: Database,
     timeout: int,
-    cache: bool,
-) -> None:
-    qname = f"{file_model.dataset.prefix}:{question_section.id}-{language}"
-
-    if counter > retries:
-        logger.bind(retry=True).error(
-            f"{qname} | Maximum number of retries reached. Skipping question."
-        )
-        return
+    cached_bodies: dict[str, str],
+    client: Text2SparqlClient,
+    run_metrics: RunMetrics,
+) -> dict[str, str] | None:
+    """Answer a single question once
 
-    logger.bind(retry=True).info(
-        f"{qname} | Retrying ({counter}/{retries}) after {retry_sleep} seconds..."
-    )
-    sleep(retry_sleep)
+    Questions with a prefetched response body from the answers database are not sent.
+    Errors are raised (and retried if retryable), questions with invalid responses are
+    skipped (None).
+    The metrics of each attempt are added to the run metrics.
+    """
+    question_section, language, question = job
+    logger.info(f"{question} ({language}) ... ")
+    metrics = RequestMetrics()
     try:
-        response = text2sparql(
-            endpoint=url,
-            dataset=file_model.dataset.id,
-            question=question,
-            database=database,
-            timeout=timeout,
-            cache=cache,
-        )
-        answer: dict[str, str] = response.model_dump()
-        if question_section.id and file_model.dataset.prefix:
-            answer["qname"] = f"{file_model.dataset.prefix}:{question_section.id}-{language}"
-            answer["uri"] = f"{file_model.dataset.id}{question_section.id}-{language}"
-        responses.append(answer)
-    except (requests.ConnectionError, requests.HTTPError, requests.ReadTimeout) as error:
-        logger.bind(retry=True).warning(f"{qname} | {error}")
-        _retry_response(
-            counter=counter + 1,
-            retries=retries,
-            retry_sleep=retry_sleep,
-            responses=responses,
-            url=url,
-            file_model=file_model,
-            question_section=question_section,
-            language=language,
-            question=question,
-            database=database,
-            timeout=timeout,
-            cache=cache,
-        )
+        if question in cached_bodies:
+            logger.info("Cached response found.")
+            metrics.outcome = CACHE_HIT
+            response = response_to_response_message(endpoint=url, body=cached_bodies[question])
+        else:
+            response = text2sparql(
+                endpoint=url,
+                dataset=file_model.dataset.id,
+                question=question,
+                database=database,
+                timeout=timeout,
+                cache=False,
+                client=client,
+                metrics=metrics,
+                retryable=RETRYABLE_ERRORS,
+            )
     except ValidationError as error:
+        metrics.outcome = VALIDATION_ERROR
         logger.debug(str(error))
         logger.error("validation error")
+        return None
+    except Exception:
+        # other errors skip the question in the scheduler
+        if metrics.outcome in (None, CACHE_HIT):
+            metrics.outcome = ERROR
+        raise
+    finally:
+        run_metrics.add(metrics)
+    answer: dict[str, str] = response.model_dump()
+    if question_section.id and file_model.dataset.prefix:
+        answer["qname"] = _qname(file_model=file_model, job=job)
+        answer["uri"] = f"{file_model.dataset.id}{question_section.id}-{language}"
+    return answer
+
+
+def _write_summary(output: str, summary: dict) -> None:
+    """Write the run summary next to the output file (or log it for stdout)"""
+    latency = summary["latency"]
+    logger.info(
+        f"{summary['requests']} requests, outcomes {summary['outcomes']}, "
+        f"{summary['qps']:.2f} requests/s, "
+        f"p50 {latency.get('p50', 0):.3f}s, p99 {latency.get('p99', 0):.3f}s."
+    )
+    if output == "-":
+        return
+    file = summary_file(output)
+    file.write_text(json.dumps(summary, indent=2) + "\n")
+    logger.info(f"Run summary written to {file}.")
 
 
 @click.command(name="ask")
@@ -108,14 +199,30 @@ def _retry_response(  # noqa: PLR0913
     type=int,
     default=5,
     show_default=True,
-    help="Number of retries for disconnected, http error and timed out requests.",
+    help="Number of retries for disconnected, http error and timed out requests "
+    "(incl. connections dropped during the response).",
 )
 @click.option(
     "--retry-sleep",
     type=int,
     default=15,
     show_default=True,
-    help="Amount of seconds to sleep before retrying a request.",
+    help="Amount of seconds to wait before the first retry of a request. "
+    "The delay doubles with each retry of the same request (with jitter). "
+    "Other questions are asked in the meantime.",
+)
+@click.option(
+    "--retry-max-sleep",
+    type=int,
+    default=300,
+    show_default=True,
+    help="Maximum amount of seconds to wait before retrying a request.",
+)
+@click.option(
+    "--retry-budget",
+    type=click.IntRange(min=0),
+    default=None,
+    help="Maximum number of retries for the whole run. Unlimited by default.",
 )
 @click.option(
     "--retries-log",
@@ -132,12 +239,69 @@ def _retry_response(  # noqa: PLR0913
     show_default=True,
     help="Save JSON output to this file.",
 )
+@click.option(
+    "--output-format",
+    type=click.Choice(OUTPUT_FORMATS),
+    default="json",
+    show_default=True,
+    help="Format of the output: a JSON list or one JSON answer per line (NDJSON). "
+    "Answers are streamed to the output (or a partial output file for JSON) as they arrive.",
+)
 @click.option(
     "--cache/--no-cache",
     default=True,
     show_default=True,
     help="If possible, return a cached response from the answers database.",
 )
+@click.option(
+    "--resume",
+    is_flag=True,
+    help="Resume an interrupted run: questions already answered in the partial output "
+    "(or the NDJSON output) are skipped and new answers are merged into the same output.",
+)
+@click.option(
+    "--finalize",
+    is_flag=True,
+    help="Do not ask any questions, but write the partial output of an interrupted run "
+    "to the JSON output, in the order of the questions file (URL is not used).",
+)
+@click.option(
+    "--concurrency",
+    "-c",
+    type=click.IntRange(min=1),
+    default=1,
+    show_default=True,
+    help="Number of questions to send to the endpoint in parallel.",
+)
+@click.option(
+    "--pool-size",
+    type=click.IntRange(min=1),
+    default=None,
+    help="Maximum number of pooled keep-alive connections per host. "
+    "Defaults to the value of --concurrency.",
+)
+@click.option(
+    "--rate-limit",
+    type=click.FloatRange(min=0, min_open=True),
+    default=None,
+    help="Maximum number of requests per second to the endpoint. "
+    "The rate is reduced automatically while the endpoint throttles (HTTP 429/503). "
+    "Unlimited by default, but a Retry-After header always pauses the requests.",
+)
+@click.option(
+    "--circuit-breaker",
+    type=click.IntRange(min=1),
+    default=None,
+    help="Pause requests after this number of consecutive failures and probe the endpoint "
+    "with a single request before resuming. Disabled by default.",
+)
+@click.option(
+    "--circuit-breaker-cooldown",
+    type=click.FloatRange(min=0),
+    default=30,
+    show_default=True,
+    help="Seconds to pause requests before probing the endpoint again.",
+)
 def ask_command(  # noqa: PLR0913
     questions_file: TextIOWrapper,
     url: str,
@@ -145,58 +309,127 @@ def ask_command(  # noqa: PLR0913
     timeout: int,
     retries: int,
     retry_sleep: int,
+    retry_max_sleep: int,
+    retry_budget: int | None,
     retries_log: str,
     output: str,
+    output_format: str,
     cache: bool,
+    resume: bool,
+    finalize: bool,
+    concurrency: int,
+    pool_size: int | None,
+    rate_limit: float | None,
+    circuit_breaker: int | None,
+    circuit_breaker_cooldown: float,
 ) -> None:
     """Query a TEXT2SPARQL endpoint
 
     Use a questions YAML file and send each question to a TEXT2SPARQL conform endpoint.
-    This command will create a sqlite database (--answers-db) saving the responses.
+    This command will create a sqlite database (--answers-db) saving the responses
+    and the timings and outcome of each request. A summary of the run is written
+    next to the output file (OUTPUT.summary.json).
+    The partial output of an interrupted run can be resumed (--resume) or written
+    to the JSON output as it is (--finalize).
     """
-    database = Database(file=Path(answers_db))
     file_model = QuestionsFile.model_validate(yaml.safe_load(questions_file))
+    order = [
+        _job_key(file_model, question_section, language)
+        for question_section in file_model.questions
+        for language in question_section.question
+    ]
+    if finalize:
+        _finalize_output(output=output, output_format=output_format, order=order)
+        return
+    database = Database(file=Path(answers_db))
     logger.info(f"Asking questions about dataset {file_model.dataset.id} on endpoint {url}.")
-    check_output_file(file=output)
+    answered: set[str] = set()
+    resumed = False
+    if resume:
+        answered, resumed = _answered_questions(output=output, output_format=output_format)
+    else:
+        check_output_file(file=output)
     logger.add(retries_log, filter=lambda record: "retry" in record["extra"])
-    responses = []
-    for question_section in file_model.questions:
-        for language, question in question_section.question.items():
-            logger.info(f"{question} ({language}) ... ")
-            qname = f"{file_model.dataset.prefix}:{question_section.id}-{language}"
-            try:
-                response = text2sparql(
-                    endpoint=url,
-                    dataset=file_model.dataset.id,
-                    question=question,
-                    database=database,
-                    timeout=timeout,
-                    cache=cache,
-                )
-                answer: dict[str, str] = response.model_dump()
-                if question_section.id and file_model.dataset.prefix:
-                    answer["qname"] = qname
-                    answer["uri"] = f"{file_model.dataset.id}{question_section.id}-{language}"
-                responses.append(answer)
-            except (requests.ConnectionError, requests.HTTPError, requests.ReadTimeout) as error:
-                logger.bind(retry=True).warning(f"{qname} | {error}")
-                _retry_response(
-                    counter=1,
-                    retries=retries,
-                    retry_sleep=retry_sleep,
-                    responses=responses,
-                    url=url,
-                    file_model=file_model,
-                    question_section=question_section,
-                    language=language,
-                    question=question,
-                    database=database,
-                    timeout=timeout,
-                    cache=cache,
-                )
-            except ValidationError as error:
-                logger.debug(str(error))
-                logger.error("validation error")
-    logger.info(f"Writing {len(responses)} responses to {output if output != '-' else 'stdout'}.")
-    with click.open_file(filename=output, mode="w", encoding="UTF-8") as file:
-        json.dump(responses, file, indent=2)
+    jobs = [
+        (question_section, language, question)
+        for question_section in file_model.questions
+        for language, question in question_section.question.items()
+        if _job_key(file_model, question_section, language) not in answered
+    ]
+    if resumed:
+        logger.info(f"Resuming run with {len(jobs)} of {len(order)} questions left to ask.")
+    cached_bodies: dict[str, str] = {}
+    if cache:
+        cached_bodies = database.get_responses(
+            endpoint=url, dataset=file_model.dataset.id, questions=(job[2] for job in jobs)
+        )
+        hits = sum(1 for job in jobs if job[2] in cached_bodies)
+        logger.info(
+            f"Found cached responses for {hits} of {len(jobs)} questions "
+            f"({hits / len(jobs) if jobs else 0:.0%} hit ratio, {len(jobs) - hits} to ask)."
+        )
+    client = Text2SparqlClient(
+        pool_maxsize=pool_size or concurrency,
+        pool_block=True,
+        rate_limit=rate_limit,
+        failure_threshold=circuit_breaker,
+        cooldown=circuit_breaker_cooldown,
+    )
+    run_metrics = RunMetrics()
+    scheduler = RetryScheduler(
+        function=partial(
+            _answer_question,
+            url=url,
+            file_model=file_model,
+            database=database,
+            timeout=timeout,
+            cached_bodies=cached_bodies,
+            client=client,
+            run_metrics=run_metrics,
+        ),
+        name=partial(_qname, file_model),
+        concurrency=concurrency,
+        retries=retries,
+        backoff=Backoff(initial=retry_sleep, maximum=retry_max_sleep),
+        retryable=RETRYABLE_ERRORS,
+        budget=retry_budget,
+    )
+    started = perf_counter()
+    with (
+        client,
+        AnswersStream(
+            output=output, output_format=output_format, resume=resumed, order=order
+        ) as answers,
+    ):
+        # answers are written as they finish, the JSON output is sorted by the order on close
+        unanswered = 0
+        for _, answer in scheduler.run(jobs):
+            if answer is None:
+                unanswered += 1
+            else:
+                answers.write(answer)
+        wall_clock = perf_counter() - started
+        # unanswered questions either failed after their retries or had an invalid response
+        skipped = unanswered - scheduler.failed
+        logger.info(
+            f"Answered {answers.count} of {len(jobs)} questions ({skipped} skipped for invalid "
+            f"responses, {scheduler.failed} failed) with concurrency {concurrency} in "
+            f"{wall_clock:.2f}s wall-clock time ({scheduler.summed_latency:.2f}s summed latency, "
+            f"{scheduler.summed_latency / wall_clock if wall_clock else 0:.2f}x parallelism, "
+            f"{scheduler.retries_used} retries)."
+        )
+        logger.info(
+            f"Writing {answers.count} responses to {output if output != '-' else 'stdout'}."
+        )
+    _write_summary(
+        output=output,
+        summary={
+            "questions": len(jobs),
+            "answers": answers.count,
+            "skipped": skipped,
+            "failed": scheduler.failed,
+            "throughput": answers.count / wall_clock if wall_clock else 0.0,
+            "retries": scheduler.retries_used,
+            **run_metrics.summary(wall_clock=wall_clock),
+        },
+    )
@@ -0,0 +1,158 @@
+"""bench command"""
+
+import json
+import sys
+from io import TextIOWrapper
+
+import click
+import yaml
+from loguru import logger
+
+from text2sparql_client.bench import (
+    CONCURRENCY,
+    MODES,
+    OK,
+    Sender,
+    arrival_times,
+    run_closed_loop,
+    run_open_loop,
+)
+from text2sparql_client.metrics import histogram_lines, report
+from text2sparql_client.models.questions_file import QuestionsFile
+
+
+@click.command(name="bench")
+@click.argument("QUESTIONS_FILE", type=click.File())
+@click.argument("URL", type=click.STRING)
+@click.option(
+    "--mode",
+    type=click.Choice(MODES),
+    default=CONCURRENCY,
+    show_default=True,
+    help="How requests are sent: open-loop arrivals at --rate (Poisson or fixed-rate), "
+    "or a fixed number of requests in flight (concurrency).",
+)
+@click.option(
+    "--rate",
+    type=click.FloatRange(min=0, min_open=True),
+    default=None,
+    help="Requests per second of the open-loop modes.",
+)
+@click.option(
+    "--concurrency",
+    "-c",
+    type=click.IntRange(min=1),
+    default=1,
+    show_default=True,
+    help="Number of requests in flight (the maximum for the open-loop modes).",
+)
+@click.option(
+    "--requests",
+    "-n",
+    "request_count",
+    type=click.IntRange(min=1),
+    default=None,
+    help="Number of requests to send, cycling through the questions. "
+    "Defaults to each question in each language once.",
+)
+@click.option(
+    "--duration",
+    type=click.FloatRange(min=0, min_open=True),
+    default=None,
+    help="Stop sending requests after this number of seconds.",
+)
+@click.option(
+    "--timeout",
+    type=float,
+    default=60,
+    show_default=True,
+    help="Timeout of a request in seconds.",
+)
+@click.option(
+    "--seed",
+    type=int,
+    help="Seed for the Poisson arrivals.",
+)
+@click.option(
+    "--output",
+    "-o",
+    type=click.Path(dir_okay=False, writable=True, file_okay=True, allow_dash=True),
+    default="-",
+    show_default=True,
+    help="Save the JSON report to this file.",
+)
+@click.option(
+    "--histogram/--no-histogram",
+    default=True,
+    show_default=True,
+    help="Draw a latency histogram to stderr.",
+)
+def bench_command(  # noqa: PLR0913
+    questions_file: TextIOWrapper,
+    url: str,
+    mode: str,
+    rate: float | None,
+    concurrency: int,
+    request_count: int | None,
+    duration: float | None,
+    timeout: float,
+    seed: int | None,
+    output: str,
+    histogram: bool,
+) -> None:
+    """Benchmark a TEXT2SPARQL endpoint
+
+    Send the questions of a questions YAML file to a TEXT2SPARQL conform endpoint and
+    report the latency percentiles (p50, p90, p99, max), the outcomes and error rate and
+    the achieved requests per second. Responses are not stored and failed requests
+    are not retried.
+
+    In the open-loop modes, latencies are measured from the scheduled send time, so they
+    include the time waiting for a free connection when the endpoint falls behind.
+    """
+    if mode != CONCURRENCY and rate is None:
+        logger.error(f"The {mode} mode needs a request rate (--rate).")
+        sys.exit(1)
+    file_model = QuestionsFile.model_validate(yaml.safe_load(questions_file))
+    questions = [
+        question
+        for question_section in file_model.questions
+        for question in question_section.question.values()
+    ]
+    if not questions:
+        logger.error("The questions file has no questions.")
+        sys.exit(1)
+    count = request_count or len(questions)
+    logger.info(
+        f"Sending {count} requests to {url} ({mode}"
+        + (f", {rate} requests per second" if mode != CONCURRENCY else "")
+        + f", {concurrency} in flight)."
+    )
+    sender = Sender(url=url, dataset=file_model.dataset.id, timeout=timeout, pool_size=concurrency)
+    try:
+        if mode == CONCURRENCY:
+            samples, wall_clock = run_closed_loop(
+                sender.send, questions, count, concurrency, duration
+            )
+        else:
+            times = arrival_times(mode, count, rate or 0, seed)
+            samples, wall_clock = run_open_loop(
+                sender.send, questions, times, concurrency, duration
+            )
+    finally:
+        sender.close()
+    summary: dict = {"url": url, "mode": mode, "rate": rate, "concurrency": concurrency}
+    summary.update(report(samples, wall_clock, ok=(OK,)))
+    latency = summary["latency"]
+    if latency:
+        logger.info(
+            f"{summary['requests']} requests in {wall_clock:.2f}s ({summary['qps']:.1f} per "
+            f"second), error rate {summary['error_rate']:.1%}, latency p50 "
+            f"{latency['p50']:.3f}s, p90 {latency['p90']:.3f}s, p99 {latency['p99']:.3f}s, "
+            f"max {latency['max']:.3f}s."
+        )
+    if histogram:
+        for line in histogram_lines(summary["histogram"]):
+            click.echo(line, err=True)
+    with click.open_file(filename=output, mode="w", encoding="UTF-8") as file:
+        json.dump(summary, file, indent=2)
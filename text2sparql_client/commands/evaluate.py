@@ -1,55 +1,74 @@
 """evaluate command"""
 
 import json
-import statistics
 import sys
-from io import TextIOWrapper
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
 import click
 from loguru import logger
 
 from text2sparql_client.utils.evaluation_metrics import (
+    ENGINES,
     Evaluation,
+    ResultTable,
     combine_averages,
     filter_answer_dict,
     non_destructive_update,
 )
 from text2sparql_client.utils.language_list import LanguageList
+from text2sparql_client.utils.result_set_file import (
+    COMPACT_SUFFIX,
+    RESULT_SET_FORMATS,
+    ResultSet,
+    load_result_set,
+)
+from text2sparql_client.utils.string_table import StringTable
 
 
-def order_matters(api_name: str, true_set: dict, pred_set: dict, results: dict) -> None:
+def order_matters(  # noqa: PLR0913
+    api_name: str,
+    true_set: ResultSet,
+    pred_set: ResultSet,
+    results: dict,
+    batched: bool = True,
+    filtered_true: dict | None = None,
+) -> None:
     """Check if order matters for any of the questions and calculate the order_metric if necessary.
 
     Also generates the combined metric defined for text2sparql.
+    The filtered true set can be given, if it is shared between evaluations.
     """
     order_eval = Evaluation(api_name, metrics={"ndcg"})
     order_required = true_set["order_required"]
     filtered_predicted = filter_answer_dict(pred_set, order_required)
-    filtered_true = filter_answer_dict(true_set, order_required)
-    filtered_results = order_eval.evaluate(filtered_predicted, filtered_true)
+    if filtered_true is None:
+        filtered_true = filter_answer_dict(true_set, order_required)
+    filtered_results = order_eval.evaluate(filtered_predicted, filtered_true, batched=batched)
 
     non_destructive_update(results, filtered_results, "ndcg")
     combine_averages(results, "ndcg")
 
 
 def generate_language_averages(
-    results: dict, languages: list[type[str]], metrics: list[str]
+    results: dict,
+    languages: list[type[str]],
+    metrics: list[str],
+    table: ResultTable | None = None,
 ) -> None:
-    """Generate average metrics across all questions for each metric and language."""
-    language_averages: dict = {
-        language: {metric: [] for metric in metrics} for language in languages
-    }
-    for key, value in results.items():
-        for metric in metrics:
-            if metric in value:
-                for language in languages:
-                    if language in key:
-                        language_averages[language][metric].append(value[metric])
+    """Generate average metrics across all questions for each metric and language.
+
+    The language of a question is the suffix of its qname (`prefix:id-language`).
+    """
+    if table is None:
+        table = ResultTable(results, metrics)
     for language in languages:
+        averages = {metric: table.average(metric, language=str(language)) for metric in metrics}
+        missing = [metric for metric, average in averages.items() if average is None]
+        if missing:
+            logger.warning(f"No results for language {language}: {', '.join(missing)}")
         results[f"average-{language}"] = {
-            metric: statistics.fmean(scores)
-            for metric, scores in language_averages[language].items()
+            metric: average for metric, average in averages.items() if average is not None
         }
 
 
@@ -60,10 +79,140 @@ def check_output_file(file: str) -> None:
         sys.exit(1)
 
 
+def pop_truncated(result_set: ResultSet, name: str) -> None:
+    """Remove the list of truncated results from a result set and warn about them"""
+    truncated = result_set.pop("truncated", [])
+    if truncated:
+        logger.warning(
+            f"{len(truncated)} results in the {name} set are truncated, "
+            "their metrics may be inaccurate."
+        )
+
+
+def prediction_files(pred_sets: tuple[str, ...], input_format: str = "auto") -> dict[str, str]:
+    """Get the prediction files by system name (result set files of directories are included)
+
+    Directories are searched for JSON and compact result set files (only one of them with
+    an explicit input format). The system name is the file name without extension,
+    or the path if it is not unique.
+    """
+    patterns = {"auto": ("*.json", f"*{COMPACT_SUFFIX}"), "json": ("*.json",)}
+    files: list[str] = []
+    for pred_set in pred_sets:
+        if Path(pred_set).is_dir():
+            found = {
+                file
+                for pattern in patterns.get(input_format, (f"*{COMPACT_SUFFIX}",))
+                for file in Path(pred_set).glob(pattern)
+            }
+            files.extend(str(file) for file in sorted(found))
+        else:
+            files.append(pred_set)
+    if not files:
+        raise click.UsageError(f"No prediction files found in {', '.join(pred_sets)}.")
+    names = [Path(file).stem for file in files]
+    if len(set(names)) < len(names):
+        names = files
+    return dict(zip(names, files, strict=True))
+
+
+def evaluate_system(  # noqa: PLR0913
+    api_name: str,
+    true_set: ResultSet,
+    pred_set: ResultSet,
+    languages: list[type[str]],
+    batched: bool = True,
+    engine: str = "pytrec_eval",
+    filtered_true: dict | None = None,
+) -> dict:
+    """Evaluate the predicted result set of a system against the true result set."""
+    pop_truncated(pred_set, name=f"{api_name} predicted")
+
+    evaluator = Evaluation(api_name, engine=engine)
+    results = evaluator.evaluate(pred_set, true_set, batched=batched)
+
+    if "order_required" in true_set:
+        order_matters(
+            api_name, true_set, pred_set, results, batched=batched, filtered_true=filtered_true
+        )
+
+    if len(languages) > 1:
+        all_metrics = list(evaluator.metrics)
+        if "order_required" in true_set and "ndcg" not in all_metrics:
+            all_metrics.append("ndcg")
+        table = ResultTable(results, all_metrics)
+        generate_language_averages(results, languages, all_metrics, table=table)
+        if "order_required" in true_set:
+            for language in languages:
+                combine_averages(
+                    results,
+                    "ndcg",
+                    average_field=f"average-{language}",
+                    language=str(language),
+                    table=table,
+                )
+    return results
+
+
+# the true set of a worker process, sent once when the worker starts, and the string
+# table shared by all result sets of the process
+_true_set: ResultSet = {}
+_filtered_true: dict | None = None
+_strings = StringTable()
+
+
+def _init_worker(
+    true_set: ResultSet, filtered_true: dict | None, strings: StringTable | None = None
+) -> None:
+    global _true_set, _filtered_true, _strings  # noqa: PLW0603
+    _true_set = true_set
+    _filtered_true = filtered_true
+    _strings = strings if strings is not None else StringTable()
+
+
+def _evaluate_file(  # noqa: PLR0913
+    name: str,
+    file: str,
+    languages: list[type[str]],
+    batched: bool,
+    engine: str,
+    input_format: str = "auto",
+) -> dict:
+    pred_set_dict = load_result_set(file, input_format, _strings)
+    return evaluate_system(
+        name,
+        _true_set,
+        pred_set_dict,
+        languages,
+        batched=batched,
+        engine=engine,
+        filtered_true=_filtered_true,
+    )
+
+
+def leaderboard(systems: dict[str, dict]) -> str:
+    """Create a markdown table of the average metrics of the systems, best set_F first"""
+    metrics = sorted({metric for results in systems.values() for metric in results["average"]})
+    ranking = sorted(
+        systems.items(), key=lambda system: system[1]["average"].get("set_F", 0), reverse=True
+    )
+    lines = [
+        f"| Rank | System | {' | '.join(metrics)} |",
+        f"|------|--------|{'|'.join('-' * (len(metric) + 2) for metric in metrics)}|",
+    ]
+    for rank, (name, results) in enumerate(ranking, start=1):
+        values = [
+            f"{results['average'][metric]:.4f}" if metric in results["average"] else "-"
+            for metric in metrics
+        ]
+        lines.append(f"| {rank} | {name} | {' | '.join(values)} |")
+    return "\n".join(lines) + "\n"
+
+
 @click.command(name="evaluate")
 @click.argument("API_NAME", type=click.STRING)
-@click.argument("TRUE_SET", type=click.File())
-@click.argument("PRED_SET", type=click.File())
+@click.argument("TRUE_SET", type=click.Path(exists=True, allow_dash=True, dir_okay=False))
+@click.argument("PRED_SET", type=click.Path(exists=True, allow_dash=True), nargs=-1, required=True)
 @click.option(
     "--output",
     "-o",
@@ -80,38 +229,108 @@ def check_output_file(file: str) -> None:
     show_default=True,
     help="List of languages to generate metrics results separately.",
 )
-def evaluate_command(
+@click.option(
+    "--batched/--per-question",
+    default=True,
+    show_default=True,
+    help="Evaluate all questions at once or with a separate evaluator for each question.",
+)
+@click.option(
+    "--engine",
+    type=click.Choice(ENGINES),
+    default="pytrec_eval",
+    show_default=True,
+    help="Compute the set metrics with pytrec_eval or with vectorized numpy operations "
+    "(the ndcg of questions where the order matters is always computed with pytrec_eval).",
+)
+@click.option(
+    "--workers",
+    "-w",
+    type=click.IntRange(min=1),
+    default=1,
+    show_default=True,
+    help="Number of systems to evaluate in parallel (in separate processes).",
+)
+@click.option(
+    "--output-format",
+    type=click.Choice(["json", "leaderboard"]),
+    default="json",
+    show_default=True,
+    help="Save the results as JSON or a markdown table of the average metrics per system.",
+)
+@click.option(
+    "--input-format",
+    type=click.Choice(RESULT_SET_FORMATS),
+    default="auto",
+    show_default=True,
+    help="Format of the result sets: JSON or the compact binary format of the query command "
+    f"(auto: compact for the file extension {COMPACT_SUFFIX}, JSON otherwise).",
+)
+def evaluate_command(  # noqa: PLR0913
     api_name: str,
-    true_set: TextIOWrapper,
-    pred_set: TextIOWrapper,
+    true_set: str,
+    pred_set: tuple[str, ...],
     output: str,
     languages: list[type[str]],
+    batched: bool,
+    engine: str,
+    workers: int,
+    output_format: str,
+    input_format: str,
 ) -> None:
     """Evaluate the resuls from a TEXT2SPARQL endpoint.
 
     Use a questions YAML and a response JSON with answers collected from a TEXT2SPARQL conform api.
     This command will create a JSON file with the metric values using the pytrec_eval library.
+
+    Several PRED_SET files (or directories of result set files) can be given to evaluate many
+    systems against the same TRUE_SET. The results are then combined in a single document
+    with the results of each system under its name (the file name without extension).
     """
     check_output_file(file=output)
 
-    true_set_dict = json.load(true_set)
-    pred_set_dict = json.load(pred_set)
-
-    evaluator = Evaluation(api_name)
-    results = evaluator.evaluate(pred_set_dict, true_set_dict)
-
+    strings = StringTable()
+    true_set_dict = load_result_set(true_set, input_format, strings)
+    pop_truncated(true_set_dict, name="true")
+    filtered_true = None
     if "order_required" in true_set_dict:
-        order_matters(api_name, true_set_dict, pred_set_dict, results)
+        filtered_true = filter_answer_dict(true_set_dict, true_set_dict["order_required"])
 
-    if len(languages) > 1:
-        all_metrics = list(evaluator.metrics)
-        if "order_required" in true_set_dict and "ndcg" not in all_metrics:
-            all_metrics.append("ndcg")
-        generate_language_averages(results, languages, all_metrics)
-        if "order_required" in true_set_dict:
-            for language in languages:
-                combine_averages(results, "ndcg", average_field=f"average-{language}")
+    files = prediction_files(pred_set, input_format)
+    if len(files) == 1 and len(pred_set) == 1 and not Path(pred_set[0]).is_dir():
+        _init_worker(true_set_dict, filtered_true, strings)
+        results = {
+            api_name: _evaluate_file(
+                api_name, pred_set[0], languages, batched, engine, input_format
+            )
+        }
+        document = results[api_name]
+    else:
+        logger.info(f"Evaluating {len(files)} systems with {workers} workers.")
+        if workers == 1:
+            _init_worker(true_set_dict, filtered_true, strings)
+            results = {
+                name: _evaluate_file(name, file, languages, batched, engine, input_format)
+                for name, file in files.items()
+            }
+        else:
+            with ProcessPoolExecutor(
+                max_workers=workers,
+                initializer=_init_worker,
+                initargs=(true_set_dict, filtered_true),
+            ) as executor:
+                futures = {
+                    name: executor.submit(
+                        _evaluate_file, name, file, languages, batched, engine, input_format
+                    )
+                    for name, file in files.items()
+                }
+                results = {name: future.result() for name, future in futures.items()}
+        document = results
 
-    logger.info(f"Writing {len(results)} results to {output if output != '-' else 'stdout'}.")
+    logger.info(f"Writing {len(document)} results to {output if output != '-' else 'stdout'}.")
     with click.open_file(filename=output, mode="w", encoding="UTF-8") as file:
-        json.dump(results, file, indent=2)
+        if output_format == "leaderboard":
+            file.write(leaderboard(results))
+        else:
+            json.dump(document, file, indent=2)
@@ -2,6 +2,8 @@
 
 import json
 import sys
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from io import TextIOWrapper
 from pathlib import Path
 
@@ -10,9 +12,16 @@ import yaml
 from loguru import logger
 from tqdm import tqdm
 
+from text2sparql_client.result_cache import ONLY, REFRESH, USE, ResultCache
 from text2sparql_client.utils.evaluation_metrics import DBpediaDict2PytrecDict
 from text2sparql_client.utils.language_list import LanguageList
-from text2sparql_client.utils.query_rdf import get_json
+from text2sparql_client.utils.query_rdf import ResultLimits, get_json, stream_relevance
+from text2sparql_client.utils.result_set_file import (
+    COMPACT_SUFFIX,
+    RESULT_SET_FORMATS,
+    write_result_set,
+)
+from text2sparql_client.utils.string_table import CompactRelevance, StringTable
 
 
 def check_output_file(file: str) -> None:
@@ -22,64 +31,201 @@ def check_output_file(file: str) -> None:
         sys.exit(1)
 
 
-def generate_true_result_set(test_dataset: dict, endpoint: str, languages: list[type[str]]) -> dict:
+def summarize(names: list[str], limit: int = 10) -> str:
+    """List some names for a log message"""
+    listed = ", ".join(names[:limit])
+    return f"{listed}, ... ({len(names) - limit} more)" if len(names) > limit else listed
+
+
+def index_answers(json_answers: list[dict]) -> dict[str, dict]:
+    """Index the answers by qname
+
+    For duplicate qnames, the first answer is used.
+    """
+    answers: dict[str, dict] = {}
+    duplicates = []
+    for answer in json_answers:
+        if answer["qname"] in answers:
+            duplicates.append(answer["qname"])
+        else:
+            answers[answer["qname"]] = answer
+    if duplicates:
+        logger.warning(
+            f"{len(duplicates)} duplicate qnames in responses, using the first answer: "
+            f"{summarize(sorted(set(duplicates)))}"
+        )
+    return answers
+
+
+def query_relevance(
+    query: str,
+    endpoint: str,
+    cache: ResultCache | None,
+    limits: ResultLimits | None,
+    strings: StringTable | None = None,
+) -> tuple[dict[str, int], bool]:
+    """Execute a SPARQL query and return the result values and if the result was truncated
+
+    With limits, the result is streamed and transformed row by row. With a string table,
+    the values are interned in it.
+    """
+    if limits is None:
+        result = get_json(query, endpoint, cache=cache)
+        return DBpediaDict2PytrecDict("", strings).tranform(result)[""], False
+    return stream_relevance(
+        query,
+        endpoint,
+        max_rows=limits.max_rows,
+        max_bytes=limits.max_bytes,
+        cache=cache,
+        strings=strings,
+    )
+
+
+def execute_queries(  # noqa: PLR0913
+    queries: list[str | None],
+    endpoint: str,
+    workers: int = 1,
+    cache: ResultCache | None = None,
+    limits: ResultLimits | None = None,
+    strings: StringTable | None = None,
+) -> Iterator[tuple[list[int], dict[str, int], bool]]:
+    """Execute SPARQL queries in parallel and yield the indexes and result values of each query
+
+    Identical queries are executed only once, the result is yielded with the indexes of all
+    occurrences and if it was truncated. Results are yielded as the queries complete.
+    Missing queries (None) have an empty result.
+    """
+    occurrences: dict[str, list[int]] = {}
+    missing: list[int] = []
+    for index, query in enumerate(queries):
+        if query:
+            occurrences.setdefault(query.strip(), []).append(index)
+        else:
+            missing.append(index)
+    logger.info(f"Executing {len(occurrences)} distinct queries for {len(queries)} questions.")
+    if missing:
+        yield missing, {}, False
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(query_relevance, query, endpoint, cache, limits, strings): indexes
+            for query, indexes in occurrences.items()
+        }
+        for future in tqdm(as_completed(futures), total=len(futures)):
+            yield futures[future], *future.result()
+
+
+def transform_results(  # noqa: PLR0913
+    qnames: list[str],
+    queries: list[str | None],
+    endpoint: str,
+    workers: int = 1,
+    cache: ResultCache | None = None,
+    limits: ResultLimits | None = None,
+) -> dict:
+    """Execute the queries and transform the results into a result set of the qnames
+
+    Truncated results are listed in the `truncated` entry of the result set. While the
+    queries are executed, the results are kept as arrays of IDs into a shared string table.
+    In the result set, each distinct URI is a single string shared by all results, and
+    identical queries share their result.
+    """
+    strings = StringTable()
+    compact: list[CompactRelevance | None] = [None] * len(qnames)
+    truncated: list[str] = []
+    for indexes, relevance, is_truncated in execute_queries(
+        queries, endpoint, workers, cache, limits, strings
+    ):
+        stored = CompactRelevance(relevance, strings)
+        for index in indexes:
+            compact[index] = stored
+        if is_truncated:
+            truncated.extend(qnames[index] for index in indexes)
+    expanded: dict[int, dict] = {}
+    relevances: list[dict] = []
+    for stored_relevance in compact:
+        if stored_relevance is None:
+            relevances.append({})
+            continue
+        if id(stored_relevance) not in expanded:
+            expanded[id(stored_relevance)] = stored_relevance.to_dict()
+        relevances.append(expanded[id(stored_relevance)])
+    logger.debug(f"{len(strings)} distinct values in {len(expanded)} results.")
+    result_set: dict = dict(zip(qnames, relevances, strict=True))
+    if truncated:
+        logger.warning(f"{len(truncated)} results truncated: {summarize(sorted(truncated))}")
+        truncated_qnames = set(truncated)
+        result_set["truncated"] = [qname for qname in qnames if qname in truncated_qnames]
+    return result_set
+
+
+def generate_true_result_set(  # noqa: PLR0913
+    test_dataset: dict,
+    endpoint: str,
+    languages: list[type[str]],
+    workers: int = 1,
+    cache: ResultCache | None = None,
+    limits: ResultLimits | None = None,
+) -> dict:
     """Generate the gold truth result set from the QUESTIONS_FILE."""
     dataset_prefix = test_dataset["dataset"]["prefix"]
 
-    ground_truth = {}
-
+    qnames = []
+    queries: list[str | None] = []
     order_required = []
 
-    for question in tqdm(test_dataset["questions"]):
+    for question in test_dataset["questions"]:
         for lang in languages:
-            result_true = get_json(question["query"]["sparql"], endpoint)
             yml_qname = f"{dataset_prefix}:{question['id']}-{lang}"
-
-            db2pytrec = DBpediaDict2PytrecDict(yml_qname)
-            result_true = db2pytrec.tranform(result_true)
-
-            ground_truth.update(result_true)
+            qnames.append(yml_qname)
+            queries.append(question["query"]["sparql"])
 
             if "features" in question:  # noqa: SIM102
                 if "RESULT_ORDER_MATTERS" in question["features"]:
                     order_required.append(yml_qname)
 
+    ground_truth: dict = transform_results(qnames, queries, endpoint, workers, cache, limits)
+
     if order_required:
         ground_truth["order_required"] = order_required
 
     return ground_truth
 
 
-def generate_pred_result_set(
-    json_answers: dict, test_dataset: dict, endpoint: str, languages: list[type[str]]
+def generate_pred_result_set(  # noqa: PLR0913
+    json_answers: list[dict],
+    test_dataset: dict,
+    endpoint: str,
+    languages: list[type[str]],
+    workers: int = 1,
+    cache: ResultCache | None = None,
+    limits: ResultLimits | None = None,
 ) -> dict:
     """Generate the predicted result set from the ANSWERS_FILE."""
     dataset_prefix = test_dataset["dataset"]["prefix"]
 
-    predicted = {}
+    answers = index_answers(json_answers)
+    qnames = []
+    queries: list[str | None] = []
+    missing = []
 
-    for question in tqdm(test_dataset["questions"]):
+    for question in test_dataset["questions"]:
         for lang in languages:
             yml_qname = f"{dataset_prefix}:{question['id']}-{lang}"
+            qnames.append(yml_qname)
 
-            try:
-                response_idx = next(
-                    i for i, response in enumerate(json_answers) if response["qname"] == yml_qname
-                )
-                result_predicted = get_json(json_answers[response_idx]["query"], endpoint)
-            except StopIteration:
-                logger.info(f"\n-------\nqname {yml_qname} not found in responses\n-------\n")
-                result_predicted = {
-                    "head": {"link": [], "vars": []},
-                    "results": {"distinct": False, "ordered": True, "bindings": []},
-                }
+            if yml_qname in answers:
+                queries.append(answers[yml_qname]["query"])
+            else:
+                missing.append(yml_qname)
+                queries.append(None)
 
-            db2pytrec = DBpediaDict2PytrecDict(yml_qname)
-            result_predicted = db2pytrec.tranform(result_predicted)
+    if missing:
+        logger.info(
+            f"{len(missing)} of {len(qnames)} qnames not found in responses: {summarize(missing)}"
+        )
 
-            predicted.update(result_predicted)
-
-    return predicted
+    return transform_results(qnames, queries, endpoint, workers, cache, limits)
 
 
 @click.command(name="query")
@@ -110,6 +256,14 @@ def generate_pred_result_set(
     show_default=True,
     help="Which file to save the result_set.",
 )
+@click.option(
+    "--output-format",
+    type=click.Choice(RESULT_SET_FORMATS),
+    default="auto",
+    show_default=True,
+    help="Save the result set as indented JSON or in a compact binary format with a string "
+    f"table (auto: compact for the file extension {COMPACT_SUFFIX}, JSON otherwise).",
+)
 @click.option(
     "--languages",
     "-l",
@@ -118,12 +272,79 @@ def generate_pred_result_set(
     show_default=True,
     help="List of languages represented in the QUESTIONS_FILE.",
 )
-def query_command(
+@click.option(
+    "--workers",
+    "-w",
+    type=click.IntRange(min=1),
+    default=1,
+    show_default=True,
+    help="Number of SPARQL queries to execute in parallel.",
+)
+@click.option(
+    "--cache-db",
+    type=click.Path(dir_okay=False),
+    default=None,
+    help="Cache the SPARQL query results in this SQLite database. Queries are identified by "
+    "endpoint and query text (ignoring whitespace). Failed queries are not cached.",
+)
+@click.option(
+    "--cache-ttl",
+    type=click.FloatRange(min=0),
+    default=None,
+    help="Seconds until a cached result expires (default: never).",
+)
+@click.option(
+    "--cache-max-entries",
+    type=click.IntRange(min=1),
+    default=None,
+    help="Maximum number of cached results, the oldest results are evicted (default: unlimited).",
+)
+@click.option(
+    "--refresh",
+    is_flag=True,
+    help="Ignore cached results, query the endpoint and update the cache.",
+)
+@click.option(
+    "--cache-only",
+    is_flag=True,
+    help="Never query the endpoint, queries without a cached result have an empty result.",
+)
+@click.option(
+    "--stream",
+    is_flag=True,
+    help="Parse the SPARQL results while they are received, row by row, "
+    "instead of loading each complete result into memory.",
+)
+@click.option(
+    "--max-rows",
+    type=click.IntRange(min=1),
+    default=None,
+    help="Truncate results after this number of rows (implies --stream). "
+    "Truncated results are listed in the output.",
+)
+@click.option(
+    "--max-bytes",
+    type=click.IntRange(min=1),
+    default=None,
+    help="Truncate results after this number of bytes (implies --stream). "
+    "Truncated results are listed in the output.",
+)
+def query_command(  # noqa: PLR0913
     questions_file: TextIOWrapper,
     answers_file: TextIOWrapper,
     endpoint: str,
     output: str,
+    output_format: str,
     languages: list[type[str]],
+    workers: int,
+    cache_db: str | None,
+    cache_ttl: float | None,
+    cache_max_entries: int | None,
+    refresh: bool,
+    cache_only: bool,
+    stream: bool,
+    max_rows: int | None,
+    max_bytes: int | None,
 ) -> None:
     """Query the RDF endpoint with the queries in the QUESTIONS_FILE or ANSWERS_FILE.
 
@@ -131,14 +352,46 @@ def query_command(
     If ANSWERS_FILE is provided, it will be used to generate the predicted result set instead.
     """
     check_output_file(file=output)
+    if (refresh or cache_only) and not cache_db:
+        logger.error("--refresh and --cache-only need a result cache (--cache-db).")
+        sys.exit(1)
+    if refresh and cache_only:
+        logger.error("--refresh and --cache-only can not be used together.")
+        sys.exit(1)
+
+    cache = None
+    if cache_db:
+        cache = ResultCache(
+            file=Path(cache_db),
+            mode=REFRESH if refresh else ONLY if cache_only else USE,
+            ttl=cache_ttl,
+            max_entries=cache_max_entries,
+        )
+
+    limits = None
+    if stream or max_rows or max_bytes:
+        limits = ResultLimits(max_rows=max_rows, max_bytes=max_bytes)
 
     test_dataset = yaml.safe_load(questions_file)
-    if answers_file:
-        json_answers = json.load(answers_file)
-        result_set = generate_pred_result_set(json_answers, test_dataset, endpoint, languages)
-    else:
-        result_set = generate_true_result_set(test_dataset, endpoint, languages)
+    try:
+        if answers_file:
+            json_answers = json.load(answers_file)
+            result_set = generate_pred_result_set(
+                json_answers,
+                test_dataset,
+                endpoint,
+                languages,
+                workers=workers,
+                cache=cache,
+                limits=limits,
+            )
+        else:
+            result_set = generate_true_result_set(
+                test_dataset, endpoint, languages, workers=workers, cache=cache, limits=limits
+            )
+    finally:
+        if cache is not None:
+            cache.close()
 
     logger.info(f"Writing {len(result_set)} results to {output if output != '-' else 'stdout'}.")
-    with click.open_file(filename=output, mode="w", encoding="UTF-8") as file:
-        json.dump(result_set, file, indent=2)
+    write_result_set(result_set, output, output_format)
@@ -1,13 +1,26 @@
 """serve command"""
 
+import json
+import math
+import os
+import random
+import sys
 from asyncio import sleep
+from collections.abc import AsyncIterator, Callable, Iterable
+from functools import cache
+from http import HTTPStatus
+from pathlib import Path
 
 import click
 import fastapi
 import uvicorn
-from pydantic_settings import BaseSettings
+import yaml
+from fastapi.responses import StreamingResponse
+from loguru import logger
+from pydantic_settings import BaseSettings, SettingsConfigDict
 
 from text2sparql_client.context import ApplicationContext
+from text2sparql_client.database import read_recorded_responses
 
 SPARQL_ANSWER = """
 SELECT ?resource
@@ -22,32 +35,274 @@ KNOWN_DATASETS = [
     "https://text2sparql.aksw.org/2025/corporate/",
 ]
 
+ENV_PREFIX = "TEXT2SPARQL_SERVE_"
+LATENCY_DISTRIBUTIONS = ["fixed", "uniform", "lognormal", "percentiles"]
+SERVER_ERRORS = [
+    HTTPStatus.INTERNAL_SERVER_ERROR,
+    HTTPStatus.BAD_GATEWAY,
+    HTTPStatus.SERVICE_UNAVAILABLE,
+]
+SLOW_BODY_CHUNKS = 10
+
 
 class Settings(BaseSettings):
-    """Endpoint Settings"""
+    """Endpoint Settings
+
+    The settings are also read from environment variables with the prefix
+    TEXT2SPARQL_SERVE_ (e.g. TEXT2SPARQL_SERVE_SLEEP), so they reach all uvicorn workers.
+    """
+
+    model_config = SettingsConfigDict(env_prefix=ENV_PREFIX)
+
+    sleep: float = 3
+    latency: str = "fixed"
+    error_rate: float = 0
+    throttle_rate: float = 0
+    retry_after: int = 1
+    drop_rate: float = 0
+    slow_body_rate: float = 0
+    slow_body_duration: float = 5
+    answers: str | None = None
+    replay: str | None = None
+    replay_endpoint: str | None = None
+    replay_latency: bool = False
+    fallback_query: str = SPARQL_ANSWER
+    fallback_status: int = HTTPStatus.OK
+    seed: int | None = None
+    workers: int = 1
 
-    sleep: int = 3
+    def export(self) -> None:
+        """Export the settings to environment variables for the worker processes"""
+        for name, value in self.model_dump().items():
+            if value is not None:
+                os.environ[f"{ENV_PREFIX}{name.upper()}"] = str(value)
+
+
+def worker_seed(seed: int | None, workers: int, pid: int) -> int | str | None:
+    """Get the seed of a worker process, so several workers do not repeat the same sequence"""
+    if seed is None or workers == 1:
+        return seed
+    return f"{seed}-{pid}"
 
 
 settings = Settings()
+generator = random.Random(worker_seed(settings.seed, settings.workers, os.getpid()))  # noqa: S311
 
 endpoint = fastapi.FastAPI(
     title="TEXT2SPARQL API Example",
 )
 
 
-def run_service(host: str, port: int) -> None:
+def _numbers(values: str, count: int, distribution: str) -> list[float]:
+    numbers = [float(value) for value in values.split(",")]
+    if len(numbers) != count:
+        raise ValueError(f"The {distribution} latency needs {count} values.")
+    return numbers
+
+
+def _percentiles(values: str) -> list[tuple[float, float]]:
+    points = []
+    for point in values.split(","):
+        percentile, _, seconds = point.partition("=")
+        points.append((float(percentile) / 100, float(seconds)))
+    points.sort()
+    if not points or points[0][0] < 0 or points[-1][0] > 1:
+        raise ValueError("Percentiles need to be between 0 and 100.")
+    return points
+
+
+@cache
+def parse_latency(spec: str, sleep: float = 0) -> Callable[[random.Random], float]:
+    """Parse a latency specification into a function drawing a latency in seconds
+
+    - `fixed` (sleep seconds) or `fixed:SECONDS`
+    - `uniform:MIN,MAX` draws uniformly between MIN and MAX seconds
+    - `lognormal:MEDIAN,SIGMA` draws from a log-normal distribution with the MEDIAN
+      in seconds and the SIGMA of the underlying normal distribution
+    - `percentiles:P=SECONDS,...` (e.g. `percentiles:50=0.8,90=2.5,99=6`) replays measured
+      percentiles, interpolating linearly between them (and from 0 seconds below the first
+      percentile); latencies above the last percentile are its value
+
+    Raises ValueError for an invalid specification.
+    """
+    distribution, _, values = spec.partition(":")
+    if distribution not in LATENCY_DISTRIBUTIONS:
+        raise ValueError(
+            f"Unknown latency distribution {distribution!r}, "
+            f"use one of {', '.join(LATENCY_DISTRIBUTIONS)}."
+        )
+    try:
+        if distribution == "fixed":
+            seconds = _numbers(values, 1, distribution)[0] if values else sleep
+            return lambda _: seconds
+        if distribution == "uniform":
+            low, high = _numbers(values, 2, distribution)
+            return lambda random_: random_.uniform(low, high)
+        if distribution == "lognormal":
+            median, sigma = _numbers(values, 2, distribution)
+            mu = math.log(median)
+            return lambda random_: random_.lognormvariate(mu, sigma)
+        points = _percentiles(values)
+    except ValueError as error:
+        raise ValueError(f"Invalid latency {spec!r}: {error}") from error
+
+    def replay(random_: random.Random) -> float:
+        quantile = random_.random()
+        lower = (0.0, 0.0)
+        for upper in points:
+            if quantile <= upper[0]:
+                share = (quantile - lower[0]) / (upper[0] - lower[0]) if upper[0] > lower[0] else 1
+                return lower[1] + share * (upper[1] - lower[1])
+            lower = upper
+        return points[-1][1]
+
+    return replay
+
+
+@cache
+def load_answers(file: str | None) -> dict[str, dict[str, str]]:
+    """Load the answer tables (YAML or JSON) mapping datasets to questions and queries
+
+    Raises ValueError for an invalid answer table.
+    """
+    if file is None:
+        return {}
+    tables = yaml.safe_load(Path(file).read_text(encoding="UTF-8"))
+    if not isinstance(tables, dict) or not all(
+        isinstance(table, dict) and all(isinstance(query, str) for query in table.values())
+        for table in tables.values()
+    ):
+        raise ValueError(f"{file} needs to map datasets to tables of questions and queries.")
+    return {
+        str(dataset): {str(question): query for question, query in table.items()}
+        for dataset, table in tables.items()
+    }
+
+
+class Recording:
+    """Recorded response bodies and latencies, indexed by dataset and question
+
+    For questions recorded several times, the latest response is used.
+    """
+
+    def __init__(self, responses: Iterable[tuple[str, str, str, float | None]]):
+        self.index: dict[tuple[str, str], tuple[bytes, float]] = {}
+        for dataset, question, body, latency in responses:
+            self.index[dataset, question] = (body.encode(), latency or 0.0)
+        self.datasets = {dataset for dataset, _ in self.index}
+
+    def __len__(self) -> int:
+        """Count the recorded questions"""
+        return len(self.index)
+
+
+@cache
+def load_recording(file: str | None, endpoint: str | None = None) -> Recording:
+    """Load the successful responses (of an endpoint) from an answers database (read-only)"""
+    if file is None:
+        return Recording([])
+    recording = Recording(read_recorded_responses(Path(file), endpoint))
+    logger.info(f"Replaying {len(recording)} recorded responses from {file}.")
+    return recording
+
+
+def run_service(host: str, port: int, workers: int = 1, access_log: bool = True) -> None:
     """Start uvicorn server"""
-    uvicorn.run(endpoint, host=host, port=port)
+    if workers > 1:
+        settings.export()
+        uvicorn.run(
+            f"{__name__}:endpoint",
+            host=host,
+            port=port,
+            workers=workers,
+            access_log=access_log,
+        )
+    else:
+        uvicorn.run(endpoint, host=host, port=port, access_log=access_log)
+
+
+class DroppedConnectionError(ConnectionError):
+    """Connection dropped on purpose by the load-test endpoint"""
+
+
+async def _dropped_body(body: bytes) -> AsyncIterator[bytes]:
+    """Send half of the body, then drop the connection"""
+    yield body[: len(body) // 2]
+    raise DroppedConnectionError("Connection dropped (injected).")
+
+
+async def _slow_body(body: bytes, duration: float) -> AsyncIterator[bytes]:
+    """Send the body in chunks spread over a duration"""
+    size = math.ceil(len(body) / SLOW_BODY_CHUNKS)
+    for start in range(0, len(body), size):
+        yield body[start : start + size]
+        await sleep(duration / SLOW_BODY_CHUNKS)
+
+
+def _answer_body(question: str, dataset: str, answers: dict[str, dict[str, str]]) -> bytes:
+    """Answer from the answer tables or with the fallback"""
+    query = answers.get(dataset, {}).get(question)
+    if query is None:
+        if settings.fallback_status != HTTPStatus.OK:
+            raise fastapi.HTTPException(settings.fallback_status, "Unknown question ...")
+        query = settings.fallback_query
+    return json.dumps({"dataset": dataset, "question": question, "query": query}).encode()
 
 
 @endpoint.get("/")
-async def get_answer(question: str, dataset: str) -> dict[str, str]:
-    """Serve some answers"""
-    if dataset not in KNOWN_DATASETS:
+async def get_answer(question: str, dataset: str) -> fastapi.Response:
+    """Serve some answers
+
+    Answers come from the recorded responses, the answer tables or the fallback query.
+    With load-test settings, the answer is delayed by a random latency and some requests
+    fail with server errors, throttling, dropped connections or slow bodies.
+    """
+    answers = load_answers(settings.answers)
+    recording = load_recording(settings.replay, settings.replay_endpoint)
+    if (
+        dataset not in KNOWN_DATASETS
+        and dataset not in answers
+        and dataset not in recording.datasets
+    ):
         raise fastapi.HTTPException(404, "Unknown dataset ...")
-    await sleep(settings.sleep)
-    return {"dataset": dataset, "question": question, "query": SPARQL_ANSWER}
+    recorded = recording.index.get((dataset, question))
+    if recorded is not None and settings.replay_latency:
+        latency = recorded[1]
+    else:
+        latency = parse_latency(settings.latency, settings.sleep)(generator)
+    if latency > 0:
+        await sleep(latency)
+
+    outcome = generator.random()
+    if outcome < settings.error_rate:
+        raise fastapi.HTTPException(generator.choice(SERVER_ERRORS), "Server error (injected)")
+    outcome -= settings.error_rate
+    if outcome < settings.throttle_rate:
+        raise fastapi.HTTPException(
+            HTTPStatus.TOO_MANY_REQUESTS,
+            "Too many requests (injected)",
+            headers={"Retry-After": str(settings.retry_after)},
+        )
+    outcome -= settings.throttle_rate
+
+    body = recorded[0] if recorded is not None else _answer_body(question, dataset, answers)
+    if outcome < settings.drop_rate:
+        return StreamingResponse(
+            _dropped_body(body),
+            media_type="application/json",
+            headers={"Content-Length": str(len(body))},
+        )
+    outcome -= settings.drop_rate
+    if outcome < settings.slow_body_rate:
+        return StreamingResponse(
+            _slow_body(body, settings.slow_body_duration),
+            media_type="application/json",
+            headers={"Content-Length": str(len(body))},
+        )
+    return fastapi.Response(body, media_type="application/json")
+
+
+RATE = click.FloatRange(min=0, max=1)
 
 
 @click.command(name="serve")
@@ -68,17 +323,186 @@ async def get_answer(question: str, dataset: str) -> dict[str, str]:
 @click.option(
     "--sleep",
     "sleep_",
-    type=int,
+    type=float,
     default=3,
     show_default=True,
-    help="How long to sleep before answering.",
+    help="How long to sleep before answering (with the fixed latency). "
+    "Defaults to 0 with --replay.",
+)
+@click.option(
+    "--latency",
+    default="fixed",
+    show_default=True,
+    help="Latency distribution: 'fixed' (--sleep), 'fixed:SECONDS', 'uniform:MIN,MAX', "
+    "'lognormal:MEDIAN,SIGMA' or 'percentiles:P=SECONDS,...' "
+    "(e.g. 'percentiles:50=0.8,90=2.5,99=6').",
+)
+@click.option(
+    "--error-rate",
+    type=RATE,
+    default=0,
+    show_default=True,
+    help="Fraction of requests answered with HTTP 500, 502 or 503.",
+)
+@click.option(
+    "--throttle-rate",
+    type=RATE,
+    default=0,
+    show_default=True,
+    help="Fraction of requests answered with HTTP 429 and a Retry-After header.",
+)
+@click.option(
+    "--retry-after",
+    type=click.IntRange(min=0),
+    default=1,
+    show_default=True,
+    help="Seconds in the Retry-After header of throttled requests.",
+)
+@click.option(
+    "--drop-rate",
+    type=RATE,
+    default=0,
+    show_default=True,
+    help="Fraction of requests where the connection is dropped during the response.",
+)
+@click.option(
+    "--slow-body-rate",
+    type=RATE,
+    default=0,
+    show_default=True,
+    help="Fraction of requests where the response body is sent slowly.",
+)
+@click.option(
+    "--slow-body-duration",
+    type=click.FloatRange(min=0),
+    default=5,
+    show_default=True,
+    help="Seconds to send a slow response body.",
+)
+@click.option(
+    "--answers",
+    type=click.Path(exists=True, dir_okay=False, readable=True),
+    help="YAML or JSON file with answer tables, mapping datasets to questions and queries. "
+    "The datasets are served in addition to the known datasets, "
+    "questions without an answer get the default query.",
+)
+@click.option(
+    "--replay",
+    type=click.Path(exists=True, dir_okay=False, readable=True),
+    help="Answers database (of the ask command) to replay the recorded responses from. "
+    "The responses are loaded into memory once.",
+)
+@click.option(
+    "--replay-endpoint",
+    help="Only replay the responses of this endpoint URL (if the database has several).",
+)
+@click.option(
+    "--replay-latency/--no-replay-latency",
+    default=False,
+    show_default=True,
+    help="Delay recorded responses by their recorded latency instead of --latency.",
+)
+@click.option(
+    "--fallback-query",
+    default=SPARQL_ANSWER,
+    help="Query to answer questions without a recorded response or answer table entry. "
+    "By default, a query for a single resource.",
+)
+@click.option(
+    "--fallback-status",
+    type=click.IntRange(min=200, max=599),
+    default=HTTPStatus.OK,
+    show_default=True,
+    help="HTTP status for questions without a recorded response or answer table entry "
+    "(e.g. 404). The fallback query is only sent with status 200.",
+)
+@click.option(
+    "--workers",
+    "-w",
+    type=click.IntRange(min=1),
+    default=1,
+    show_default=True,
+    help="Number of uvicorn worker processes.",
+)
+@click.option(
+    "--access-log/--no-access-log",
+    default=True,
+    show_default=True,
+    help="Log each request (disable for high request rates).",
+)
+@click.option(
+    "--seed",
+    type=int,
+    help="Seed for the random latencies and errors "
+    "(combined with the process ID of each worker if there are several).",
 )
 @click.pass_obj
-def serve_command(app: ApplicationContext, port: int, host: str, sleep_: int) -> None:
+def serve_command(  # noqa: PLR0913
+    app: ApplicationContext,
+    port: int,
+    host: str,
+    sleep_: float,
+    latency: str,
+    error_rate: float,
+    throttle_rate: float,
+    retry_after: int,
+    drop_rate: float,
+    slow_body_rate: float,
+    slow_body_duration: float,
+    answers: str | None,
+    replay: str | None,
+    replay_endpoint: str | None,
+    replay_latency: bool,
+    fallback_query: str,
+    fallback_status: int,
+    workers: int,
+    access_log: bool,
+    seed: int | None,
+) -> None:
     """Provide a TEXT2SPARQL testing endpoint
 
     This commands provides a simple noop endpoint for reference.
+
+    For load tests, answers can be delayed by a latency distribution, and a fraction of
+    the requests can fail with server errors, throttling, dropped connections or slow
+    response bodies.
+
+    With --replay, the recorded responses of an answers database are served from memory,
+    e.g. to load-test downstream tools without an actual TEXT2SPARQL system. Replayed
+    responses are not delayed, unless --sleep, --latency or --replay-latency is given.
     """
+    context = click.get_current_context()
+    if replay and all(
+        context.get_parameter_source(name) == click.core.ParameterSource.DEFAULT
+        for name in ("sleep_", "latency")
+    ):
+        sleep_ = 0
+    if error_rate + throttle_rate + drop_rate + slow_body_rate > 1:
+        logger.error("The error, throttle, drop and slow body rates add up to more than 1.")
+        sys.exit(1)
+    try:
+        parse_latency(latency, sleep_)
+        load_answers(answers)
+        load_recording(replay, replay_endpoint)
+    except (ValueError, yaml.YAMLError) as error:
+        logger.error(str(error))
+        sys.exit(1)
     endpoint.debug = app.debug
     settings.sleep = sleep_
-    run_service(host=host, port=port)
+    settings.latency = latency
+    settings.error_rate = error_rate
+    settings.throttle_rate = throttle_rate
+    settings.retry_after = retry_after
+    settings.drop_rate = drop_rate
+    settings.slow_body_rate = slow_body_rate
+    settings.slow_body_duration = slow_body_duration
+    settings.answers = answers
+    settings.replay = replay
+    settings.replay_endpoint = replay_endpoint
+    settings.replay_latency = replay_latency
+    settings.fallback_query = fallback_query
+    settings.fallback_status = fallback_status
+    settings.seed = seed
+    settings.workers = workers
+    generator.seed(seed)
+    run_service(host=host, port=port, workers=workers, access_log=access_log)
@@ -1,110 +1,280 @@
 """database backend for the responses"""
 
+import hashlib
 import pickle
 import sqlite3
+from collections.abc import Iterable
 from pathlib import Path
+from threading import Lock
 
 from loguru import logger
 from requests import Response
 
+from text2sparql_client.metrics import ERROR, SUCCESS, RequestMetrics
+
+SCHEMA_VERSION = 3
+
+CREATE_RESPONSES_TABLE = """
+    CREATE TABLE IF NOT EXISTS responses (
+        id INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT,
+        time VARCHAR,
+        endpoint VARCHAR,
+        dataset VARCHAR,
+        question VARCHAR,
+        status_code INTEGER,
+        latency REAL,
+        body TEXT,
+        exception_type VARCHAR,
+        exception_message VARCHAR,
+        lookup_key INTEGER,
+        connect_time REAL,
+        total_time REAL,
+        bytes INTEGER,
+        outcome VARCHAR
+    )
+"""
+
+# columns with the metrics of an attempt, latency is the time to first byte
+METRICS_COLUMNS = {
+    "connect_time": "REAL",
+    "total_time": "REAL",
+    "bytes": "INTEGER",
+    "outcome": "VARCHAR",
+}
+
+SELECT_RECORDED_RESPONSES = """
+    SELECT dataset, question, body, latency FROM responses
+    WHERE (? IS NULL OR endpoint=?)
+    AND body is not null
+    AND exception_type is null
+    AND status_code < 400
+    ORDER BY time
+"""
+
+CREATE_LOOKUP_INDEX = """
+    CREATE INDEX IF NOT EXISTS responses_lookup ON responses (lookup_key, time)
+"""
+
+
+def lookup_key(endpoint: str, dataset: str, question: str) -> int:
+    """Create a compact lookup key for a question asked to an endpoint
+
+    The key is the first 64 bit of a SHA-256 hash, so it fits into an indexed INTEGER column.
+    Collisions are ruled out by comparing the actual values after the index lookup.
+    """
+    digest = hashlib.sha256(f"{endpoint}\x1f{dataset}\x1f{question}".encode()).digest()
+    return int.from_bytes(digest[:8], byteorder="big", signed=True)
+
 
 class Database:
-    """Database backend for the responses"""
+    """Database backend for the responses
+
+    The connection is shared between threads, all statements are serialized with a lock.
+    Each request sent to an endpoint is a row with its timings and outcome
+    (cache hits are not recorded).
+    """
 
     def __init__(self, file: Path):
-        self.connection = sqlite3.connect(file.absolute())
+        self.connection = sqlite3.connect(file.absolute(), check_same_thread=False)
+        self.lock = Lock()
         self.init_database()
 
     def init_database(self) -> None:
-        """Initialize the database"""
+        """Initialize the database (and migrate old database files)
+
+        The schema version (`PRAGMA user_version`) decides which migrations are run:
+        0 has pickled responses, 1 the typed schema, 2 adds the lookup keys and 3 the
+        metrics columns. Databases with a newer schema are refused.
+        """
         cursor = self.connection.cursor()
-        cursor.execute(
-            """
-            CREATE TABLE IF NOT EXISTS responses (
-                id INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT,
-                time VARCHAR,
-                endpoint VARCHAR,
-                dataset VARCHAR,
-                question VARCHAR,
-                response VARCHAR,
-                exception VARCHAR
-            )
-            """
-        )
+        columns = [row[1] for row in cursor.execute("PRAGMA table_info(responses)")]
+        version: int = cursor.execute("PRAGMA user_version").fetchone()[0]
         cursor.close()
+        if version > SCHEMA_VERSION:
+            raise sqlite3.DatabaseError(
+                f"The answers database has schema version {version}, this version of the "
+                f"client only supports up to {SCHEMA_VERSION}. Please upgrade the client."
+            )
+        if columns and version == 0:
+            self.migrate_pickled_responses()
+        elif columns:
+            if version < 2:  # noqa: PLR2004
+                self.add_lookup_keys()
+            if version < 3:  # noqa: PLR2004
+                self.add_metrics_columns()
+        with self.connection as connection:
+            connection.execute(CREATE_RESPONSES_TABLE)
+            connection.execute(CREATE_LOOKUP_INDEX)
+            connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
 
-    def register_question(self, time: str, endpoint: str, dataset: str, question: str) -> None:
-        """Register a new question"""
-        with self.connection as cursor:
-            cursor.execute(
+    def add_lookup_keys(self) -> None:
+        """Add the lookup key column to a database created without it"""
+        logger.info("Adding lookup keys to the answers database. This may take a while.")
+        self.connection.create_function("lookup_key", 3, lookup_key, deterministic=True)
+        with self.connection as connection:
+            connection.execute("ALTER TABLE responses ADD COLUMN lookup_key INTEGER")
+            connection.execute(
+                "UPDATE responses SET lookup_key = lookup_key(endpoint, dataset, question)"
+            )
+
+    def add_metrics_columns(self) -> None:
+        """Add the metrics columns to a database created without them"""
+        existing = [row[1] for row in self.connection.execute("PRAGMA table_info(responses)")]
+        with self.connection as connection:
+            for column, column_type in METRICS_COLUMNS.items():
+                if column not in existing:
+                    connection.execute(f"ALTER TABLE responses ADD COLUMN {column} {column_type}")
+
+    def migrate_pickled_responses(self) -> None:
+        """Migrate a database with pickled response objects to the typed schema
+
+        Older versions stored the complete pickled `requests.Response` and exception objects.
+        Only status code, latency, body and the exception type and message are kept.
+        """
+        logger.info("Migrating answers database with pickled responses. This may take a while.")
+        with self.connection as connection:
+            connection.execute("ALTER TABLE responses RENAME TO responses_pickled")
+            connection.execute(CREATE_RESPONSES_TABLE)
+            rows = connection.execute(
+                """
+                SELECT id, time, endpoint, dataset, question, response, exception
+                FROM responses_pickled
+                ORDER BY id
+                """
+            )
+            for row_id, time, endpoint, dataset, question, response, exception in rows:
+                status_code = latency = body = exception_type = exception_message = None
+                try:
+                    if response is not None:
+                        response_object: Response = pickle.loads(response)  # noqa: S301
+                        status_code = response_object.status_code
+                        latency = response_object.elapsed.total_seconds()
+                        body = response_object.text
+                    if exception is not None:
+                        exception_object: Exception = pickle.loads(exception)  # noqa: S301
+                        exception_type = type(exception_object).__name__
+                        exception_message = str(exception_object)
+                except Exception as error:  # noqa: BLE001
+                    logger.warning(f"Could not migrate response {row_id}: {error}")
+                    exception_type = type(error).__name__
+                    exception_message = str(error)
+                connection.execute(
+                    """
+                    INSERT INTO responses (
+                        id, time, endpoint, dataset, question,
+                        status_code, latency, body, exception_type, exception_message, lookup_key
+                    )
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    """,
+                    (
+                        row_id,
+                        time,
+                        endpoint,
+                        dataset,
+                        question,
+                        status_code,
+                        latency,
+                        body,
+                        exception_type,
+                        exception_message,
+                        lookup_key(endpoint, dataset, question),
+                    ),
+                )
+            connection.execute("DROP TABLE responses_pickled")
+        self.connection.execute("VACUUM")
+
+    def register_question(self, time: str, endpoint: str, dataset: str, question: str) -> int:
+        """Register a new question and return its row ID"""
+        with self.lock, self.connection as cursor:
+            row_id = cursor.execute(
                 """
-                INSERT INTO responses (time, endpoint, dataset, question)
-                VALUES (?, ?, ?, ?)
+                INSERT INTO responses (time, endpoint, dataset, question, lookup_key)
+                VALUES (?, ?, ?, ?, ?)
                 """,
                 (
                     time,
                     endpoint,
                     dataset,
                     question,
+                    lookup_key(endpoint, dataset, question),
                 ),
-            )
+            ).lastrowid
+        if row_id is None:
+            raise sqlite3.DatabaseError("Could not register question.")
+        return row_id
 
     def add_response(
-        self, time: str, endpoint: str, dataset: str, question: str, response: Response
+        self, row_id: int, response: Response, metrics: RequestMetrics | None = None
     ) -> None:
-        """Add a response to the database"""
-        with self.connection as cursor:
+        """Add a response (and the metrics of the attempt) to a registered question"""
+        metrics = metrics or RequestMetrics()
+        with self.lock, self.connection as cursor:
             cursor.execute(
                 """
                 UPDATE responses
-                SET response=?
-                WHERE time=? AND endpoint=? AND dataset=? AND question=?
+                SET status_code=?, latency=?, body=?,
+                connect_time=?, total_time=?, bytes=?, outcome=?
+                WHERE id=?
                 """,
                 (
-                    pickle.dumps(response),
-                    time,
-                    endpoint,
-                    dataset,
-                    question,
+                    response.status_code,
+                    response.elapsed.total_seconds(),
+                    response.text,
+                    metrics.connect,
+                    metrics.total,
+                    metrics.size,
+                    metrics.outcome or SUCCESS,
+                    row_id,
                 ),
             )
 
     def add_exception(
-        self, time: str, endpoint: str, dataset: str, question: str, exception: Exception
+        self, row_id: int, exception: Exception, metrics: RequestMetrics | None = None
     ) -> None:
-        """Add an exception to the database"""
-        with self.connection as cursor:
+        """Add an exception (and the metrics of the attempt) to a registered question"""
+        metrics = metrics or RequestMetrics()
+        with self.lock, self.connection as cursor:
             cursor.execute(
                 """
                 UPDATE responses
-                SET exception=?
-                WHERE time=? AND endpoint=? AND dataset=? AND question=?
+                SET exception_type=?, exception_message=?,
+                connect_time=?, total_time=?, bytes=?, outcome=?
+                WHERE id=?
                 """,
                 (
-                    pickle.dumps(exception),
-                    time,
-                    endpoint,
-                    dataset,
-                    question,
+                    type(exception).__name__,
+                    str(exception),
+                    metrics.connect,
+                    metrics.total,
+                    metrics.size,
+                    metrics.outcome or ERROR,
+                    row_id,
                 ),
             )
 
-    def get_response(self, endpoint: str, dataset: str, question: str) -> Response | None:
-        """Get a response from the database or None if not found"""
-        with self.connection as connection:
+    def set_outcome(self, row_id: int, outcome: str) -> None:
+        """Change the outcome of an attempt (e.g. if the response turned out invalid)"""
+        with self.lock, self.connection as cursor:
+            cursor.execute("UPDATE responses SET outcome=? WHERE id=?", (outcome, row_id))
+
+    def get_response(self, endpoint: str, dataset: str, question: str) -> str | None:
+        """Get a response body from the database or None if not found"""
+        with self.lock, self.connection as connection:
             cursor = connection.cursor()
             cursor.execute(
                 """
-                SELECT response from responses
-                WHERE endpoint=?
+                SELECT body from responses
+                WHERE lookup_key=?
+                AND endpoint=?
                 AND dataset=?
                 AND question=?
-                AND response is not null
-                AND exception is null
+                AND body is not null
+                AND exception_type is null
                 ORDER BY time DESC
                 LIMIT 1
                 """,
                 (
+                    lookup_key(endpoint, dataset, question),
                     endpoint,
                     dataset,
                     question,
@@ -115,5 +285,87 @@ class Database:
                 logger.debug("No cached response found.")
                 return None
             logger.info("Cached response found.")
-            response: Response = pickle.loads(row[0])  # noqa: S301
-            return response
+            body: str = row[0]
+            return body
+
+    def get_responses(
+        self, endpoint: str, dataset: str, questions: Iterable[str]
+    ) -> dict[str, str]:
+        """Get the latest response bodies for many questions at once
+
+        Returns a dictionary with a response body for each question with a cached response.
+        """
+        with self.lock, self.connection as connection:
+            connection.execute(
+                "CREATE TEMP TABLE IF NOT EXISTS lookup (lookup_key INTEGER, question VARCHAR)"
+            )
+            connection.execute("DELETE FROM temp.lookup")
+            connection.executemany(
+                "INSERT INTO temp.lookup VALUES (?, ?)",
+                ((lookup_key(endpoint, dataset, question), question) for question in questions),
+            )
+            rows = connection.execute(
+                """
+                SELECT responses.question, responses.body FROM temp.lookup
+                JOIN responses
+                ON responses.lookup_key = lookup.lookup_key
+                AND responses.question = lookup.question
+                WHERE responses.endpoint=?
+                AND responses.dataset=?
+                AND responses.body is not null
+                AND responses.exception_type is null
+                ORDER BY responses.time
+                """,
+                (
+                    endpoint,
+                    dataset,
+                ),
+            )
+            # rows are ordered by time, so the latest response wins
+            responses = dict(rows.fetchall())
+            connection.execute("DELETE FROM temp.lookup")
+        return responses
+
+    def get_recorded_responses(
+        self, endpoint: str | None = None
+    ) -> list[tuple[str, str, str, float | None]]:
+        """Get the successful responses (of an endpoint or all endpoints)
+
+        Returns the dataset, question, body and latency of each response, ordered by time.
+        """
+        with self.lock, self.connection as connection:
+            rows: list[tuple[str, str, str, float | None]] = connection.execute(
+                SELECT_RECORDED_RESPONSES, (endpoint, endpoint)
+            ).fetchall()
+        return rows
+
+
+def read_recorded_responses(
+    file: Path, endpoint: str | None = None
+) -> list[tuple[str, str, str, float | None]]:
+    """Read the successful responses (of an endpoint) from an answers database file
+
+    Unlike the Database class, the file is opened read-only and never created or migrated.
+    A ValueError is raised for a missing file or a database with an older schema.
+    """
+    try:
+        connection = sqlite3.connect(f"{file.absolute().as_uri()}?mode=ro", uri=True)
+    except sqlite3.Error as error:
+        raise ValueError(f"Could not open the answers database {file}: {error}") from error
+    try:
+        columns = [row[1] for row in connection.execute("PRAGMA table_info(responses)")]
+        if not columns:
+            raise ValueError(f"{file} is not an answers database.")
+        if "body" not in columns:
+            raise ValueError(
+                f"{file} has the schema of an older version, "
+                "run the ask command on it once to migrate it."
+            )
+        rows: list[tuple[str, str, str, float | None]] = connection.execute(
+            SELECT_RECORDED_RESPONSES, (endpoint, endpoint)
+        ).fetchall()
+    except sqlite3.Error as error:
+        raise ValueError(f"Could not read the answers database {file}: {error}") from error
+    finally:
+        connection.close()
+    return rows
@@ -0,0 +1,135 @@
+"""per-request metrics of ask runs and latency statistics"""
+
+from collections import Counter
+from collections.abc import Collection
+from pathlib import Path
+from threading import Lock
+
+import numpy as np
+
+CACHE_HIT = "cache_hit"
+SUCCESS = "success"
+RETRY = "retry"
+ERROR = "error"
+VALIDATION_ERROR = "validation_error"
+OUTCOMES = [CACHE_HIT, SUCCESS, RETRY, ERROR, VALIDATION_ERROR]
+PERCENTILES = (50, 90, 99)
+HISTOGRAM_START = 0.001
+
+# latency (in seconds) and outcome of a request
+Sample = tuple[float, str]
+
+
+def summary_file(output: str) -> Path:
+    """Get the file where the run summary is written next to the answers"""
+    return Path(f"{output}.summary.json")
+
+
+def histogram(latencies: np.ndarray) -> list[dict[str, float | int]]:
+    """Count the latencies in buckets with doubling upper bounds (starting at 1 ms)"""
+    if len(latencies) == 0:
+        return []
+    bounds = [HISTOGRAM_START]
+    while bounds[-1] < latencies.max():
+        bounds.append(bounds[-1] * 2)
+    counts = np.bincount(np.searchsorted(bounds, latencies), minlength=len(bounds))
+    return [
+        {"le": bound, "count": int(count)} for bound, count in zip(bounds, counts, strict=False)
+    ]
+
+
+def latency_statistics(latencies: np.ndarray) -> dict[str, float]:
+    """Get the mean, percentiles and maximum of latencies (empty without latencies)"""
+    if not len(latencies):
+        return {}
+    return {
+        "mean": float(latencies.mean()),
+        **{
+            f"p{percentile}": float(value)
+            for percentile, value in zip(
+                PERCENTILES, np.percentile(latencies, PERCENTILES), strict=True
+            )
+        },
+        "max": float(latencies.max()),
+    }
+
+
+def report(samples: list[Sample], wall_clock: float, ok: Collection[str]) -> dict:
+    """Summarize the latencies (in seconds), outcomes and achieved rate of a run
+
+    Samples with an outcome not in `ok` count as errors.
+    """
+    latencies = np.array([latency for latency, _ in samples], dtype=np.float64)
+    outcomes = Counter(outcome for _, outcome in samples)
+    errors = len(samples) - sum(outcomes[outcome] for outcome in ok)
+    return {
+        "requests": len(samples),
+        "wall_clock": wall_clock,
+        "qps": len(samples) / wall_clock if wall_clock else 0.0,
+        "error_rate": errors / len(samples) if samples else 0.0,
+        "outcomes": dict(outcomes.most_common()),
+        "latency": latency_statistics(latencies),
+        "histogram": histogram(latencies),
+    }
+
+
+def histogram_lines(buckets: list[dict[str, float | int]], width: int = 50) -> list[str]:
+    """Draw a latency histogram as text lines"""
+    most = max((int(bucket["count"]) for bucket in buckets), default=0)
+    lines = []
+    for bucket in buckets:
+        count = int(bucket["count"])
+        bar = "#" * (round(count / most * width) if most else 0)
+        lines.append(f"<= {bucket['le'] * 1000:>10.0f} ms | {bar} {count}")
+    return lines
+
+
+class RequestMetrics:
+    """Timings (in seconds), received bytes and outcome of a single attempt to answer a question
+
+    The connect time covers DNS, TCP and TLS of a new connection (0 for a re-used one),
+    the time to first byte ends when the response headers arrived and the total time
+    ends after the body was read.
+    """
+
+    def __init__(self) -> None:
+        self.connect: float | None = None
+        self.ttfb: float | None = None
+        self.total: float | None = None
+        self.size: int | None = None
+        self.outcome: str | None = None
+
+
+class RunMetrics:
+    """Collect the metrics of all attempts of a run (from multiple threads)"""
+
+    def __init__(self) -> None:
+        self.attempts: list[RequestMetrics] = []
+        self.lock = Lock()
+
+    def add(self, metrics: RequestMetrics) -> None:
+        """Add the metrics of an attempt"""
+        with self.lock:
+            self.attempts.append(metrics)
+
+    def summary(self, wall_clock: float) -> dict:
+        """Summarize the outcomes of all attempts and the timings of the sent requests"""
+        with self.lock:
+            attempts = list(self.attempts)
+        sent = [attempt for attempt in attempts if attempt.total is not None]
+        summary = report(
+            [(attempt.total or 0.0, attempt.outcome or ERROR) for attempt in sent],
+            wall_clock=wall_clock,
+            ok=(SUCCESS,),
+        )
+        summary["attempts"] = len(attempts)
+        summary["outcomes"] = dict(
+            Counter(attempt.outcome or ERROR for attempt in attempts).most_common()
+        )
+        for timing in ("connect", "ttfb"):
+            values = [getattr(attempt, timing) for attempt in sent]
+            summary[timing] = latency_statistics(
+                np.array([value for value in values if value is not None], dtype=np.float64)
+            )
+        summary["bytes"] = sum(attempt.size or 0 for attempt in sent)
+        return summary
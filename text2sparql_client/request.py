@@ -1,22 +1,219 @@
 """TEXT2SPARQL Request"""
 
+import json
+from collections.abc import Iterator
+from contextlib import contextmanager
 from datetime import UTC, datetime
+from http import HTTPStatus
+from threading import Lock, local
+from time import perf_counter
+from types import TracebackType
+from typing import Any, Self
 
 from loguru import logger
-from requests import Response, get
+from pydantic import ValidationError
+from requests import Response, Session
+from requests.adapters import DEFAULT_POOLBLOCK, DEFAULT_POOLSIZE, HTTPAdapter
+from urllib3 import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.connection import HTTPConnection, HTTPSConnection
 
 from text2sparql_client.database import Database
+from text2sparql_client.metrics import (
+    CACHE_HIT,
+    ERROR,
+    RETRY,
+    SUCCESS,
+    VALIDATION_ERROR,
+    RequestMetrics,
+)
 from text2sparql_client.models.response import ResponseMessage
+from text2sparql_client.throttle import EndpointLimiter, parse_retry_after
 
+THROTTLING_STATUS_CODES = (HTTPStatus.TOO_MANY_REQUESTS, HTTPStatus.SERVICE_UNAVAILABLE)
 
-def response_to_response_message(endpoint: str, response: Response) -> ResponseMessage:
+# connect time of the current request, requests are sent on the calling thread
+_connect_time = local()
+
+
+@contextmanager
+def _timed_connect() -> Iterator[None]:
+    """Add the time of a connect to the connect time of the current request"""
+    started = perf_counter()
+    try:
+        yield
+    finally:
+        _connect_time.seconds = getattr(_connect_time, "seconds", 0.0) + perf_counter() - started
+
+
+class TimedHTTPConnection(HTTPConnection):
+    """HTTP connection which measures its connect time (DNS and TCP)"""
+
+    def connect(self) -> None:
+        """Connect and measure the time"""
+        with _timed_connect():
+            super().connect()
+
+
+class TimedHTTPSConnection(HTTPSConnection):
+    """HTTPS connection which measures its connect time (DNS, TCP and TLS)"""
+
+    def connect(self) -> None:
+        """Connect and measure the time"""
+        with _timed_connect():
+            super().connect()
+
+
+class TimedHTTPConnectionPool(HTTPConnectionPool):
+    """HTTP connection pool with timed connections"""
+
+    ConnectionCls = TimedHTTPConnection
+
+
+class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    """HTTPS connection pool with timed connections"""
+
+    ConnectionCls = TimedHTTPSConnection
+
+
+class TimedHTTPAdapter(HTTPAdapter):
+    """HTTP adapter with timed connections"""
+
+    def init_poolmanager(self, *args: Any, **kwargs: Any) -> None:  # noqa: ANN401
+        """Initialize the pool manager with the timed connection pools"""
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": TimedHTTPConnectionPool,
+            "https": TimedHTTPSConnectionPool,
+        }
+
+
+class Text2SparqlClient:
+    """HTTP client for TEXT2SPARQL endpoints
+
+    The client owns a session with a connection pool, so connections (incl. TLS handshakes)
+    are kept alive and re-used across questions. Requests to each endpoint pass an adaptive
+    rate limiter and circuit breaker. Responses with HTTP status 429 or 5xx raise an HTTPError.
+    The client can be shared between threads. The timings of a request can be recorded
+    in request metrics.
+    """
+
+    def __init__(  # noqa: PLR0913
+        self,
+        pool_connections: int = DEFAULT_POOLSIZE,
+        pool_maxsize: int = DEFAULT_POOLSIZE,
+        pool_block: bool = DEFAULT_POOLBLOCK,
+        rate_limit: float | None = None,
+        failure_threshold: int | None = None,
+        cooldown: float = 30,
+    ):
+        """Initialize the client.
+
+        Args:
+            pool_connections (int): Number of per-host connection pools to cache
+            pool_maxsize (int): Maximum number of keep-alive connections per host
+            pool_block (bool): Block instead of opening additional connections if a pool is full
+            rate_limit (float | None): Maximum requests per second per endpoint
+            failure_threshold (int | None): Consecutive failures which pause requests
+                to an endpoint (circuit breaker)
+            cooldown (float): Seconds to pause an endpoint before probing it again
+
+        """
+        self.session = Session()
+        adapter = TimedHTTPAdapter(
+            pool_connections=pool_connections, pool_maxsize=pool_maxsize, pool_block=pool_block
+        )
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.rate_limit = rate_limit
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.limiters: dict[str, EndpointLimiter] = {}
+        self.lock = Lock()
+
+    def limiter(self, endpoint: str) -> EndpointLimiter:
+        """Get the rate limiter and circuit breaker of an endpoint"""
+        with self.lock:
+            if endpoint not in self.limiters:
+                self.limiters[endpoint] = EndpointLimiter(
+                    name=endpoint,
+                    rate=self.rate_limit,
+                    failure_threshold=self.failure_threshold,
+                    cooldown=self.cooldown,
+                )
+            return self.limiters[endpoint]
+
+    def get(
+        self,
+        endpoint: str,
+        dataset: str,
+        question: str,
+        timeout: int,
+        metrics: RequestMetrics | None = None,
+    ) -> Response:
+        """Send a question to a TEXT2SPARQL endpoint
+
+        The timings and size of the request are recorded in the metrics (if given),
+        the time waiting for the rate limiter is not included.
+        """
+        limiter = self.limiter(endpoint)
+        limiter.acquire()
+        _connect_time.seconds = 0.0
+        started = perf_counter()
+        try:
+            response = self.session.get(
+                url=endpoint,
+                params={
+                    "dataset": dataset,
+                    "question": question,
+                },
+                timeout=timeout,
+            )
+        except Exception:
+            limiter.failure()
+            raise
+        finally:
+            if metrics is not None:
+                metrics.connect = _connect_time.seconds
+                metrics.total = perf_counter() - started
+        if metrics is not None:
+            metrics.ttfb = response.elapsed.total_seconds()
+            metrics.size = len(response.content)
+        if response.status_code in THROTTLING_STATUS_CODES:
+            limiter.failure(
+                throttled=True, retry_after=parse_retry_after(response.headers.get("Retry-After"))
+            )
+            response.raise_for_status()
+        elif response.status_code >= HTTPStatus.INTERNAL_SERVER_ERROR:
+            limiter.failure()
+            response.raise_for_status()
+        else:
+            limiter.success()
+        return response
+
+    def close(self) -> None:
+        """Close all pooled connections"""
+        self.session.close()
+
+    def __enter__(self) -> Self:
+        """Enter the context, the session is closed on exit"""
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        """Close the client"""
+        self.close()
+
+
+def response_to_response_message(endpoint: str, body: str) -> ResponseMessage:
     """Create a response message"""
     try:
-        response_message = ResponseMessage(**response.json())
+        response_message = ResponseMessage(**json.loads(body))
     except Exception as error:
-        logger.error(
-            f"Error while decoding request JSON: {error}.\n----\nResponse text: {response.text}"
-        )
+        logger.error(f"Error while decoding request JSON: {error}.\n----\nResponse text: {body}")
         raise
 
     response_message.endpoint = endpoint
@@ -24,42 +221,63 @@ def response_to_response_message(endpoint: str, response: Response) -> ResponseM
 
 
 def text2sparql(  # noqa: PLR0913
-    endpoint: str, dataset: str, question: str, timeout: int, database: Database, cache: bool
+    endpoint: str,
+    dataset: str,
+    question: str,
+    timeout: int,
+    database: Database,
+    cache: bool,
+    client: Text2SparqlClient | None = None,
+    metrics: RequestMetrics | None = None,
+    retryable: tuple[type[Exception], ...] = (),
 ) -> ResponseMessage:
-    """Text to SPARQL Request."""
+    """Text to SPARQL Request.
+
+    Without a client, a new one is created for this single request.
+    The timings and outcome of the attempt are recorded in the metrics and (unless it is
+    a cache hit) the database, failures with a retryable error have the outcome retry.
+    """
+    metrics = metrics or RequestMetrics()
     if cache and (
-        cached_response := database.get_response(
-            endpoint=endpoint, dataset=dataset, question=question
-        )
+        cached_body := database.get_response(endpoint=endpoint, dataset=dataset, question=question)
     ):
-        return response_to_response_message(endpoint=endpoint, response=cached_response)
+        metrics.outcome = CACHE_HIT
+        return response_to_response_message(endpoint=endpoint, body=cached_body)
 
     timestamp = str(datetime.now(tz=UTC))
-    database.register_question(
+    row_id = database.register_question(
         time=timestamp,
         endpoint=endpoint,
         dataset=dataset,
         question=question,
     )
     try:
-        response = get(
-            url=endpoint,
-            params={
-                "dataset": dataset,
-                "question": question,
-            },
-            timeout=timeout,
-        )
-        database.add_response(
-            time=timestamp,
-            endpoint=endpoint,
-            dataset=dataset,
-            question=question,
-            response=response,
-        )
+        if client is None:
+            with Text2SparqlClient() as single_use_client:
+                response = single_use_client.get(
+                    endpoint=endpoint,
+                    dataset=dataset,
+                    question=question,
+                    timeout=timeout,
+                    metrics=metrics,
+                )
+        else:
+            response = client.get(
+                endpoint=endpoint,
+                dataset=dataset,
+                question=question,
+                timeout=timeout,
+                metrics=metrics,
+            )
+        metrics.outcome = SUCCESS
+        database.add_response(row_id=row_id, response=response, metrics=metrics)
     except Exception as error:
-        database.add_exception(
-            time=timestamp, endpoint=endpoint, dataset=dataset, question=question, exception=error
-        )
+        metrics.outcome = RETRY if isinstance(error, retryable) else ERROR
+        database.add_exception(row_id=row_id, exception=error, metrics=metrics)
+        raise
+    try:
+        return response_to_response_message(endpoint=endpoint, body=response.text)
+    except Exception as error:
+        metrics.outcome = VALIDATION_ERROR if isinstance(error, ValidationError) else ERROR
+        database.set_outcome(row_id=row_id, outcome=metrics.outcome)
         raise
-    return response_to_response_message(endpoint=endpoint, response=response)
@@ -0,0 +1,210 @@
+"""persistent cache for SPARQL query results"""
+
+import hashlib
+import json
+import re
+import sqlite3
+from pathlib import Path
+from threading import Lock
+from time import time
+
+from loguru import logger
+
+CREATE_RESULTS_TABLE = """
+    CREATE TABLE IF NOT EXISTS results (
+        cache_key INTEGER NOT NULL,
+        endpoint VARCHAR NOT NULL,
+        query TEXT NOT NULL,
+        shape VARCHAR NOT NULL,
+        time REAL NOT NULL,
+        result TEXT NOT NULL,
+        PRIMARY KEY (cache_key, endpoint, query)
+    )
+"""
+
+CREATE_TIME_INDEX = """
+    CREATE INDEX IF NOT EXISTS results_time ON results (time)
+"""
+
+USE = "use"
+REFRESH = "refresh"
+ONLY = "only"
+CACHE_MODES = [USE, REFRESH, ONLY]
+
+# shapes of cached results: complete SPARQL JSON results or only the result values
+SPARQL_RESULT = "sparql"
+VALUES_RESULT = "values"
+
+# string literals (long ones first) and IRIs are kept as they are, comments are removed
+TOKEN = re.compile(
+    r'''"""(?:[^"\\]|\\.|"(?!""))*"""'''
+    r"""|'''(?:[^'\\]|\\.|'(?!''))*'''"""
+    r"""|"(?:[^"\\\n]|\\.)*"|'(?:[^'\\\n]|\\.)*'"""
+    r"""|<[^<>"{}|^`\\\x00-\x20]*>"""
+    r"|(?P<comment>#[^\n]*)",
+    re.DOTALL,
+)
+WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_query(query: str) -> str:
+    """Normalize a SPARQL query for the cache lookup
+
+    Comments are removed and runs of whitespace outside of string literals and IRIs are
+    collapsed into a single space, so queries differing only in comments, indentation or
+    line breaks share a cache entry.
+    """
+    parts = []
+    # text outside of literals and IRIs (comments become a space) until the next literal
+    pending = ""
+    position = 0
+    for token in TOKEN.finditer(query):
+        pending += query[position : token.start()]
+        position = token.end()
+        if token.group("comment") is not None:
+            pending += " "
+            continue
+        parts.append(WHITESPACE.sub(" ", pending))
+        parts.append(token.group())
+        pending = ""
+    parts.append(WHITESPACE.sub(" ", pending + query[position:]))
+    normalized = "".join(parts)
+    return normalized.strip()
+
+
+def cache_key(endpoint: str, query: str, shape: str = SPARQL_RESULT) -> int:
+    """Create a compact key for a normalized query to an endpoint and the result shape
+
+    The key is the first 64 bit of a SHA-256 hash, so it fits into an INTEGER column.
+    Collisions are ruled out by comparing the actual values after the lookup.
+    """
+    digest = hashlib.sha256(f"{endpoint}\x1f{shape}\x1f{query}".encode()).digest()
+    return int.from_bytes(digest[:8], byteorder="big", signed=True)
+
+
+class ResultCache:
+    """Persistent cache for SPARQL query results, keyed by endpoint, normalized query and shape
+
+    Complete SPARQL results and the compact results of streamed queries (only the values)
+    are cached separately, so each is only returned to the same kind of lookup.
+
+    In the `use` mode, cached results are returned and missing results are queried.
+    In the `refresh` mode, all queries are sent and the cached results are replaced.
+    In the `only` mode, the endpoint is never queried and missing results are empty.
+    Entries older than the time to live are ignored. On close, expired entries are
+    removed and the oldest entries are evicted down to the maximum number of entries.
+    The connection is shared between threads, all statements are serialized with a lock.
+    """
+
+    def __init__(
+        self,
+        file: Path,
+        mode: str = USE,
+        ttl: float | None = None,
+        max_entries: int | None = None,
+    ):
+        """Initialize the cache.
+
+        Args:
+            file (Path): The SQLite database file
+            mode (str): How to use the cache (use, refresh or only)
+            ttl (float | None): Seconds until a cached result expires (None never expires)
+            max_entries (int | None): Maximum number of cached results (None is unlimited)
+
+        """
+        self.mode = mode
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.connection = sqlite3.connect(file.absolute(), check_same_thread=False)
+        self.lock = Lock()
+        columns = [row[1] for row in self.connection.execute("PRAGMA table_info(results)")]
+        with self.connection as connection:
+            if columns and "shape" not in columns:
+                # the shape of older entries is unknown, so they are dropped
+                logger.info("Clearing a SPARQL result cache of an older version.")
+                connection.execute("DROP TABLE results")
+            connection.execute(CREATE_RESULTS_TABLE)
+            connection.execute(CREATE_TIME_INDEX)
+
+    def _oldest_valid_time(self) -> float:
+        return time() - self.ttl if self.ttl is not None else float("-inf")
+
+    def get(self, endpoint: str, query: str, shape: str = SPARQL_RESULT) -> dict | None:
+        """Get a cached result or None if not found (or expired, or refreshing)"""
+        if self.mode == REFRESH:
+            return None
+        normalized = normalize_query(query)
+        with self.lock, self.connection as connection:
+            row = connection.execute(
+                """
+                SELECT result FROM results
+                WHERE cache_key=? AND endpoint=? AND query=? AND shape=? AND time>=?
+                """,
+                (
+                    cache_key(endpoint, normalized, shape),
+                    endpoint,
+                    normalized,
+                    shape,
+                    self._oldest_valid_time(),
+                ),
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        result: dict = json.loads(row[0])
+        return result
+
+    def put(self, endpoint: str, query: str, result: dict, shape: str = SPARQL_RESULT) -> None:
+        """Add or replace a cached result"""
+        normalized = normalize_query(query)
+        with self.lock, self.connection as connection:
+            connection.execute(
+                """
+                INSERT OR REPLACE INTO results (cache_key, endpoint, query, shape, time, result)
+                VALUES (?, ?, ?, ?, ?, ?)
+                """,
+                (
+                    cache_key(endpoint, normalized, shape),
+                    endpoint,
+                    normalized,
+                    shape,
+                    time(),
+                    json.dumps(result),
+                ),
+            )
+
+    def evict(self) -> int:
+        """Remove expired entries and the oldest entries beyond the maximum number of entries
+
+        Returns the number of removed entries.
+        """
+        with self.lock, self.connection as connection:
+            removed = connection.execute(
+                "DELETE FROM results WHERE time<?", (self._oldest_valid_time(),)
+            ).rowcount
+            if self.max_entries is not None:
+                removed += connection.execute(
+                    """
+                    DELETE FROM results WHERE rowid IN (
+                        SELECT rowid FROM results ORDER BY time DESC LIMIT -1 OFFSET ?
+                    )
+                    """,
+                    (self.max_entries,),
+                ).rowcount
+        return removed
+
+    def close(self) -> None:
+        """Evict old entries, log the hit ratio and close the database"""
+        removed = self.evict()
+        if removed:
+            logger.info(f"Evicted {removed} results from the SPARQL result cache.")
+        lookups = self.hits + self.misses
+        if lookups:
+            logger.info(
+                f"SPARQL result cache: {self.hits} of {lookups} queries answered from the cache "
+                f"({self.hits / lookups:.0%} hit ratio)."
+            )
+        self.connection.close()
@@ -0,0 +1,157 @@
+"""non-blocking job dispatch with retries"""
+
+import heapq
+import random
+from collections import deque
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from itertools import count
+from time import monotonic, perf_counter, sleep
+from typing import Generic, TypeVar
+
+from loguru import logger
+
+Job = TypeVar("Job")
+Result = TypeVar("Result")
+
+
+class Backoff:
+    """Exponential backoff with jitter"""
+
+    def __init__(self, initial: float, maximum: float):
+        """Initialize the backoff.
+
+        Args:
+            initial (float): Delay in seconds before the first retry
+            maximum (float): Maximum delay in seconds before any retry
+
+        """
+        self.initial = initial
+        self.maximum = maximum
+
+    def delay(self, retry: int) -> float:
+        """Get the delay before a retry (counting from 1)
+
+        The delay doubles with each retry, up to the maximum. Half of it is random
+        (equal jitter), so failed jobs do not retry in lockstep.
+        """
+        delay = min(self.maximum, self.initial * 2.0 ** (retry - 1))
+        return delay / 2 + random.uniform(0, delay / 2)  # noqa: S311
+
+
+class RetryScheduler(Generic[Job, Result]):
+    """Run jobs in a thread pool and re-schedule failed jobs without blocking the others
+
+    Jobs failing with a retryable error are put into a queue with a backoff delay, while the
+    workers keep processing the other jobs. A job is skipped after the maximum number of
+    retries, or if the retry budget of the whole run is exhausted. Jobs failing with any
+    other error are skipped right away, without stopping the other jobs.
+    """
+
+    def __init__(  # noqa: PLR0913
+        self,
+        function: Callable[[Job], Result],
+        name: Callable[[Job], str],
+        concurrency: int,
+        retries: int,
+        backoff: Backoff,
+        retryable: tuple[type[Exception], ...],
+        budget: int | None = None,
+    ):
+        """Initialize the scheduler.
+
+        Args:
+            function (Callable): The function to run for each job
+            name (Callable): Function to name a job in log messages
+            concurrency (int): Number of jobs to run in parallel
+            retries (int): Maximum number of retries per job
+            backoff (Backoff): Delay between the retries of a job
+            retryable (tuple): Exception types which lead to a retry
+            budget (int | None): Maximum number of retries in total (None is unlimited)
+
+        """
+        self.function = function
+        self.name = name
+        self.concurrency = concurrency
+        self.retries = retries
+        self.backoff = backoff
+        self.retryable = retryable
+        self.budget = budget
+        self.retries_used = 0
+        self.failed = 0
+        self.summed_latency = 0.0
+
+    def _attempt(self, job: Job) -> tuple[Result | None, Exception | None, float]:
+        """Run a job once and return the result or the error and the latency"""
+        started = perf_counter()
+        try:
+            return self.function(job), None, perf_counter() - started
+        except Exception as error:  # noqa: BLE001
+            return None, error, perf_counter() - started
+
+    def _retry(self, job: Job, retry: int, error: Exception) -> float | None:
+        """Get the delay before the next retry or None if the job is skipped"""
+        name = self.name(job)
+        logger.bind(retry=True).warning(f"{name} | {error}")
+        if retry >= self.retries:
+            logger.bind(retry=True).error(
+                f"{name} | Maximum number of retries reached. Skipping question."
+            )
+            return None
+        if self.budget is not None and self.retries_used >= self.budget:
+            logger.bind(retry=True).error(
+                f"{name} | Retry budget of {self.budget} retries exhausted. Skipping question."
+            )
+            return None
+        self.retries_used += 1
+        delay = self.backoff.delay(retry + 1)
+        logger.bind(retry=True).info(
+            f"{name} | Retrying ({retry + 1}/{self.retries}) after {delay:.1f} seconds..."
+        )
+        return delay
+
+    def run(self, jobs: Iterable[Job]) -> Iterator[tuple[Job, Result | None]]:
+        """Run all jobs and yield each job with its result (None if skipped) when finished
+
+        Jobs are yielded in the order they finish.
+        """
+        ready: deque[tuple[Job, int]] = deque((job, 0) for job in jobs)
+        delayed: list[tuple[float, int, Job, int]] = []
+        sequence = count()
+        running: dict[Future[tuple[Result | None, Exception | None, float]], tuple[Job, int]] = {}
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            while ready or delayed or running:
+                while delayed and delayed[0][0] <= monotonic():
+                    _, _, job, retry = heapq.heappop(delayed)
+                    ready.append((job, retry))
+                while ready and len(running) < self.concurrency:
+                    job, retry = ready.popleft()
+                    running[executor.submit(self._attempt, job)] = (job, retry)
+                timeout = max(0.0, delayed[0][0] - monotonic()) if delayed else None
+                if not running:
+                    sleep(timeout or 0)
+                    continue
+                done, _ = wait(running, timeout=timeout, return_when=FIRST_COMPLETED)
+                for future in done:
+                    job, retry = running.pop(future)
+                    result, error, latency = future.result()
+                    self.summed_latency += latency
+                    if error is None:
+                        yield job, result
+                        continue
+                    if not isinstance(error, self.retryable):
+                        logger.bind(retry=True).error(
+                            f"{self.name(job)} | {type(error).__name__}: {error}. "
+                            "Skipping question."
+                        )
+                        self.failed += 1
+                        yield job, None
+                        continue
+                    delay = self._retry(job=job, retry=retry, error=error)
+                    if delay is None:
+                        self.failed += 1
+                        yield job, None
+                    else:
+                        heapq.heappush(
+                            delayed, (monotonic() + delay, next(sequence), job, retry + 1)
+                        )
@@ -0,0 +1,146 @@
+"""adaptive rate limiting and circuit breaking per endpoint"""
+
+from datetime import UTC, datetime
+from email.utils import parsedate_to_datetime
+from threading import Condition
+from time import monotonic
+
+from loguru import logger
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half-open"
+
+
+def parse_retry_after(value: str | None) -> float | None:
+    """Parse a Retry-After header (seconds or HTTP date) into seconds from now"""
+    if not value:
+        return None
+    if value.strip().isdigit():
+        return float(value)
+    try:
+        date = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, (date - datetime.now(tz=UTC)).total_seconds())
+
+
+class EndpointLimiter:
+    """Token bucket rate limiter with a circuit breaker for a single endpoint
+
+    The rate is halved whenever the endpoint throttles (HTTP 429/503) and recovers step by step
+    with each successful request. A Retry-After header pauses all requests to the endpoint.
+    After a number of consecutive failures, the circuit opens and requests are paused for a
+    cooldown period. Then a single probe request is sent, which closes the circuit on success
+    or opens it again on failure.
+    """
+
+    def __init__(  # noqa: PLR0913
+        self,
+        name: str,
+        rate: float | None = None,
+        burst: int = 1,
+        min_rate: float = 0.1,
+        failure_threshold: int | None = None,
+        cooldown: float = 30,
+    ):
+        """Initialize the limiter.
+
+        Args:
+            name (str): Name of the endpoint in log messages
+            rate (float | None): Maximum requests per second (None is unlimited)
+            burst (int): Maximum number of requests sent at once at full rate
+            min_rate (float): Lower limit when reducing the rate
+            failure_threshold (int | None): Consecutive failures opening the circuit
+                (None disables the circuit breaker)
+            cooldown (float): Seconds to pause before probing an opened circuit
+
+        """
+        self.name = name
+        self.max_rate = rate
+        self.rate = rate
+        self.burst = burst
+        self.min_rate = min_rate
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.tokens = float(burst)
+        self.updated = monotonic()
+        self.paused_until = 0.0
+        self.state = CLOSED
+        self.opened_until = 0.0
+        self.probing = False
+        self.failures = 0
+        self.condition = Condition()
+
+    def _log(self, message: str) -> None:
+        logger.bind(retry=True).warning(f"{self.name} | {message}")
+
+    def _wait_time(self, now: float) -> float | None:
+        """Get the seconds to wait before the next request (0: go, None: wait for a probe)"""
+        if self.paused_until > now:
+            return self.paused_until - now
+        if self.state == OPEN:
+            if self.opened_until > now:
+                return self.opened_until - now
+            self.state = HALF_OPEN
+            self._log("Circuit half-open, sending a probe request.")
+        if self.state == HALF_OPEN and self.probing:
+            return None
+        if self.rate is not None:
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens < 1:
+                return (1 - self.tokens) / self.rate
+            self.tokens -= 1
+        if self.state == HALF_OPEN:
+            self.probing = True
+        return 0
+
+    def acquire(self) -> None:
+        """Wait until a request to the endpoint is allowed"""
+        with self.condition:
+            while (wait := self._wait_time(monotonic())) != 0:
+                self.condition.wait(timeout=wait)
+
+    def success(self) -> None:
+        """Record a successful request"""
+        with self.condition:
+            self.failures = 0
+            if self.state == HALF_OPEN:
+                self.state = CLOSED
+                self.probing = False
+                self._log("Probe request succeeded, circuit closed.")
+            if self.rate is not None and self.max_rate is not None and self.rate < self.max_rate:
+                self.rate = min(self.max_rate, self.rate + self.max_rate / 10)
+                if self.rate == self.max_rate:
+                    self._log(f"Rate limit restored to {self.rate:.2f} requests per second.")
+            self.condition.notify_all()
+
+    def failure(self, throttled: bool = False, retry_after: float | None = None) -> None:
+        """Record a failed request (throttled by the endpoint or not)"""
+        with self.condition:
+            now = monotonic()
+            self.failures += 1
+            if throttled and self.rate is not None and self.rate > self.min_rate:
+                self.rate = max(self.min_rate, self.rate / 2)
+                self._log(f"Endpoint throttles, rate limit reduced to {self.rate:.2f} per second.")
+            if retry_after is not None and now + retry_after > self.paused_until:
+                self.paused_until = now + retry_after
+                self._log(f"Pausing requests for {retry_after:.1f} seconds (Retry-After).")
+            if self.state == HALF_OPEN:
+                self.state = OPEN
+                self.probing = False
+                self.opened_until = now + self.cooldown
+                self._log(f"Probe request failed, circuit opened for {self.cooldown} seconds.")
+            elif (
+                self.state == CLOSED
+                and self.failure_threshold is not None
+                and self.failures >= self.failure_threshold
+            ):
+                self.state = OPEN
+                self.opened_until = now + self.cooldown
+                self._log(
+                    f"{self.failures} consecutive failures, "
+                    f"circuit opened for {self.cooldown} seconds."
+                )
+            self.condition.notify_all()
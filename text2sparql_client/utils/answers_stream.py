@@ -0,0 +1,168 @@
+"""streaming output of answers"""
+
+import itertools
+import json
+import tempfile
+from collections.abc import Iterator
+from pathlib import Path
+from textwrap import indent
+from types import TracebackType
+from typing import IO, Self
+
+import click
+from loguru import logger
+
+OUTPUT_FORMATS = ["json", "ndjson"]
+
+
+def partial_output_file(output: str) -> Path:
+    """Get the file where answers are streamed to before the JSON output is finalized"""
+    return Path(f"{output}.partial")
+
+
+def interrupted_stream(output: str, output_format: str = "json") -> Path | None:
+    """Get the stream of answers an interrupted run has left behind (if any)"""
+    if output == "-":
+        return None
+    stream = Path(output) if output_format == "ndjson" else partial_output_file(output)
+    return stream if stream.exists() else None
+
+
+def _ends_with_incomplete_line(stream: Path) -> bool:
+    """Check if a stream does not end with a line break"""
+    if not stream.exists() or stream.stat().st_size == 0:
+        return False
+    with stream.open(mode="rb") as file:
+        file.seek(-1, 2)
+        return file.read(1) != b"\n"
+
+
+def answer_key(answer: dict) -> str:
+    """Identify an answer by its qname (or the question if there are no question IDs)"""
+    key: str = answer.get("qname") or answer["question"]
+    return key
+
+
+def _iter_offsets(stream: Path) -> Iterator[tuple[int, dict]]:
+    """Iterate the byte offsets and answers of a (possibly truncated) NDJSON stream"""
+    with stream.open(mode="rb") as file:
+        offset = 0
+        for number, line in enumerate(file, start=1):
+            start, offset = offset, offset + len(line)
+            if not line.strip():
+                continue
+            try:
+                yield start, json.loads(line)
+            except json.JSONDecodeError:
+                logger.warning(f"Skipping incomplete answer in line {number} of {stream}.")
+
+
+def iter_answers(stream: Path) -> Iterator[dict]:
+    """Iterate the answers of a (possibly truncated) NDJSON stream"""
+    for _, answer in _iter_offsets(stream):
+        yield answer
+
+
+def _iter_ordered_answers(stream: Path, order: list[str]) -> Iterator[dict]:
+    """Iterate the answers of an NDJSON stream in the order of their answer keys
+
+    Only the byte offsets of the answers are indexed by their keys, each answer is read
+    again from the stream when it is written. Answers with unknown keys come last.
+    """
+    offsets: dict[str, list[int]] = {key: [] for key in order}
+    unknown: list[int] = []
+    for offset, answer in _iter_offsets(stream):
+        offsets.get(answer_key(answer), unknown).append(offset)
+    with stream.open(mode="rb") as file:
+        for offset in itertools.chain(*offsets.values(), unknown):
+            file.seek(offset)
+            yield json.loads(file.readline())
+
+
+def finalize_answers(stream: Path, output: str, order: list[str] | None = None) -> int:
+    """Turn an NDJSON stream of answers into a JSON list and return the number of answers
+
+    The list is written answer by answer, in the same layout as `json.dump(answers, indent=2)`.
+    If an order of answer keys is given, the answers are sorted accordingly (by seeking
+    to their lines in the stream, so the answers are not loaded into memory at once).
+    """
+    answers = iter_answers(stream) if order is None else _iter_ordered_answers(stream, order)
+    count = 0
+    with click.open_file(filename=output, mode="w", encoding="UTF-8") as target:
+        target.write("[")
+        for answer in answers:
+            target.write(",\n" if count else "\n")
+            target.write(indent(json.dumps(answer, indent=2), "  "))
+            count += 1
+        target.write("\n]" if count else "]")
+    return count
+
+
+class AnswersStream:
+    """Write answers to the output as soon as they are available
+
+    With the `ndjson` format, each answer is written as a line to the output.
+    With the `json` format, answers are streamed to a partial output file first, which is
+    finalized to a JSON list on close. After an interruption, the partial file keeps
+    all answers received so far. To resume, answers are appended to the existing stream.
+    If an order of answer keys is given, the JSON list is sorted accordingly when finalized.
+    """
+
+    def __init__(
+        self,
+        output: str,
+        output_format: str = "json",
+        resume: bool = False,
+        order: list[str] | None = None,
+    ):
+        self.output = output
+        self.output_format = output_format
+        self.order = order
+        self.count = 0
+        self.stream_file: Path | None = None
+        self.file: IO[str]
+        mode = "a" if resume else "w"
+        if output_format == "ndjson":
+            self.file = click.open_file(filename=output, mode=mode, encoding="UTF-8")
+        elif output == "-":
+            self.file = tempfile.NamedTemporaryFile(  # noqa: SIM115
+                mode="w", encoding="UTF-8", suffix=".ndjson", delete=False
+            )
+            self.stream_file = Path(self.file.name)
+        else:
+            self.stream_file = partial_output_file(output)
+            self.file = self.stream_file.open(mode=mode, encoding="UTF-8")
+        if resume and _ends_with_incomplete_line(Path(self.file.name)):
+            # an interrupted write must not swallow the first new answer
+            self.file.write("\n")
+
+    def write(self, answer: dict) -> None:
+        """Write a single answer and flush it"""
+        self.file.write(json.dumps(answer) + "\n")
+        self.file.flush()
+        self.count += 1
+
+    def close(self) -> None:
+        """Close the stream and finalize the output"""
+        self.file.close()
+        if self.stream_file is not None:
+            finalize_answers(stream=self.stream_file, output=self.output, order=self.order)
+            self.stream_file.unlink()
+
+    def __enter__(self) -> Self:
+        """Enter the context, the output is finalized on exit"""
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        """Finalize the output, but keep the partial output on errors"""
+        if exc_type is None:
+            self.close()
+        else:
+            self.file.close()
+            if self.stream_file is not None:
+                logger.warning(f"Partial answers have been kept in {self.stream_file}.")
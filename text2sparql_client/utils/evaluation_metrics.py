@@ -1,11 +1,21 @@
 """evaluation functions and classes"""
 
-import statistics
+import math
+from collections.abc import Iterable, Mapping
+from collections.abc import Set as AbstractSet
+from typing import Any
 
+import numpy as np
 import pytrec_eval
+from loguru import logger
 
+from text2sparql_client.utils.string_table import StringTable
 
-def filter_answer_dict(answer_dict: dict, order_required: list) -> dict:
+ENGINES = ["pytrec_eval", "numpy"]
+SET_METRICS = {"set_F", "set_P", "set_recall"}
+
+
+def filter_answer_dict(answer_dict: Mapping, order_required: list) -> dict:
     """Filter the questions where order is required for full evaluation"""
     return_dict = {}
     for question_id in order_required:
@@ -19,31 +29,108 @@ def non_destructive_update(results: dict, new_results: dict, new_metric: str) ->
         results[key][new_metric] = new_results[key][new_metric]
 
 
-def combine_averages(
-    results: dict, new_metric: str, average_field: str = "average", old_metric: str = "set_F"
+AVERAGE = "average"
+
+
+def is_average(key: str) -> bool:
+    """Check if a result key is an average (`average` or `average-<language>`)"""
+    return key == AVERAGE or key.startswith(f"{AVERAGE}-")
+
+
+def _fmean(values: np.ndarray) -> float | None:
+    """Average like `statistics.fmean` (from an exact sum), None if there are no values"""
+    if len(values) == 0:
+        return None
+    return math.fsum(values.tolist()) / len(values)
+
+
+class ResultTable:
+    """Columnar table of the question results, parsed once for grouped averages
+
+    Each question result becomes a row with the qname, the question ID and the language
+    (parsed from qnames like `prefix:id-language`) and a column of values per metric,
+    where missing values are NaN.
+    """
+
+    def __init__(self, results: dict, metrics: Iterable[str]) -> None:
+        """Initialize the table.
+
+        Args:
+            results (dict): Dictionary of the question results (averages are skipped)
+            metrics (Iterable): Metrics to read from the question results
+
+        """
+        self.qnames = [key for key in results if not is_average(key)]
+        parts = [qname.rpartition("-") for qname in self.qnames]
+        self.question_ids = np.array([question_id for question_id, _, _ in parts], dtype=object)
+        self.languages = np.array([language for _, _, language in parts], dtype=object)
+        self.values = {
+            metric: np.fromiter(
+                (results[qname].get(metric, np.nan) for qname in self.qnames),
+                dtype=np.float64,
+                count=len(self.qnames),
+            )
+            for metric in metrics
+        }
+
+    def rows(self, language: str | None = None) -> np.ndarray:
+        """Get a mask of the rows of a language (or all rows)"""
+        if language is None:
+            return np.ones(len(self.qnames), dtype=bool)
+        mask: np.ndarray = self.languages == language
+        return mask
+
+    def average(self, metric: str, language: str | None = None) -> float | None:
+        """Average the present values of a metric (None if there are no values)"""
+        values = self.values[metric][self.rows(language) & ~np.isnan(self.values[metric])]
+        return _fmean(values)
+
+    def combined_average(
+        self, new_metric: str, old_metric: str, language: str | None = None
+    ) -> float | None:
+        """Average the new metric where present and the old metric otherwise"""
+        combined = np.where(
+            np.isnan(self.values[new_metric]), self.values[old_metric], self.values[new_metric]
+        )
+        return _fmean(combined[self.rows(language)])
+
+
+def combine_averages(  # noqa: PLR0913
+    results: dict,
+    new_metric: str,
+    average_field: str = AVERAGE,
+    old_metric: str = "set_F",
+    language: str | None = None,
+    table: ResultTable | None = None,
 ) -> None:
-    """Create a new average value that combines set_F with order_metric"""
-    combined_list = []
-    for value in results.values():
-        if new_metric in value:
-            combined_list.append(value[new_metric])
-        else:
-            combined_list.append(value[old_metric])
+    """Create a new average value that combines set_F with order_metric
 
-    results[average_field][f"{old_metric}_{new_metric}"] = statistics.fmean(combined_list)
+    Only the question results (of the language, if given) are combined.
+    """
+    if table is None:
+        table = ResultTable(results, metrics=[new_metric, old_metric])
+    average = table.combined_average(new_metric, old_metric, language=language)
+    if average is not None:
+        results[average_field][f"{old_metric}_{new_metric}"] = average
 
 
 class DBpediaDict2PytrecDict:
     """Transform the DBpedia returned dict into a dict readable to compute the metrics"""
 
-    def __init__(self, question: str) -> None:
+    def __init__(self, question: str, strings: StringTable | None = None) -> None:
         """Initialize the DBpediaDict2PytrecDict class.
 
         Args:
             question (str): The question that generate the sparql query.
+            strings (StringTable | None): Table to intern the values in, so results
+                share a single string per distinct URI (None keeps the parsed strings)
 
         """
         self.question = question
+        self.strings = strings
+
+    def _value(self, value: str) -> str:
+        return self.strings.intern(value) if self.strings is not None else value
 
     def tranform(self, sparql_dict: dict) -> dict:
         """Transform a sparql dict into a dict to be evaluated through the pytrec library.
@@ -67,9 +154,103 @@ class DBpediaDict2PytrecDict:
             for var in list_vars:
                 for value in list_results:
                     if var in value:
-                        d[self.question][value[var]["value"]] = 1
+                        d[self.question][self._value(value[var]["value"])] = 1
         return d
 
+    def transform_stream(
+        self, events: Iterable[tuple[str, Any]], max_rows: int | None = None
+    ) -> tuple[dict, bool]:
+        """Transform a stream of sparql result events one row at a time.
+
+        The result is the same as `tranform` of the complete sparql dict, but only the
+        values of the result are kept in memory instead of all bindings.
+
+        Args:
+            events (Iterable): Parts of the sparql result, see `iter_result_events`
+            max_rows (int | None): Stop after this number of bindings (None is unlimited)
+
+        Returns:
+           tuple[dict, bool]: The dictionary of the predicted list and if it was truncated
+
+        """
+        values: dict[str, dict[str, int]] = {}
+        variables = None
+        rows = 0
+        for event, value in events:
+            if event == "vars":
+                variables = value
+            elif event == "boolean":
+                return {self.question: {"true": 1 if value else 0}}, False
+            elif event == "binding":
+                if max_rows is not None and rows >= max_rows:
+                    return {self.question: self._merge(values, variables)}, True
+                rows += 1
+                for var, term in value.items():
+                    values.setdefault(var, {})[self._value(term["value"])] = 1
+        return {self.question: self._merge(values, variables)}, False
+
+    @staticmethod
+    def _merge(values: dict[str, dict[str, int]], variables: list[str] | None) -> dict:
+        """Merge the values per variable in the order of the head variables"""
+        merged: dict = {}
+        for var in variables if variables is not None else values:
+            merged.update(values.get(var, {}))
+        return merged
+
+
+def _relevant_values(ground_truth: dict[str, int]) -> AbstractSet[str]:
+    """Get the values with a relevance of at least 1"""
+    if min(ground_truth.values()) >= 1:
+        return ground_truth.keys()
+    return {value for value, relevance in ground_truth.items() if relevance >= 1}
+
+
+def set_metrics(
+    predicted_dict: Mapping[str, dict[str, int]],
+    ground_truth_dict: Mapping[str, dict[str, int]],
+    question_ids: list[str],
+) -> tuple[list[str], dict[str, np.ndarray]]:
+    """Compute set precision, recall and F1 of many questions with vectorized operations.
+
+    The results are the same as those of trec_eval (and pytrec_eval): values with a
+    relevance of at least 1 are relevant, all predicted values are retrieved and questions
+    without ground truth entries are skipped.
+
+    Args:
+        predicted_dict (dict): Dictionary of the predicted lists
+        ground_truth_dict (dict): Dictionary of the ground truth lists
+        question_ids (list): The questions to evaluate
+
+    Returns:
+        tuple: The evaluated question IDs and an array of values per metric in the same order
+
+    """
+    # look up (and decode, for compact result sets) the entries of each question only once
+    evaluated = []
+    counts = []
+    for question_id in question_ids:
+        ground_truth = ground_truth_dict[question_id]
+        if not ground_truth:
+            continue
+        predicted = predicted_dict[question_id]
+        relevant_values = _relevant_values(ground_truth)
+        # the dictionary keys are hashed already, so intersections do not need any conversion
+        counts.append(
+            (len(relevant_values & predicted.keys()), len(predicted), len(relevant_values))
+        )
+        evaluated.append(question_id)
+    relevant_retrieved, retrieved, relevant = np.array(counts, dtype=np.int64).reshape(-1, 3).T
+    with np.errstate(divide="ignore", invalid="ignore"):
+        precision = np.where(retrieved > 0, relevant_retrieved / retrieved, 0.0)
+        recall = np.where(relevant > 0, relevant_retrieved / relevant, 0.0)
+        # same order of operations as trec_eval: (1 + beta^2) * P * R / (beta^2 * P + R)
+        f_measure = np.where(
+            (precision != 0) | (recall != 0),
+            2.0 * precision * recall / (1.0 * precision + recall),
+            0.0,
+        )
+    return evaluated, {"set_P": precision, "set_recall": recall, "set_F": f_measure}
+
 
 class Evaluation:
     """Computes the F1, Recall and Precision for two list considering the Pytrec_eval library.
@@ -77,42 +258,87 @@ class Evaluation:
     need: pip install pytrec_eval numpy scipy
     """
 
-    def __init__(self, model_name: str, metrics: set[str] | None = None) -> None:
+    def __init__(
+        self, model_name: str, metrics: set[str] | None = None, engine: str = "pytrec_eval"
+    ) -> None:
         """Initialize the Evaluation class.
 
         Args:
             model_name (str): The name of the model that generates the predicted_dicts
             metrics (dict): Name of the evaluated metrics. See pytrec_eval.supported_measures
+            engine (str): Compute the metrics with pytrec_eval or numpy (set metrics only)
 
         """
         if metrics is None:
             metrics = {"set_F", "set_P", "set_recall"}
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown engine {engine}, use one of {', '.join(ENGINES)}.")
+        if engine == "numpy" and not metrics <= SET_METRICS:
+            raise ValueError(
+                f"The numpy engine only supports the metrics {', '.join(sorted(SET_METRICS))}."
+            )
         self.model_name = model_name
         self.metrics = metrics
+        self.engine = engine
 
     def evaluate(
         self,
-        predicted_dict: dict[str, dict[str, int]],
-        ground_truth_dict: dict[str, dict[str, int]],
+        predicted_dict: Mapping[str, dict[str, int]],
+        ground_truth_dict: Mapping[str, dict[str, int]],
+        batched: bool = True,
     ) -> dict:
         """Evaluate the model considering a true dictionary and a predicted dictionary.
 
+        Questions missing in the ground truth are skipped with a warning.
+
         Args:
             predicted_dict (dict): Dictionary of the predicted lists
             ground_truth_dict (dict): Dictionary of the ground truth lists
+            batched (bool): Evaluate all questions with a single evaluator
+                instead of one evaluator per question (pytrec_eval engine only)
 
         Returns:
            dict[dict[float]]: A dictionary with the average precision, recall and F1
 
         """
+        missing = [
+            question_id for question_id in predicted_dict if question_id not in ground_truth_dict
+        ]
+        if missing:
+            logger.warning(
+                f"Skipping {len(missing)} questions missing in the ground truth: "
+                f"{', '.join(missing)}"
+            )
+        question_ids = [
+            question_id for question_id in predicted_dict if question_id in ground_truth_dict
+        ]
+
+        if self.engine == "numpy":
+            return self._evaluate_numpy(predicted_dict, ground_truth_dict, question_ids)
+
         results = {}
-        for question_id_key in predicted_dict:  # noqa: PLC0206
-            ground_truth = {question_id_key: ground_truth_dict[question_id_key]}
-            prediction = {question_id_key: predicted_dict[question_id_key]}
+        if batched:
+            evaluator = pytrec_eval.RelevanceEvaluator(
+                {question_id: ground_truth_dict[question_id] for question_id in question_ids},
+                self.metrics,
+            )
+            results_batch = evaluator.evaluate(
+                {question_id: predicted_dict[question_id] for question_id in question_ids}
+            )
+            # keep the order of the predictions, like the evaluation per question
+            results = {
+                question_id: results_batch[question_id]
+                for question_id in question_ids
+                if question_id in results_batch
+            }
+        else:
+            for question_id_key in question_ids:
+                ground_truth = {question_id_key: ground_truth_dict[question_id_key]}
+                prediction = {question_id_key: predicted_dict[question_id_key]}
 
-            evaluator = pytrec_eval.RelevanceEvaluator(ground_truth, self.metrics)
-            results_question = evaluator.evaluate(prediction)
-            results.update(results_question)
+                evaluator = pytrec_eval.RelevanceEvaluator(ground_truth, self.metrics)
+                results_question = evaluator.evaluate(prediction)
+                results.update(results_question)
 
         d: dict[str, float] = {}
         for measure in self.metrics:
@@ -124,3 +350,21 @@ class Evaluation:
         results["average"] = d
 
         return results
+
+    def _evaluate_numpy(
+        self,
+        predicted_dict: Mapping[str, dict[str, int]],
+        ground_truth_dict: Mapping[str, dict[str, int]],
+        question_ids: list[str],
+    ) -> dict:
+        """Evaluate the set metrics and their averages with numpy"""
+        question_ids, values = set_metrics(predicted_dict, ground_truth_dict, question_ids)
+        # same order of the metrics as pytrec_eval
+        metrics = [metric for metric in ("set_P", "set_recall", "set_F") if metric in self.metrics]
+        columns = [values[metric].tolist() for metric in metrics]
+        results: dict = {
+            question_id: dict(zip(metrics, row, strict=True))
+            for question_id, row in zip(question_ids, zip(*columns, strict=True), strict=True)
+        }
+        results["average"] = {metric: float(np.mean(values[metric])) for metric in self.metrics}
+        return results
@@ -1,38 +1,194 @@
 """query RDF endpoing"""
 
 import typing
+from collections.abc import Iterator
 
+import requests
 from loguru import logger
 from SPARQLWrapper import JSON, SPARQLWrapper
 
+from text2sparql_client.result_cache import ONLY, VALUES_RESULT, ResultCache
+from text2sparql_client.utils.evaluation_metrics import DBpediaDict2PytrecDict
+from text2sparql_client.utils.sparql_stream import IncompleteResultError, iter_result_events
+from text2sparql_client.utils.string_table import StringTable
 
-def get_json(query: str, endpoint: str, timeout: int = 180) -> dict | typing.Any:  # noqa: ANN401
+CHUNK_SIZE = 64 * 1024
+SPARQL_JSON = "application/sparql-results+json"
+
+EMPTY_RESULT = {
+    "head": {"link": [], "vars": []},
+    "results": {"distinct": False, "ordered": True, "bindings": []},
+}
+
+
+def get_json(
+    query: str, endpoint: str, timeout: int = 180, cache: ResultCache | None = None
+) -> dict | typing.Any:  # noqa: ANN401
     """Execute a SPARQL query and return the results as JSON.
 
+    Successful results are stored in the cache (if given), failed queries are not cached.
+
     Args:
         query (str): The SPARQL query to execute
         endpoint (str): The SPARQL endpoint URL
         timeout (int): Query timeout in seconds
+        cache (ResultCache | None): Persistent cache for the query results
 
     Returns:
         dict: Query results in JSON format
 
     """
+    if cache is not None:
+        cached = cache.get(endpoint=endpoint, query=query)
+        if cached is not None:
+            return cached
+        if cache.mode == ONLY:
+            logger.info(f"Result not cached, returning an empty result for query: {query.strip()}")
+            return EMPTY_RESULT
+
     sparql = SPARQLWrapper(endpoint)
     sparql.setTimeout(timeout)
     sparql.setQuery(query)
     sparql.setReturnFormat(JSON)
 
     try:
-        return sparql.query().convert()
+        result = sparql.query().convert()
     except Exception as e:  # noqa: BLE001
         logger.info(f"\n--------------\nError: {e}\n---------------")
         try:
             sparql.setMethod("POST")
-            return sparql.query().convert()
+            result = sparql.query().convert()
+        except Exception as e:  # noqa: BLE001
+            logger.info(f"\n--------------\nError: {e}\n---------------")
+            return EMPTY_RESULT
+    if cache is not None and isinstance(result, dict):
+        cache.put(endpoint=endpoint, query=query, result=result)
+    return result
+
+
+class ResultLimits:
+    """Limits for streamed SPARQL results"""
+
+    def __init__(self, max_rows: int | None = None, max_bytes: int | None = None):
+        """Initialize the limits.
+
+        Args:
+            max_rows (int | None): Maximum number of bindings per result (None is unlimited)
+            max_bytes (int | None): Maximum number of bytes per result (None is unlimited)
+
+        """
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+
+
+class ResultStream:
+    """Stream of a SPARQL JSON result, stopped after a maximum number of bytes"""
+
+    def __init__(self, chunks: Iterator[bytes], max_bytes: int | None = None):
+        self.chunks = chunks
+        self.max_bytes = max_bytes
+        self.count = 0
+        self.exceeded = False
+        self.boolean: bool | None = None
+
+    def _limited_chunks(self) -> Iterator[bytes]:
+        for chunk in self.chunks:
+            if self.max_bytes is not None and self.count + len(chunk) > self.max_bytes:
+                self.exceeded = True
+                yield chunk[: self.max_bytes - self.count]
+                return
+            self.count += len(chunk)
+            yield chunk
+
+    def events(self) -> Iterator[tuple[str, typing.Any]]:
+        """Yield the parts of the result (a result cut at the byte limit ends early)"""
+        try:
+            for event, value in iter_result_events(self._limited_chunks()):
+                if event == "boolean":
+                    self.boolean = value
+                yield event, value
+        except IncompleteResultError:
+            if not self.exceeded:
+                raise
+
+
+def cacheable_result(relevance: dict, boolean: bool | None) -> dict:
+    """Create a compact sparql dict which transforms to the same result values"""
+    if boolean is not None:
+        return {"head": {"vars": []}, "boolean": boolean}
+    return {
+        "head": {"vars": ["value"]},
+        "results": {
+            "bindings": [{"value": {"type": "literal", "value": value}} for value in relevance]
+        },
+    }
+
+
+def stream_relevance(  # noqa: PLR0913
+    query: str,
+    endpoint: str,
+    timeout: int = 180,
+    max_rows: int | None = None,
+    max_bytes: int | None = None,
+    cache: ResultCache | None = None,
+    strings: StringTable | None = None,
+) -> tuple[dict[str, int], bool]:
+    """Execute a SPARQL query and transform the result while it is received.
+
+    Bindings are parsed one at a time, so large results do not have to fit into memory.
+    Complete results are stored in the cache (if given) in a compact form, separately
+    from the complete results of get_json.
+
+    Args:
+        query (str): The SPARQL query to execute
+        endpoint (str): The SPARQL endpoint URL
+        timeout (int): Query timeout in seconds
+        max_rows (int | None): Maximum number of bindings to read (None is unlimited)
+        max_bytes (int | None): Maximum number of bytes to read (None is unlimited)
+        cache (ResultCache | None): Persistent cache for the query results
+        strings (StringTable | None): Table to intern the result values in
+
+    Returns:
+        tuple: The result values (as in a result set) and if the result was truncated
+
+    """
+    transform = DBpediaDict2PytrecDict("", strings)
+    if cache is not None:
+        cached = cache.get(endpoint=endpoint, query=query, shape=VALUES_RESULT)
+        if cached is not None:
+            return transform.tranform(cached)[""], False
+        if cache.mode == ONLY:
+            logger.info(f"Result not cached, returning an empty result for query: {query.strip()}")
+            return {}, False
+
+    for method in ("GET", "POST"):
+        try:
+            with requests.request(
+                method,
+                endpoint,
+                params={"query": query} if method == "GET" else None,
+                data={"query": query} if method == "POST" else None,
+                headers={"Accept": SPARQL_JSON},
+                timeout=timeout,
+                stream=True,
+            ) as response:
+                response.raise_for_status()
+                stream = ResultStream(response.iter_content(CHUNK_SIZE), max_bytes=max_bytes)
+                result, truncated = transform.transform_stream(stream.events(), max_rows=max_rows)
         except Exception as e:  # noqa: BLE001
             logger.info(f"\n--------------\nError: {e}\n---------------")
-            return {
-                "head": {"link": [], "vars": []},
-                "results": {"distinct": False, "ordered": True, "bindings": []},
-            }
+            continue
+        relevance: dict[str, int] = result[""]
+        if stream.exceeded:
+            truncated = True
+        if truncated:
+            logger.warning(f"Result truncated after {max_rows} rows or {max_bytes} bytes.")
+        elif cache is not None:
+            cache.put(
+                endpoint=endpoint,
+                query=query,
+                result=cacheable_result(relevance, stream.boolean),
+                shape=VALUES_RESULT,
+            )
+        return relevance, truncated
+    return {}, False
@@ -0,0 +1,233 @@
+"""reading and writing result sets as JSON or in a compact binary format"""
+
+import json
+import sys
+from collections.abc import Iterator, Mapping
+from itertools import pairwise
+from typing import IO, Any
+
+import click
+import numpy as np
+
+from text2sparql_client.utils.string_table import StringTable
+
+RESULT_SET_FORMATS = ["auto", "json", "compact"]
+COMPACT_SUFFIX = ".rsbin"
+MAGIC = b"T2SRSB\x00\x01"
+ALIGNMENT = 8
+
+
+def result_set_format(file: str, file_format: str = "auto") -> str:
+    """Get the format of a result set file (`auto` decides by the file extension)"""
+    if file_format != "auto":
+        return file_format
+    return "compact" if file.endswith(COMPACT_SUFFIX) else "json"
+
+
+def _padding(size: int) -> bytes:
+    return b"\x00" * (-size % ALIGNMENT)
+
+
+def write_compact_result_set(result_set: dict, target: IO[bytes]) -> None:
+    """Write a result set in the compact binary format
+
+    All values are stored once in a string table, the results of each qname are arrays
+    of string IDs and relevances. Entries which are not results (like `order_required`)
+    are stored in the header. Layout (each section aligned to 8 bytes):
+
+    - magic bytes and the header length (uint64)
+    - the header (JSON): qnames, other entries and the section sizes
+    - string offsets (uint64, one more than strings) and the UTF-8 encoded strings
+    - result offsets per qname (uint64, one more than qnames)
+    - string IDs (uint32) and relevances (int8, only if not all are 1) of all results
+    """
+    qnames = [key for key, value in result_set.items() if isinstance(value, dict)]
+    extra = {key: value for key, value in result_set.items() if not isinstance(value, dict)}
+    table = StringTable()
+    string_ids: list[int] = []
+    relevances: list[int] = []
+    result_offsets = [0]
+    for qname in qnames:
+        for value, relevance in result_set[qname].items():
+            string_ids.append(table.id(value))
+            relevances.append(relevance)
+        result_offsets.append(len(string_ids))
+    encoded = [value.encode() for value in table.strings]
+    string_offsets = np.zeros(len(encoded) + 1, dtype=np.uint64)
+    np.cumsum([len(value) for value in encoded], out=string_offsets[1:])
+    strings = b"".join(encoded)
+    header = json.dumps(
+        {
+            "qnames": qnames,
+            "extra": extra,
+            "strings": len(table),
+            "strings_size": len(strings),
+            "results": len(string_ids),
+            # relevances are only stored if not all of them are 1
+            "relevances": any(relevance != 1 for relevance in relevances),
+        }
+    ).encode()
+
+    target.write(MAGIC)
+    target.write(np.uint64(len(header)).tobytes())
+    target.write(header + _padding(len(header)))
+    target.write(string_offsets.tobytes())
+    target.write(strings + _padding(len(strings)))
+    target.write(np.array(result_offsets, dtype=np.uint64).tobytes())
+    string_id_bytes = np.array(string_ids, dtype=np.uint32).tobytes()
+    target.write(string_id_bytes)
+    relevance_bytes = b""
+    if any(relevance != 1 for relevance in relevances):
+        relevance_bytes = np.array(relevances, dtype=np.int8).tobytes()
+    target.write(relevance_bytes + _padding(len(string_id_bytes) + len(relevance_bytes)))
+
+
+class CompactResultSet(Mapping[str, Any]):
+    """Result set in the compact binary format, read lazily from a memory-mapped file
+
+    The string table is decoded at once on the first access, the results of a qname are
+    built from their slice of string IDs when they are accessed. Each value is shared
+    between all results. With a string table, the values are also shared with other
+    result sets using the same table.
+    """
+
+    def __init__(self, file: str, strings: StringTable | None = None):
+        """Open a compact result set (`-` reads it from stdin)."""
+        self.file = file
+        self.strings = strings
+        data: np.ndarray
+        if file == "-":
+            data = np.frombuffer(sys.stdin.buffer.read(), dtype=np.uint8)
+        else:
+            data = np.memmap(file, dtype=np.uint8, mode="r")
+        self._open(data)
+
+    def _open(self, data: np.ndarray) -> None:
+        # plain array views, slices of a memmap are costly memmap objects themselves
+        self._data = data.view(np.ndarray)
+        if data[: len(MAGIC)].tobytes() != MAGIC:
+            raise ValueError(f"{self.file} is not a compact result set.")
+        position = len(MAGIC)
+        header_size = int(data[position : position + 8].view(np.uint64)[0])
+        position += 8
+        header = json.loads(data[position : position + header_size].tobytes())
+        position += header_size + len(_padding(header_size))
+        self.qnames: list[str] = header["qnames"]
+        self.extra: dict = header["extra"]
+        self._index = {qname: index for index, qname in enumerate(self.qnames)}
+
+        self._position = position
+        self._string_offsets = self._section(np.uint64, header["strings"] + 1)
+        self._strings = self._section(np.uint8, header["strings_size"])
+        self._result_offsets: list[int] = self._section(np.uint64, len(self.qnames) + 1).tolist()
+        self._string_ids = self._section(np.uint32, header["results"], aligned=False)
+        self._relevances = (
+            self._section(np.int8, header["results"]) if header["relevances"] else None
+        )
+        self._values: list[str] | None = None
+
+    def _section(self, dtype: type, count: int, aligned: bool = True) -> np.ndarray:
+        """Get the next section of the data as an array"""
+        size = count * np.dtype(dtype).itemsize
+        section: np.ndarray = self._data[self._position : self._position + size].view(dtype)
+        self._position += size + (len(_padding(size)) if aligned else 0)
+        return section
+
+    def string_values(self) -> list[str]:
+        """Get all values of the string table (decoded on the first call)"""
+        if self._values is None:
+            offsets = self._string_offsets.tolist()
+            blob = self._strings.tobytes()
+            if blob.isascii():
+                # byte offsets are character offsets, so the blob is decoded only once
+                text = blob.decode("ascii")
+                values = [text[start:end] for start, end in pairwise(offsets)]
+            else:
+                values = [blob[start:end].decode() for start, end in pairwise(offsets)]
+            if self.strings is not None:
+                values = [self.strings.intern(value) for value in values]
+            self._values = values
+        return self._values
+
+    def value(self, string_id: int) -> str:
+        """Get a value from the string table"""
+        return self.string_values()[string_id]
+
+    def __getitem__(self, key: str) -> Any:  # noqa: ANN401
+        """Get the results of a qname (or another entry like `order_required`)"""
+        if key in self.extra:
+            return self.extra[key]
+        index = self._index[key]
+        start, end = self._result_offsets[index : index + 2]
+        values = map(self.string_values().__getitem__, self._string_ids[start:end].tolist())
+        if self._relevances is None:
+            return dict.fromkeys(values, 1)
+        return dict(zip(values, self._relevances[start:end].tolist(), strict=True))
+
+    def __iter__(self) -> Iterator[str]:
+        """Iterate the qnames and the other entries"""
+        yield from self.qnames
+        yield from self.extra
+
+    def __len__(self) -> int:
+        """Count the qnames and the other entries"""
+        return len(self.qnames) + len(self.extra)
+
+    def __contains__(self, key: object) -> bool:
+        """Check for a qname or another entry"""
+        return key in self._index or key in self.extra
+
+    def pop(self, key: str, default: list | None = None) -> dict | list | None:
+        """Remove another entry (like `truncated`) and return it"""
+        entry: dict | list | None = self.extra.pop(key, default)
+        return entry
+
+    def __getstate__(self) -> dict:
+        """Pickle the file name (or the data if it was read from stdin)"""
+        return {
+            "file": self.file,
+            "extra": self.extra,
+            "data": self._data.tobytes() if self.file == "-" else None,
+        }
+
+    def __setstate__(self, state: dict) -> None:
+        """Open the file again in another process"""
+        self.file = state["file"]
+        self.strings = None
+        if state["data"] is None:
+            self._open(np.memmap(self.file, dtype=np.uint8, mode="r"))
+        else:
+            self._open(np.frombuffer(state["data"], dtype=np.uint8))
+        self.extra = state["extra"]
+
+
+ResultSet = dict | CompactResultSet
+
+
+def load_result_set(
+    file: str, file_format: str = "auto", strings: StringTable | None = None
+) -> ResultSet:
+    """Load a result set, compact result sets are read lazily
+
+    With a string table, the values are interned in it, so result sets loaded with the
+    same table share a single string per distinct value.
+    """
+    if result_set_format(file, file_format) == "compact":
+        return CompactResultSet(file, strings)
+    with click.open_file(filename=file, encoding="UTF-8") as source:
+        result_set: dict = json.load(source)
+    if strings is not None:
+        for key, value in result_set.items():
+            if isinstance(value, dict):
+                result_set[key] = {strings.intern(item): rel for item, rel in value.items()}
+    return result_set
+
+
+def write_result_set(result_set: dict, file: str, file_format: str = "auto") -> None:
+    """Write a result set as indented JSON or in the compact format"""
+    if result_set_format(file, file_format) == "compact":
+        with click.open_file(filename=file, mode="wb") as target:
+            write_compact_result_set(result_set, target)
+        return
+    with click.open_file(filename=file, mode="w", encoding="UTF-8") as target:
+        json.dump(result_set, target, indent=2)
@@ -0,0 +1,123 @@
+"""incremental parsing of SPARQL JSON results"""
+
+import codecs
+import json
+from collections.abc import Iterable, Iterator
+from typing import Any
+
+DECODER = json.JSONDecoder()
+WHITESPACE = " \t\n\r"
+
+
+class IncompleteResultError(ValueError):
+    """The SPARQL JSON result ended unexpectedly or is not valid"""
+
+
+class _Buffer:
+    """Text buffer over a stream of byte chunks, refilled on demand"""
+
+    def __init__(self, chunks: Iterable[bytes]):
+        self.chunks = iter(chunks)
+        self.decoder = codecs.getincrementaldecoder("utf-8")()
+        self.text = ""
+        self.position = 0
+        self.exhausted = False
+
+    def fill(self) -> bool:
+        """Read the next chunk (False if the stream is exhausted)"""
+        if self.exhausted:
+            return False
+        chunk = next(self.chunks, None)
+        if chunk is None:
+            self.exhausted = True
+            self.text = self.text[self.position :] + self.decoder.decode(b"", final=True)
+        else:
+            self.text = self.text[self.position :] + self.decoder.decode(chunk)
+        self.position = 0
+        return True
+
+    def peek(self) -> str:
+        """Skip whitespace and get the next character ("" at the end of the stream)"""
+        while True:
+            while self.position < len(self.text) and self.text[self.position] in WHITESPACE:
+                self.position += 1
+            if self.position < len(self.text):
+                return self.text[self.position]
+            if not self.fill():
+                return ""
+
+    def expect(self, characters: str) -> str:
+        """Consume the next character, which must be one of the given characters"""
+        character = self.peek()
+        if not character or character not in characters:
+            raise IncompleteResultError(
+                f"Expected one of {characters!r} but found {character or 'the end'!r}."
+            )
+        self.position += 1
+        return character
+
+    def value(self) -> Any:  # noqa: ANN401
+        """Decode the next complete JSON value"""
+        self.peek()
+        while True:
+            try:
+                value, end = DECODER.raw_decode(self.text, self.position)
+            except json.JSONDecodeError as error:
+                if not self.fill():
+                    raise IncompleteResultError(str(error)) from error
+                continue
+            # a number or literal at the end of the buffer may continue in the next chunk
+            if end == len(self.text) and self.fill():
+                continue
+            self.position = end
+            return value
+
+
+def _keys(buffer: _Buffer) -> Iterator[str]:
+    """Iterate the keys of an object (after the opening brace), the caller consumes the values"""
+    if buffer.peek() == "}":
+        buffer.position += 1
+        return
+    while True:
+        key = buffer.value()
+        buffer.expect(":")
+        yield key
+        if buffer.expect(",}") == "}":
+            return
+
+
+def _bindings(buffer: _Buffer) -> Iterator[tuple[str, Any]]:
+    """Iterate the bindings of a results object (after the opening brace)"""
+    for key in _keys(buffer):
+        if key != "bindings":
+            buffer.value()
+            continue
+        buffer.expect("[")
+        if buffer.peek() == "]":
+            buffer.position += 1
+            continue
+        while True:
+            yield "binding", buffer.value()
+            if buffer.expect(",]") == "]":
+                break
+
+
+def iter_result_events(chunks: Iterable[bytes]) -> Iterator[tuple[str, Any]]:
+    """Parse a SPARQL JSON result incrementally and yield its parts as they arrive
+
+    Yields `("vars", list)` for the head, `("boolean", bool)` for ASK results and
+    `("binding", dict)` for each row of a SELECT result. Only a single binding is kept
+    in memory at a time. Raises IncompleteResultError if the stream ends prematurely.
+    """
+    buffer = _Buffer(chunks)
+    buffer.expect("{")
+    for key in _keys(buffer):
+        if key == "head":
+            yield "vars", buffer.value().get("vars", [])
+        elif key == "boolean":
+            yield "boolean", buffer.value()
+        elif key == "results":
+            buffer.expect("{")
+            yield from _bindings(buffer)
+        else:
+            buffer.value()
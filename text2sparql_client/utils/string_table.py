@@ -0,0 +1,73 @@
+"""interned strings and compact result values"""
+
+from threading import Lock
+
+import numpy as np
+
+
+class StringTable:
+    """Table of interned strings with integer IDs
+
+    Each distinct string is stored once, all results using a value share the same string
+    object. IDs are assigned in the order the strings are added. The table can be shared
+    between threads.
+    """
+
+    def __init__(self) -> None:
+        self.ids: dict[str, int] = {}
+        self.strings: list[str] = []
+        self.lock = Lock()
+
+    def id(self, value: str) -> int:
+        """Get the ID of a string, adding it to the table if necessary"""
+        string_id = self.ids.get(value)
+        if string_id is None:
+            with self.lock:
+                string_id = self.ids.get(value)
+                if string_id is None:
+                    string_id = len(self.strings)
+                    self.strings.append(value)
+                    self.ids[value] = string_id
+        return string_id
+
+    def intern(self, value: str) -> str:
+        """Get the shared string object which is equal to a string"""
+        return self.strings[self.id(value)]
+
+    def __getitem__(self, string_id: int) -> str:
+        """Get the string of an ID"""
+        return self.strings[string_id]
+
+    def __len__(self) -> int:
+        """Count the strings"""
+        return len(self.strings)
+
+
+class CompactRelevance:
+    """Values of a result with their relevance, stored as an array of string IDs
+
+    Relevances are only stored if not all of them are 1 (e.g. for a false ASK result).
+    """
+
+    __slots__ = ("relevances", "string_ids", "strings")
+
+    def __init__(self, relevance: dict[str, int], strings: StringTable):
+        """Store the values of a result in the string table."""
+        self.strings = strings
+        self.string_ids = np.fromiter(
+            (strings.id(value) for value in relevance), dtype=np.uint32, count=len(relevance)
+        )
+        self.relevances = None
+        if any(value != 1 for value in relevance.values()):
+            self.relevances = np.fromiter(relevance.values(), dtype=np.int8, count=len(relevance))
+
+    def to_dict(self) -> dict[str, int]:
+        """Get the values with their relevance (the values are shared strings)"""
+        values = [self.strings[string_id] for string_id in self.string_ids.tolist()]
+        if self.relevances is None:
+            return dict.fromkeys(values, 1)
+        return dict(zip(values, self.relevances.tolist(), strict=True))
+
+    def __len__(self) -> int:
+        """Count the values"""
+        return len(self.string_ids)